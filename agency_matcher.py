@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Multi-pattern law enforcement agency matcher.
+
+Builds one Aho-Corasick automaton from the agency registry (canonical search terms plus
+aliases such as "PALATKA PD") so a charge, case number or whole booking card can be
+tagged with every matching agency in a single linear scan, instead of one substring
+test per agency. Agency codes such as "PPD" are only matched against a charge's agency
+field or case number suffix, never free text.
+
+Used by:
+- zAgencyStatsUpdate/calculate_agency_stats.py (classifying bookings)
+- import_pcso_bookings.py (tagging charges at ingest time)
+- backfill_charge_agency_ids.py (tagging charges imported before that)
+
+Usage:
+    from agency_matcher import get_agency_matcher
+
+    matcher = get_agency_matcher()
+    matcher.match('231328CF (PUTNAM COUNTY SHERIFF)')   # {'pcso'}
+    matcher.match_charge({'agency': 'PPD', 'case_number': '0'})  # {'palatka_pd'}
+    tag_charge_agency({'agency': '', 'case_number': '231328CF (PPD)'})  # agency_id 'palatka_pd'
+"""
+
+import re
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+# Agency registry. search_term is matched as a plain substring (the historical
+# behavior); aliases are short forms and must appear as whole words so "PCSO" does
+# not match inside booking numbers like PCSO26JBN000160. codes are the 2-3 letter
+# abbreviations, which only count as a whole charge agency field or a case number's
+# "(XXX)" suffix, like the IN (...) cases in supabase_charges_agency_id.sql.
+AGENCY_REGISTRY = [
+    {
+        'id': 'pcso',
+        'name': 'PUTNAM COUNTY SHERIFF\'S OFFICE',
+        'search_term': 'PUTNAM COUNTY SHERIFF',
+        'aliases': ['PCSO'],
+        'codes': ['PCS'],
+    },
+    {
+        'id': 'palatka_pd',
+        'name': 'PALATKA POLICE DEPARTMENT',
+        'search_term': 'PALATKA POLICE DEPARTMENT',
+        'aliases': ['PALATKA POLICE', 'PALATKA PD'],
+        'codes': ['PPD'],
+    },
+    {
+        'id': 'interlachen_pd',
+        'name': 'INTERLACHEN POLICE DEPARTMENT',
+        'search_term': 'INTERLACHEN POLICE DEPARTMENT',
+        'aliases': ['INTERLACHEN POLICE', 'INTERLACHEN PD'],
+        'codes': ['IPD'],
+    },
+    {
+        'id': 'welaka_pd',
+        'name': 'WELAKA POLICE DEPARTMENT',
+        'search_term': 'WELAKA POLICE DEPARTMENT',
+        'aliases': ['WELAKA POLICE', 'WELAKA PD'],
+        'codes': ['WPD'],
+    },
+    {
+        'id': 'school_pd',
+        'name': 'PUTNAM COUNTY SCHOOL DISTRICT POLICE DEPARTMENT',
+        'search_term': 'SCHOOL DISTRICT POLICE',
+        'aliases': ['SCHOOL DISTRICT PD'],
+    },
+    {
+        'id': 'fhp',
+        'name': 'FLORIDA HIGHWAY PATROL',
+        'search_term': 'FLORIDA HIGHWAY PATROL',
+        'aliases': [],
+        'codes': ['FHP'],
+    },
+    {
+        'id': 'fwc',
+        'name': 'FLORIDA FISH AND WILDLIFE CONSERVATION COMMISSION (FWC)',
+        'search_term': 'FISH AND WILDLIFE',
+        'aliases': [],
+        'codes': ['FWC'],
+    },
+]
+
+_REGISTRY_IDS = {agency['id'] for agency in AGENCY_REGISTRY}
+_SEARCH_TERMS = {agency['id']: agency['search_term'] for agency in AGENCY_REGISTRY}
+_CASE_NUMBER_AGENCY_RE = re.compile(r'\(([^)]+)\)')
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == '_'
+
+
+class AgencyMatcher:
+    """Aho-Corasick automaton over every agency search term and alias, plus the exact agency codes."""
+
+    def __init__(self, agencies: Iterable[Dict[str, Any]]):
+        self.agencies: List[Dict[str, Any]] = list(agencies)
+        self.agency_ids: List[str] = [agency['id'] for agency in self.agencies]
+        # Trie as parallel lists: goto[state] = {char: next_state}
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # outputs[state] = [(agency_id, pattern_length, whole_word)]
+        self._outputs: List[List[Tuple[str, int, bool]]] = [[]]
+        # codes[code] = agency_id
+        self._codes: Dict[str, str] = {}
+
+        for agency in self.agencies:
+            self._add_pattern(agency['search_term'], agency['id'], whole_word=False)
+            for alias in agency.get('aliases', []):
+                self._add_pattern(alias, agency['id'], whole_word=True)
+            for code in agency.get('codes', []):
+                self._codes[code.strip().upper()] = agency['id']
+        self._build_failure_links()
+
+    def _add_pattern(self, pattern: str, agency_id: str, whole_word: bool):
+        pattern = pattern.strip().upper()
+        if not pattern:
+            return
+        state = 0
+        for ch in pattern:
+            next_state = self._goto[state].get(ch)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append([])
+                self._goto[state][ch] = next_state
+            state = next_state
+        self._outputs[state].append((agency_id, len(pattern), whole_word))
+
+    def _build_failure_links(self):
+        queue = deque()
+        for next_state in self._goto[0].values():
+            self._fail[next_state] = 0
+            queue.append(next_state)
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(ch, 0)
+                self._outputs[next_state] = self._outputs[next_state] + self._outputs[self._fail[next_state]]
+
+    def match(self, text: Optional[str]) -> Set[str]:
+        """
+        Return the ids of every agency mentioned in text (one pass, case-insensitive).
+
+        Only search terms and aliases are looked for; agency codes are not (see
+        match_agency_field), so this is safe on free text such as raw_card_text.
+        """
+        found: Set[str] = set()
+        if not text:
+            return found
+        text = str(text).upper()
+        goto = self._goto
+        fail = self._fail
+        outputs = self._outputs
+        state = 0
+        last = len(text) - 1
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if not outputs[state]:
+                continue
+            for agency_id, length, whole_word in outputs[state]:
+                if whole_word:
+                    start = i - length + 1
+                    if start > 0 and _is_word_char(text[start - 1]):
+                        continue
+                    if i < last and _is_word_char(text[i + 1]):
+                        continue
+                found.add(agency_id)
+        return found
+
+    def match_agency_field(self, text: Optional[str]) -> Set[str]:
+        """Like match, but text is a whole agency value, so it may also be an agency code (e.g. "PPD")."""
+        found = self.match(text)
+        if text:
+            agency_id = self._codes.get(str(text).strip().upper())
+            if agency_id:
+                found.add(agency_id)
+        return found
+
+    def match_charge(self, charge: Any) -> Set[str]:
+        """Return the agencies a charge record belongs to (agency_id, agency field or case number)."""
+        if not isinstance(charge, dict):
+            return set()
+        # Charges tagged at import time carry their canonical agency id
+        agency_id = charge.get('agency_id')
+        if agency_id in _REGISTRY_IDS:
+            return {agency_id} if agency_id in self.agency_ids else set()
+        found = self.match_agency_field(charge.get('agency', '') or '')
+        # Fallback: case number may include agency text in older data; a code only
+        # counts as its "(XXX)" suffix
+        case_number = charge.get('case_number', '') or charge.get('caseNumber', '')
+        if case_number:
+            case_number = str(case_number)
+            found |= self.match(case_number)
+            suffix_match = _CASE_NUMBER_AGENCY_RE.search(case_number)
+            if suffix_match:
+                found |= self.match_agency_field(suffix_match.group(1))
+        return found
+
+    def resolve(self, text: Optional[str]) -> Optional[str]:
+        """Return a single canonical agency id for an agency value, or None if ambiguous/unknown."""
+        found = self.match_agency_field(text)
+        if len(found) == 1:
+            return next(iter(found))
+        return None
+
+
+_MATCHER_CACHE: Dict[Tuple[str, ...], AgencyMatcher] = {}
+
+
+def get_agency_matcher(agencies: Optional[List[Dict[str, Any]]] = None) -> AgencyMatcher:
+    """Return a (cached) matcher for the given agencies, or the full registry."""
+    agencies = AGENCY_REGISTRY if agencies is None else agencies
+    key = tuple(agency['id'] for agency in agencies)
+    matcher = _MATCHER_CACHE.get(key)
+    if matcher is None:
+        matcher = AgencyMatcher(agencies)
+        _MATCHER_CACHE[key] = matcher
+    return matcher
+
+
+def tag_charge_agency(charge: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Resolve the arresting agency of a charge to a canonical agency_id.
+
+    The agency comes from the charge's agency text, or from the "(AGENCY)" suffix of
+    its case number (e.g. "231328CF (PUTNAM COUNTY SHERIFF)"). Recognized agencies
+    get the canonical search-term spelling the stats view also produces; unknown or
+    ambiguous ones keep their raw text and a None agency_id.
+    """
+    agency_text = (charge.get('agency') or '').strip()
+    case_number = charge.get('case_number') or ''
+    if not agency_text:
+        suffix_match = _CASE_NUMBER_AGENCY_RE.search(case_number)
+        if suffix_match:
+            agency_text = suffix_match.group(1).strip()
+
+    agency_id = get_agency_matcher().resolve(agency_text or case_number)
+
+    charge['agency'] = _SEARCH_TERMS.get(agency_id, agency_text)
+    charge['agency_id'] = agency_id
+    return charge
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Backfill charges.agency_id for historical rows.
+
+import_pcso_bookings.py tags every new charge with a canonical agency_id. This script
+does the same for charges imported before that, using the same resolution rules
+(agency_matcher.tag_charge_agency).
+
+It pages through charges WHERE agency_id IS NULL with a (booking_no, charge_order)
+keyset cursor and saves the cursor to a checkpoint file after every page, so it can
+be stopped and re-run at any time and picks up where it left off. Charges whose
+agency cannot be resolved stay NULL and are skipped on later pages.
+
+Requirements:
+- supabase_charges_agency_id.sql has been run (adds charges.agency_id)
+
+Environment Variables:
+- SUPABASE_URL: Your Supabase project URL
+- SUPABASE_SERVICE_ROLE_KEY: Your Supabase service role key (for bypassing RLS)
+- PCSO_CHARGES_TABLE: Charges table name (default: charges)
+
+Usage:
+    python3 backfill_charge_agency_ids.py [--page-size 1000] [--max-pages N] [--dry-run] [--restart]
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from supabase import create_client, Client
+from dotenv import load_dotenv
+
+# =====================================================
+# LOAD ENVIRONMENT VARIABLES
+# =====================================================
+
+script_dir = Path(__file__).parent
+env_path = script_dir / 'assets' / '.env'
+
+if env_path.exists():
+    load_dotenv(env_path)
+    print(f'✅ Loaded environment variables from {env_path}')
+else:
+    load_dotenv()
+    print('⚠️  assets/.env not found, trying current directory .env')
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+sys.path.insert(0, str(script_dir))
+from agency_matcher import tag_charge_agency
+from supabase_bulk_reader import quote_filter_value
+
+PCSO_CHARGES_TABLE = os.getenv('PCSO_CHARGES_TABLE', 'charges')
+CHECKPOINT_PATH = script_dir / 'state' / 'charge_agency_backfill.json'
+DEFAULT_PAGE_SIZE = 1000
+MAX_RETRIES = 3
+
+
+def get_supabase_client() -> Client:
+    """Initialize and return Supabase client."""
+    supabase_url = os.getenv('SUPABASE_URL', '')
+    supabase_key = os.getenv('SUPABASE_SERVICE_ROLE_KEY', '')
+
+    if not supabase_url or not supabase_key:
+        raise ValueError(
+            'Missing required environment variables: SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY\n'
+            'Please set these in assets/.env file'
+        )
+
+    return create_client(supabase_url, supabase_key)
+
+
+def load_checkpoint() -> Optional[Tuple[str, int]]:
+    """Return the last (booking_no, charge_order) processed, if any."""
+    if not CHECKPOINT_PATH.exists():
+        return None
+    data = json.loads(CHECKPOINT_PATH.read_text())
+    return (data['booking_no'], int(data['charge_order']))
+
+
+def save_checkpoint(cursor: Tuple[str, int], totals: Dict[str, int]):
+    CHECKPOINT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = CHECKPOINT_PATH.with_suffix('.tmp')
+    tmp_path.write_text(json.dumps({
+        'booking_no': cursor[0],
+        'charge_order': cursor[1],
+        'totals': totals,
+    }))
+    tmp_path.replace(CHECKPOINT_PATH)
+
+
+def _execute(build_query, description: str) -> Any:
+    """Execute a query, retrying transient failures with exponential backoff."""
+    for attempt in range(1, MAX_RETRIES + 1):
+        try:
+            return build_query().execute()
+        except Exception as e:
+            if attempt == MAX_RETRIES:
+                raise
+            delay = 2 ** (attempt - 1)
+            logger.warning(f'⚠️  {description} failed (attempt {attempt}/{MAX_RETRIES}): {e}; retrying in {delay}s')
+            time.sleep(delay)
+
+
+def fetch_untagged_page(
+    supabase: Client,
+    cursor: Optional[Tuple[str, int]],
+    page_size: int,
+) -> List[Dict[str, Any]]:
+    """Fetch the next page of charges without agency_id, ordered by (booking_no, charge_order)."""
+    def build():
+        query = supabase.table(PCSO_CHARGES_TABLE)\
+            .select('booking_no,charge_order,case_number,agency')\
+            .is_('agency_id', 'null')
+        if cursor is not None:
+            booking_no, charge_order = cursor
+            query = query.or_(
+                f'booking_no.gt.{quote_filter_value(booking_no)},'
+                f'and(booking_no.eq.{quote_filter_value(booking_no)},charge_order.gt.{charge_order})'
+            )
+        return query.order('booking_no').order('charge_order').limit(page_size)
+
+    response = _execute(build, 'Fetching charges page')
+    return response.data or []
+
+
+def apply_page(supabase: Client, rows: List[Dict[str, Any]], dry_run: bool) -> Dict[str, int]:
+    """Resolve and store agency_id for one page; one update per (booking, agency)."""
+    groups: Dict[Tuple[str, str, str], List[int]] = defaultdict(list)
+    unresolved = 0
+    for row in rows:
+        charge = tag_charge_agency({
+            'agency': row.get('agency') or '',
+            'case_number': row.get('case_number') or '',
+        })
+        if not charge['agency_id']:
+            unresolved += 1
+            continue
+        groups[(row['booking_no'], charge['agency_id'], charge['agency'])].append(row['charge_order'])
+
+    tagged = 0
+    for (booking_no, agency_id, agency), charge_orders in groups.items():
+        if not dry_run:
+            # Same fields the importer writes: canonical agency text plus its id
+            _execute(
+                lambda: supabase.table(PCSO_CHARGES_TABLE)
+                .update({'agency_id': agency_id, 'agency': agency})
+                .eq('booking_no', booking_no)
+                .in_('charge_order', charge_orders),
+                f'Tagging {booking_no}',
+            )
+        tagged += len(charge_orders)
+    return {'tagged': tagged, 'unresolved': unresolved}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Backfill charges.agency_id for historical rows')
+    parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE, help='Charges per page (default: 1000)')
+    parser.add_argument('--max-pages', type=int, default=None, help='Stop after this many pages (resume later)')
+    parser.add_argument('--dry-run', action='store_true', help='Resolve agencies but do not write or checkpoint')
+    parser.add_argument('--restart', action='store_true', help='Ignore the checkpoint and start from the beginning')
+    args = parser.parse_args()
+
+    logger.info('=' * 60)
+    logger.info('🏷️  CHARGES AGENCY_ID BACKFILL')
+    logger.info('=' * 60)
+
+    supabase = get_supabase_client()
+    cursor = None if args.restart else load_checkpoint()
+    if cursor:
+        logger.info(f'↩️  Resuming after {cursor[0]} #{cursor[1]} ({CHECKPOINT_PATH})')
+
+    totals = {'scanned': 0, 'tagged': 0, 'unresolved': 0}
+    pages = 0
+    try:
+        while args.max_pages is None or pages < args.max_pages:
+            rows = fetch_untagged_page(supabase, cursor, args.page_size)
+            if not rows:
+                break
+            result = apply_page(supabase, rows, args.dry_run)
+            pages += 1
+            totals['scanned'] += len(rows)
+            totals['tagged'] += result['tagged']
+            totals['unresolved'] += result['unresolved']
+            cursor = (rows[-1]['booking_no'], rows[-1]['charge_order'])
+            if not args.dry_run:
+                save_checkpoint(cursor, totals)
+            logger.info(
+                f'   Page {pages}: {len(rows)} charges, {result["tagged"]} tagged, '
+                f'{result["unresolved"]} unresolved (through {cursor[0]})'
+            )
+            if len(rows) < args.page_size:
+                break
+    except Exception as e:
+        logger.error(f'❌ Backfill stopped: {e}; re-run to resume from the last checkpoint')
+        sys.exit(1)
+
+    logger.info('')
+    logger.info(
+        f'✅ Backfill {"dry run " if args.dry_run else ""}complete: {totals["scanned"]} scanned, '
+        f'{totals["tagged"]} tagged, {totals["unresolved"]} unresolved'
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks for the PCSO jail log parser (import_pcso_bookings.py).
+
+text extractor:
+    Per-card cost of _parse_booking_from_text, the regex extractor used by the
+    booking-number fallback, against the previous implementation (kept below as
+    legacy_parse_booking_from_text, which built ~20 regexes per card and retried a
+    quadratic name pattern). Card texts come from recorded jail log pages: each
+    booking card's own text, plus the page-text window around each booking number
+    that the fallback parses. Both implementations must return identical bookings.
+
+booking-number fallback:
+    Whole-page cost of the fallback that parse_jail_log_html uses when no booking
+    card tables are detected. "before" calls _parse_booking_from_html without a
+    shared page index, so every booking re-extracts and re-scans the whole page
+    as it used to; "after" builds the index once per page. Output must match.
+
+Nothing touches the network or Supabase.
+
+Usage:
+    python3 benchmark_pcso_parsing.py
+    python3 benchmark_pcso_parsing.py --html pcso_jail.html other_page.html --seconds 5
+"""
+
+import re
+import sys
+import time
+import argparse
+import logging
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+script_dir = Path(__file__).parent
+sys.path.insert(0, str(script_dir))
+(script_dir / 'logs').mkdir(exist_ok=True)
+
+import import_pcso_bookings as importer
+from agency_matcher import tag_charge_agency
+from pcso_jail_parsers import parse_booking_cards
+
+DEFAULT_HTML = [str(script_dir / 'pcso_jail.html')]
+DEFAULT_SECONDS = 2.0
+
+# =====================================================
+# LEGACY TEXT EXTRACTOR (REFERENCE)
+# =====================================================
+
+
+def legacy_parse_booking_from_text(
+    container_text: str,
+    booking_no: str,
+    page_text: Optional[str] = None,
+) -> Optional[Dict[str, Any]]:
+    """_parse_booking_from_text before the extractor was precompiled (verbatim logic)."""
+    booking_data = {
+        'booking_no': booking_no,
+        'mni_no': '',
+        'name': '',
+        'status': '',
+        'booking_date': None,
+        'age_on_booking_date': None,
+        'bond_amount': '',
+        'address_given': '',
+        'holds_text': None,
+        'race': '',
+        'gender': '',
+        'released_date': None,
+        'photo_url': f'{importer.PCSO_PHOTO_BASE_URL}{booking_no}',
+        'charges': [],
+        'raw_card_text': container_text,
+    }
+    mni_match = re.search(r'PCSO\d{2}MNI\d{6}', container_text)
+    if mni_match:
+        booking_data['mni_no'] = mni_match.group(0)
+    name_match = re.search(
+        r'([A-Z][A-Z\s,]+?)\s+\([BW]/?\s*(?:MALE|FEMALE|M|F)',
+        container_text,
+    )
+    if name_match:
+        booking_data['name'] = name_match.group(1).strip()
+    race_gender_match = re.search(r'\(([BW])/?\s*(MALE|FEMALE|M|F)', container_text, re.IGNORECASE)
+    if race_gender_match:
+        booking_data['race'] = race_gender_match.group(1)
+        gender_code = race_gender_match.group(2).upper()
+        booking_data['gender'] = 'Male' if gender_code.startswith('M') else 'Female'
+    status_match = re.search(r'Status:\s*(In Jail|Released)', container_text, re.IGNORECASE)
+    if status_match:
+        booking_data['status'] = status_match.group(1)
+    date_patterns = [
+        r'Booking Date[^0-9]*(\d{1,2}/\d{1,2}/\d{4})\s+(\d{1,2}:\d{2}(?::\d{2})?\s*(?:AM|PM)?)',
+        r'Booking Date[^0-9]*(\d{1,2}/\d{1,2}/\d{4})',
+        r'Booking Dt[^0-9]*(\d{1,2}/\d{1,2}/\d{4})\s+(\d{1,2}:\d{2}(?::\d{2})?\s*(?:AM|PM)?)',
+        r'Booking Dt[^0-9]*(\d{1,2}/\d{1,2}/\d{4})',
+        r'Booked[^0-9]*(\d{1,2}/\d{1,2}/\d{4})\s+(\d{1,2}:\d{2}(?::\d{2})?\s*(?:AM|PM)?)',
+        r'Booked[^0-9]*(\d{1,2}/\d{1,2}/\d{4})',
+    ]
+    for pattern in date_patterns:
+        date_match = re.search(pattern, container_text, re.IGNORECASE)
+        if not date_match:
+            continue
+        if date_match.lastindex and date_match.lastindex >= 2:
+            date_str = f"{date_match.group(1)} {date_match.group(2)}"
+        else:
+            date_str = date_match.group(1)
+        booking_data['booking_date'] = importer._to_utc_iso_safe(date_str)
+        if booking_data['booking_date']:
+            break
+    if not booking_data['booking_date'] and page_text:
+        near_patterns = [
+            r'Booking No:\s*' + re.escape(booking_no) + r'[\s\S]{0,400}?'
+            r'Booking Date[^0-9]*(\d{1,2}/\d{1,2}/\d{4})\s+'
+            r'(\d{1,2}:\d{2}(?::\d{2})?\s*(?:AM|PM)?)',
+            r'Booking Date[^0-9]*(\d{1,2}/\d{1,2}/\d{4})\s+'
+            r'(\d{1,2}:\d{2}(?::\d{2})?\s*(?:AM|PM)?)[\s\S]{0,400}?'
+            r'Booking No:\s*' + re.escape(booking_no),
+        ]
+        for pattern in near_patterns:
+            date_match = re.search(pattern, page_text, re.IGNORECASE)
+            if not date_match:
+                continue
+            date_str = f"{date_match.group(1)} {date_match.group(2)}"
+            booking_data['booking_date'] = importer._to_utc_iso_safe(date_str)
+            if booking_data['booking_date']:
+                break
+    age_match = re.search(r'Age On Booking Date:\s*(\d+)', container_text, re.IGNORECASE)
+    if age_match:
+        booking_data['age_on_booking_date'] = int(age_match.group(1))
+    bond_match = re.search(r'Bond Amount:\s*([^\n]+)', container_text, re.IGNORECASE)
+    if bond_match:
+        booking_data['bond_amount'] = bond_match.group(1).strip()
+    address_match = re.search(r'Address Given:([^\n]+)', container_text, re.IGNORECASE)
+    if address_match:
+        booking_data['address_given'] = address_match.group(1).strip()
+    holds_match = re.search(r'HOLDS\s+([^\n]+)', container_text, re.IGNORECASE)
+    if holds_match:
+        booking_data['holds_text'] = holds_match.group(1).strip()
+    charges = []
+    for row in re.split(r'\n', container_text):
+        row_text = row.strip()
+        if not row_text:
+            continue
+        charge_match = re.search(r'(\d+\.\d+(?:\.\d+)?[a-z]?)\s+([^\s]+)\s+\(([^)]+)\)\s+([A-Z][^0-9]+)', row_text)
+        if charge_match:
+            charge_data = {
+                'statute': charge_match.group(1),
+                'case_number': charge_match.group(2),
+                'agency': charge_match.group(3),
+                'charge': charge_match.group(4).strip(),
+                'degree': None,
+                'level': None,
+                'bond': None,
+            }
+            tag_charge_agency(charge_data)
+            degree_match = re.search(r'\b([TFSN])\s+([FM])\b', row_text)
+            if degree_match:
+                charge_data['degree'] = degree_match.group(1)
+                charge_data['level'] = degree_match.group(2)
+            bond_match = re.search(r'\$\d+(?:\.\d{2})?|NO BOND', row_text)
+            if bond_match:
+                charge_data['bond'] = bond_match.group(0)
+            charges.append(charge_data)
+    booking_data['charges'] = charges
+    return booking_data
+
+
+# =====================================================
+# CARD TEXTS
+# =====================================================
+
+
+def collect_card_texts(paths: List[str]) -> Dict[str, List[Tuple[str, str]]]:
+    """Return {'card': [(text, booking_no)], 'fallback window': [...]} from recorded pages."""
+    from bs4 import BeautifulSoup
+
+    samples: Dict[str, List[Tuple[str, str]]] = {'card': [], 'fallback window': []}
+    for path in paths:
+        html = Path(path).read_text(encoding='utf-8', errors='replace')
+        for card in parse_booking_cards(html):
+            match = re.search(r'PCSO\d{2}JBN\d{6}', card['raw_card_text'])
+            if match:
+                samples['card'].append((card['raw_card_text'], match.group(0)))
+        # Same window the fallback cuts from the page text around a booking number
+        page_text = BeautifulSoup(html, 'html.parser').get_text(separator='\n')
+        for booking_no in sorted(set(re.findall(r'PCSO\d{2}JBN\d{6}', page_text))):
+            index = page_text.find(booking_no)
+            window = page_text[max(0, index - 2000):index + 2500].strip()
+            samples['fallback window'].append((window, booking_no))
+    return samples
+
+
+# =====================================================
+# BENCHMARK
+# =====================================================
+
+
+def time_per_card(
+    extract: Callable[[str, str], Any],
+    texts: List[Tuple[str, str]],
+    seconds: float,
+) -> float:
+    """Return the mean seconds per card, looping over texts for about `seconds`."""
+    cards = 0
+    started = time.perf_counter()
+    while True:
+        for text, booking_no in texts:
+            extract(text, booking_no)
+        cards += len(texts)
+        elapsed = time.perf_counter() - started
+        if elapsed >= seconds:
+            return elapsed / cards
+
+
+def benchmark_text_extractor(paths: List[str], seconds: float) -> bool:
+    samples = collect_card_texts(paths)
+    print('')
+    print('TEXT EXTRACTOR (_parse_booking_from_text)')
+    print(f'{"texts":<18}{"count":>6}{"avg chars":>11}{"before":>13}{"after":>13}{"speedup":>9}')
+    identical = True
+    for kind, texts in samples.items():
+        if not texts:
+            continue
+        for text, booking_no in texts:
+            if legacy_parse_booking_from_text(text, booking_no) != importer._parse_booking_from_text(text, booking_no):
+                identical = False
+                print(f'❌ {kind} {booking_no}: output differs from the legacy extractor')
+        before = time_per_card(legacy_parse_booking_from_text, texts, seconds)
+        after = time_per_card(importer._parse_booking_from_text, texts, seconds)
+        avg_chars = sum(len(text) for text, _ in texts) / len(texts)
+        print(
+            f'{kind:<18}{len(texts):>6}{avg_chars:>11.0f}'
+            f'{before * 1e6:>10.1f} µs{after * 1e6:>10.1f} µs{before / after:>8.1f}x'
+        )
+    if identical:
+        print('✅ Identical output to the legacy extractor')
+    return identical
+
+
+def benchmark_fallback(paths: List[str]) -> bool:
+    from bs4 import BeautifulSoup
+
+    print('')
+    print('BOOKING-NUMBER FALLBACK (_parse_booking_from_html, whole page)')
+    print(f'{"page":<28}{"bookings":>9}{"before":>11}{"after":>11}{"speedup":>9}')
+    identical = True
+    for path in paths:
+        soup = BeautifulSoup(Path(path).read_text(encoding='utf-8', errors='replace'), 'html.parser')
+        booking_numbers = sorted(set(re.findall(r'PCSO\d{2}JBN\d{6}', soup.get_text(separator='\n'))))
+
+        started = time.perf_counter()
+        before_bookings = [importer._parse_booking_from_html(soup, b) for b in booking_numbers]
+        before = time.perf_counter() - started
+
+        started = time.perf_counter()
+        page_index = importer._build_page_index(soup)
+        after_bookings = [importer._parse_booking_from_html(soup, b, page_index) for b in booking_numbers]
+        after = time.perf_counter() - started
+
+        if before_bookings != after_bookings:
+            identical = False
+            print(f'❌ {path}: shared page index changes the parsed bookings')
+        print(
+            f'{Path(path).name:<28}{len(booking_numbers):>9}'
+            f'{before * 1e3:>8.0f} ms{after * 1e3:>8.0f} ms{before / after:>8.1f}x'
+        )
+    if identical:
+        print('✅ Identical output with the shared page index')
+    return identical
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the PCSO jail log parser on recorded pages')
+    parser.add_argument('--html', nargs='+', default=DEFAULT_HTML, help='Recorded jail log pages (default: pcso_jail.html)')
+    parser.add_argument('--seconds', type=float, default=DEFAULT_SECONDS, help='Time spent per measurement')
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    ok = benchmark_text_extractor(args.html, args.seconds)
+    ok = benchmark_fallback(args.html) and ok
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
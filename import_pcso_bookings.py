@@ -7,6 +7,7 @@ It uses UPSERT to avoid duplicates and update existing records.
 
 Requirements:
 - pip install supabase python-dotenv requests beautifulsoup4 (if scraping HTML)
+- pip install selectolax or lxml (optional, faster HTML parsing)
 
 Environment Variables:
 - SUPABASE_URL: Your Supabase project URL
@@ -20,22 +21,35 @@ Environment Variables:
 - PCSO_PHOTO_BASE_URL: Source photo URL base (default: PCSO site)
 - PCSO_PHOTOS_BUCKET: Supabase storage bucket name (default: pcso-booking-photos)
 - PCSO_SYNC_PHOTOS: Sync photos into storage (default: true)
+- PCSO_HTML_PARSER: HTML parser backend: selectolax, lxml or bs4 (default: fastest installed)
 
 Usage:
     python3 import_pcso_bookings.py
+    python3 import_pcso_bookings.py --check-parsers pcso_jail.html [more.html ...]
+    python3 import_pcso_bookings.py --serve
 """
 
 import os
 import sys
 import json
+import math
+import time
+import hashlib
+import sqlite3
 import logging
+import threading
+import argparse
+import signal
 import re
-from datetime import datetime
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
 from typing import List, Dict, Optional, Any
 from pathlib import Path
 from zoneinfo import ZoneInfo
 
 import requests
+from requests.adapters import HTTPAdapter
 from supabase import create_client, Client
 from dotenv import load_dotenv
 
@@ -46,7 +60,7 @@ try:
 except ImportError:
     HAS_DATEUTIL = False
 
-# Try to import BeautifulSoup (required for HTML parsing)
+# Try to import BeautifulSoup (bs4 parser backend and booking number fallback)
 try:
     from bs4 import BeautifulSoup
     HAS_BEAUTIFULSOUP = True
@@ -58,6 +72,13 @@ except ImportError:
 # =====================================================
 
 script_dir = Path(__file__).parent
+
+# Shared agency registry/matcher (agency_matcher.py lives next to this script)
+sys.path.insert(0, str(script_dir))
+from agency_matcher import tag_charge_agency
+from pcso_jail_parsers import available_backends, parse_booking_cards, resolve_backend
+from supabase_bulk_reader import quote_filter_value
+from pcso_page_archive import archive_page, iter_archive, parse_archive_range, read_page
 env_path = script_dir / 'assets' / '.env'
 
 if env_path.exists():
@@ -109,14 +130,78 @@ PCSO_PHOTO_BASE_URL = os.getenv(
     'https://smartweb.pcso.us/ViewImageFull.aspx?bookno=',
 )
 PCSO_PHOTOS_BUCKET = os.getenv('PCSO_PHOTOS_BUCKET', 'pcso-booking-photos')
+# Sets bookings.photo_url for a batch of stored photos (supabase_set_booking_photo_urls.sql)
+PCSO_PHOTO_URL_RPC = os.getenv('PCSO_PHOTO_URL_RPC', 'set_booking_photo_urls')
 PCSO_SYNC_PHOTOS = os.getenv('PCSO_SYNC_PHOTOS', 'true').lower() in (
     '1',
     'true',
     'yes',
 )
+# Photo sync: concurrent download/upload workers, and the most requests per
+# second sent to the PCSO image host (0 = no limit)
+PCSO_PHOTO_WORKERS = max(1, int(os.getenv('PCSO_PHOTO_WORKERS', '4')))
+PCSO_PHOTO_RATE = float(os.getenv('PCSO_PHOTO_RATE', '4'))
+# Concurrent uploads to Supabase storage (doesn't touch the PCSO site)
+PCSO_PHOTO_UPLOAD_WORKERS = max(1, int(os.getenv('PCSO_PHOTO_UPLOAD_WORKERS', '8')))
+# SHA-256 of the site's "no image" placeholder(s), comma-separated; never stored.
+# Placeholders are also learned: identical bytes served for this many bookings.
+PCSO_PHOTO_PLACEHOLDER_HASHES = {
+    value.strip().lower()
+    for value in os.getenv('PCSO_PHOTO_PLACEHOLDER_HASHES', '').split(',')
+    if value.strip()
+}
+PLACEHOLDER_MIN_BOOKINGS = 3
+
+# HTML parser backend: selectolax, lxml or bs4 (default: fastest installed)
+PCSO_HTML_PARSER = os.getenv('PCSO_HTML_PARSER', '')
 
 # Batch size for database inserts
 BATCH_SIZE = 100
+# Charge rows per upsert request (see _sync_charges)
+CHARGES_BATCH_SIZE = 500
+# Concurrent PostgREST requests while writing bookings and charges
+PCSO_DB_CONCURRENCY = max(1, int(os.getenv('PCSO_DB_CONCURRENCY', '4')))
+
+# Archive every fetched page (compressed, by content hash) for --reparse
+PCSO_ARCHIVE_PAGES = os.getenv('PCSO_ARCHIVE_PAGES', 'true').lower() in (
+    '1',
+    'true',
+    'yes',
+)
+PCSO_ARCHIVE_DIR = Path(os.getenv('PCSO_ARCHIVE_DIR', str(script_dir / 'archive' / 'pcso_jail')))
+
+# Validators and content hash of the last imported page (see fetch_pcso_bookings)
+FETCH_STATE_PATH = script_dir / 'state' / 'pcso_jail_fetch.json'
+# Per-booking fingerprints of what was last written to Supabase (see upsert_bookings)
+PCSO_FINGERPRINT_DB = os.getenv(
+    'PCSO_FINGERPRINT_DB',
+    str(script_dir / 'state' / 'pcso_booking_fingerprints.sqlite3'),
+)
+# Roster diff: log new / released / dropped bookings (supabase_booking_transitions.sql)
+PCSO_TRACK_TRANSITIONS = os.getenv('PCSO_TRACK_TRANSITIONS', 'true').lower() in (
+    '1',
+    'true',
+    'yes',
+)
+PCSO_TRANSITIONS_TABLE = os.getenv('PCSO_TRANSITIONS_TABLE', 'booking_transitions')
+# Service mode (--serve): poll interval bounds and politeness budget for the jail log page
+PCSO_POLL_MIN_SECONDS = max(30, int(os.getenv('PCSO_POLL_MIN_SECONDS', '120')))
+PCSO_POLL_MAX_SECONDS = max(PCSO_POLL_MIN_SECONDS, int(os.getenv('PCSO_POLL_MAX_SECONDS', '1800')))
+PCSO_POLL_MAX_PER_HOUR = max(1, int(os.getenv('PCSO_POLL_MAX_PER_HOUR', '20')))
+# Observed booking arrival rates, kept across service restarts (see serve)
+POLL_STATE_PATH = script_dir / 'state' / 'pcso_poll_state.json'
+# Follow-up work queue (charges, photos, transitions) in PCSO_FINGERPRINT_DB:
+# seconds per run spent draining it, and retry backoff (doubles per attempt)
+PCSO_QUEUE_TIME_BUDGET = float(os.getenv('PCSO_QUEUE_TIME_BUDGET', '300'))
+QUEUE_RETRY_BASE_SECONDS = 60
+QUEUE_RETRY_MAX_SECONDS = 6 * 3600
+# Forget bookings that have been off the jail log this long
+FINGERPRINT_RETENTION = timedelta(days=30)
+# Bump when the fingerprint payload changes; older fingerprints are discarded
+FINGERPRINT_VERSION = '1'
+# Booking columns a reparse (--reparse) leaves as stored on existing bookings: archived
+# pages carry the source photo URL and no roster-stamped release time
+REPLAY_PRESERVED_COLUMNS = ('photo_url', 'released_date')
 
 # =====================================================
 # SUPABASE CLIENT
@@ -135,15 +220,72 @@ def get_supabase_client() -> Client:
 # DATA FETCHING (TO BE IMPLEMENTED)
 # =====================================================
 
-def fetch_pcso_bookings() -> List[Dict[str, Any]]:
+_http_session: Optional[requests.Session] = None
+_http_session_lock = threading.Lock()
+
+
+def _get_http_session() -> requests.Session:
+    """
+    Keep-alive session shared by the page fetch and photo downloads.
+    
+    Lives for the whole process, so --serve reuses its TLS connections to
+    smartweb.pcso.us from one poll to the next.
+    """
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_maxsize=max(PCSO_PHOTO_WORKERS, 1))
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _http_session = session
+        return _http_session
+
+
+def load_fetch_state() -> Dict[str, Any]:
+    """Return the ETag / Last-Modified / content hash saved by the last successful import."""
+    if not FETCH_STATE_PATH.exists():
+        return {}
+    try:
+        return json.loads(FETCH_STATE_PATH.read_text())
+    except (OSError, ValueError) as e:
+        logger.warning(f'⚠️  Ignoring unreadable fetch state {FETCH_STATE_PATH}: {e}')
+        return {}
+
+
+def save_fetch_state(fetch_state: Dict[str, Any]):
+    FETCH_STATE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = FETCH_STATE_PATH.with_suffix('.tmp')
+    tmp_path.write_text(json.dumps(fetch_state, indent=2))
+    tmp_path.replace(FETCH_STATE_PATH)
+
+
+def booking_section_hash(bookings: List[Dict[str, Any]]) -> str:
+    """
+    Stable hash of the page's booking section.
+    
+    Hashes the parsed bookings rather than the raw HTML, so ASP.NET view state and
+    markup changes that don't touch any booking don't count as a change.
+    """
+    ordered = sorted(bookings, key=lambda booking: booking.get('booking_no') or '')
+    payload = json.dumps(ordered, sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def fetch_pcso_bookings(fetch_state: Optional[Dict[str, Any]] = None) -> Optional[List[Dict[str, Any]]]:
     """
     Fetch booking data from PCSO website by scraping HTML.
     
     Scrapes https://smartweb.pcso.us/smartwebclient/jail.aspx
     Parses HTML tables to extract booking information.
     
+    Args:
+        fetch_state: State from load_fetch_state(). Its ETag / Last-Modified make the
+            request conditional, and the response's validators are written back into it.
+    
     Returns:
-        List of booking dictionaries with fields matching Supabase schema
+        List of booking dictionaries with fields matching Supabase schema, or None if
+        the server answered 304 Not Modified
     """
     logger.info('📥 Fetching PCSO jail log data...')
     
@@ -151,67 +293,42 @@ def fetch_pcso_bookings() -> List[Dict[str, Any]]:
         logger.error('❌ PCSO_JAIL_LOG_URL not configured')
         raise ValueError('PCSO_JAIL_LOG_URL must be set in environment variables or use default URL')
     
-    if not HAS_BEAUTIFULSOUP:
-        logger.error('❌ BeautifulSoup4 not installed. Install with: pip install beautifulsoup4')
-        raise ImportError('BeautifulSoup4 is required for HTML parsing')
-    
-    from bs4 import BeautifulSoup
-    
     try:
         headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
             'Accept-Language': 'en-US,en;q=0.5',
         }
+        if fetch_state:
+            if fetch_state.get('etag'):
+                headers['If-None-Match'] = fetch_state['etag']
+            if fetch_state.get('last_modified'):
+                headers['If-Modified-Since'] = fetch_state['last_modified']
         logger.info(f'🌐 Fetching from: {PCSO_JAIL_LOG_URL}')
-        response = requests.get(PCSO_JAIL_LOG_URL, timeout=60, headers=headers)
+        response = _get_http_session().get(PCSO_JAIL_LOG_URL, timeout=60, headers=headers)
         response.raise_for_status()
         
-        logger.info(f'✅ Received HTML response (size: {len(response.text)} bytes)')
+        if response.status_code == 304:
+            logger.info('✅ Jail log not modified since the last import (HTTP 304)')
+            return None
+        if fetch_state is not None:
+            fetch_state['etag'] = response.headers.get('ETag')
+            fetch_state['last_modified'] = response.headers.get('Last-Modified')
         
-        # Parse HTML
-        soup = BeautifulSoup(response.text, 'html.parser')
-        bookings: List[Dict[str, Any]] = []
+        logger.info(f'✅ Received HTML response (size: {len(response.text)} bytes)')
         
-        # Parse booking info tables directly to avoid mismatched names/photos
-        info_tables = [
-            table
-            for table in soup.find_all('table')
-            if not (table.get('class') and 'JailViewCharges' in table.get('class'))
-            and table.find(string=re.compile(r'Booking No:', re.IGNORECASE))
-        ]
-        logger.info(f'📦 Found {len(info_tables)} booking info tables')
-        for table in info_tables:
+        if PCSO_ARCHIVE_PAGES:
             try:
-                booking_data = _parse_booking_info_table(table)
-                if booking_data:
-                    bookings.append(booking_data)
-            except Exception as e:
-                logger.warning(f'⚠️  Error parsing booking table: {e}')
-                continue
+                entry = archive_page(PCSO_ARCHIVE_DIR, response.text)
+                logger.info(f'🗄️  Archived page {entry["sha256"][:12]} ({entry["path"]})')
+            except OSError as e:
+                logger.warning(f'⚠️  Could not archive page: {e}')
         
+        bookings = parse_jail_log_html(response.text)
         if not bookings:
-            # Fallback: parse by booking numbers if tables weren't detected
-            page_text = soup.get_text(separator='\n')
-            booking_pattern = r'PCSO\d{2}JBN\d{6}'
-            booking_numbers = re.findall(booking_pattern, page_text)
-            unique_booking_numbers = sorted(list(set(booking_numbers)), reverse=True)
-            
-            logger.info(f'📊 Found {len(unique_booking_numbers)} unique booking numbers')
-            
-            if not unique_booking_numbers:
-                logger.warning('⚠️  No booking numbers found in HTML. Page structure may have changed.')
-                logger.warning(f'   First 500 chars of HTML: {response.text[:500]}')
-                return []
-            
-            for booking_no in unique_booking_numbers:
-                try:
-                    booking_data = _parse_booking_from_html(soup, booking_no)
-                    if booking_data:
-                        bookings.append(booking_data)
-                except Exception as e:
-                    logger.warning(f'⚠️  Error parsing booking {booking_no}: {e}')
-                    continue
+            logger.warning('⚠️  No booking numbers found in HTML. Page structure may have changed.')
+            logger.warning(f'   First 500 chars of HTML: {response.text[:500]}')
+            return []
         
         logger.info(f'✅ Successfully parsed {len(bookings)} bookings')
         return bookings
@@ -226,6 +343,91 @@ def fetch_pcso_bookings() -> List[Dict[str, Any]]:
         raise
 
 
+def parse_jail_log_html(html: str, backend: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Parse the jail log HTML into booking dicts.
+    
+    Booking cards are extracted with the PCSO_HTML_PARSER backend (see
+    pcso_jail_parsers.py). If no cards are found, falls back to locating bookings
+    by booking number, which always uses BeautifulSoup.
+    """
+    backend = resolve_backend(backend or PCSO_HTML_PARSER)
+    bookings: List[Dict[str, Any]] = []
+    
+    # Parse booking info tables directly to avoid mismatched names/photos
+    cards = parse_booking_cards(html, backend)
+    logger.info(f'📦 Found {len(cards)} booking info tables ({backend})')
+    for card in cards:
+        try:
+            booking_data = _parse_booking_card(card)
+            if booking_data:
+                bookings.append(booking_data)
+        except Exception as e:
+            logger.warning(f'⚠️  Error parsing booking table: {e}')
+            continue
+    
+    if not bookings:
+        if not HAS_BEAUTIFULSOUP:
+            logger.error('❌ BeautifulSoup4 not installed. Install with: pip install beautifulsoup4')
+            raise ImportError('BeautifulSoup4 is required for the booking number fallback parser')
+        
+        # Fallback: parse by booking numbers if tables weren't detected
+        soup = BeautifulSoup(html, 'html.parser')
+        page_index = _build_page_index(soup)
+        unique_booking_numbers = sorted(page_index['first_offsets'], reverse=True)
+        
+        logger.info(f'📊 Found {len(unique_booking_numbers)} unique booking numbers')
+        
+        for booking_no in unique_booking_numbers:
+            try:
+                booking_data = _parse_booking_from_html(soup, booking_no, page_index)
+                if booking_data:
+                    bookings.append(booking_data)
+            except Exception as e:
+                logger.warning(f'⚠️  Error parsing booking {booking_no}: {e}')
+                continue
+    
+    return bookings
+
+
+def check_parser_parity(paths: List[str]) -> bool:
+    """
+    Parse recorded jail log pages with every installed backend and compare.
+    
+    Returns True if every backend produced the same booking dicts as bs4.
+    """
+    backends = available_backends()
+    logger.info(f'🔬 Checking HTML parser backends: {", ".join(backends)}')
+    all_match = True
+    for path in paths:
+        html = Path(path).read_text(encoding='utf-8', errors='replace')
+        results = {}
+        for backend in backends:
+            started = time.perf_counter()
+            results[backend] = parse_jail_log_html(html, backend)
+            elapsed = time.perf_counter() - started
+            logger.info(f'   {path} [{backend}]: {len(results[backend])} bookings in {elapsed * 1000:.1f} ms')
+        reference_name = backends[0]
+        reference = results[reference_name]
+        for backend in backends[1:]:
+            if results[backend] == reference:
+                continue
+            all_match = False
+            logger.error(f'❌ {path}: {backend} differs from {reference_name}')
+            for index, (expected, actual) in enumerate(zip(reference, results[backend])):
+                for key in sorted(set(expected) | set(actual)):
+                    if expected.get(key) != actual.get(key):
+                        logger.error(
+                            f'   booking {index} ({expected.get("booking_no")}) {key}: '
+                            f'{expected.get(key)!r} != {actual.get(key)!r}'
+                        )
+            if len(reference) != len(results[backend]):
+                logger.error(f'   booking count {len(reference)} != {len(results[backend])}')
+    if all_match:
+        logger.info(f'✅ All backends produced identical bookings for {len(paths)} page(s)')
+    return all_match
+
+
 def _parse_booking_block(block_text: str) -> Optional[Dict[str, Any]]:
     booking_no_match = re.search(r'PCSO\d{2}JBN\d{6}', block_text)
     if not booking_no_match:
@@ -254,11 +456,22 @@ def _to_utc_iso_safe(date_str: str) -> Optional[str]:
     return None
 
 
-def _parse_booking_info_table(table) -> Optional[Dict[str, Any]]:
-    header = table.find('td', class_='SearchHeader')
-    if not header:
-        return None
-    header_text = ' '.join(header.stripped_strings)
+_RELEASE_DATE_LABELS = ('Release Date', 'Released Date', 'Date Released')
+_KNOWN_INFO_LABELS = {
+    'Booking No',
+    'MniNo',
+    'Status',
+    'Booking Date',
+    'Age On Booking Date',
+    'Bond Amount',
+    'Address Given',
+    *_RELEASE_DATE_LABELS,
+}
+
+
+def _parse_booking_card(card: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Build a booking from a card extracted by one of the pcso_jail_parsers backends."""
+    header_text = card['header_text']
     if not header_text:
         return None
     
@@ -278,19 +491,15 @@ def _parse_booking_info_table(table) -> Optional[Dict[str, Any]]:
     
     header_info = _extract_header_name(header_text)
     
+    info_grid = card['info_grid']
+    
     def _find_value(label: str) -> str:
-        for td in table.find_all('td', class_='InmateInfoGridTd'):
-            label_text = td.get_text(' ', strip=True)
-            if label_text.startswith(label):
-                value_td = td.find_next_sibling('td')
-                if value_td:
-                    return value_td.get_text(' ', strip=True)
-        return ''
+        return info_grid.get(label + ':') or info_grid.get(label, '')
     
     booking_no = _find_value('Booking No')
     if not booking_no:
         # Try to find a booking number anywhere in the table
-        booking_match = re.search(r'PCSO\d{2}JBN\d{6}', table.get_text(' ', strip=True))
+        booking_match = re.search(r'PCSO\d{2}JBN\d{6}', card['raw_card_text'])
         if booking_match:
             booking_no = booking_match.group(0)
         else:
@@ -311,7 +520,7 @@ def _parse_booking_info_table(table) -> Optional[Dict[str, Any]]:
         'released_date': None,
         'photo_url': f'{PCSO_PHOTO_BASE_URL}{booking_no}',
         'charges': [],
-        'raw_card_text': table.get_text('\n', strip=True),
+        'raw_card_text': card['raw_card_text'],
     }
     
     # Booking date
@@ -324,49 +533,39 @@ def _parse_booking_info_table(table) -> Optional[Dict[str, Any]]:
     if age_str.isdigit():
         booking_data['age_on_booking_date'] = int(age_str)
     
-    # Holds - look for a nearby holds table before the next booking info table
-    holds_texts: List[str] = []
-    next_info_table = table.find_next(
-        lambda tag: tag.name == 'table'
-        and tag is not table
-        and tag.find(string=re.compile(r'Booking No:', re.IGNORECASE)),
-    )
-    for next_table in table.find_all_next('table'):
-        if next_table == next_info_table:
-            break
-        if next_table.get('id') == 'JailViewHolds':
-            hold_cells = next_table.find_all('td')
-            for cell in hold_cells:
-                cell_text = cell.get_text(' ', strip=True)
-                if cell_text and cell_text.upper() != 'HOLDS':
-                    holds_texts.append(cell_text)
+    # Release date, if the site lists one
+    for label in _RELEASE_DATE_LABELS:
+        released_date_str = _find_value(label)
+        if released_date_str:
+            booking_data['released_date'] = _to_utc_iso_safe(released_date_str)
             break
+    
+    # Labels we don't map yet, kept so new fields show up without re-parsing
+    booking_data['extra_fields'] = {
+        label[:-1]: value
+        for label, value in info_grid.items()
+        if label.endswith(':') and label[:-1] not in _KNOWN_INFO_LABELS
+    }
+    
+    # Holds - cells of the card's holds table
+    holds_texts = [
+        cell_text
+        for cell_text in card['holds_cells'] or []
+        if cell_text and cell_text.upper() != 'HOLDS'
+    ]
     if holds_texts:
         booking_data['holds_text'] = ' '.join(holds_texts)
 
-    # Charges - look for the CHARGES table (not HOLDS) before the next booking info table
-    charges_table = None
-    for next_table in table.find_all_next('table'):
-        if next_table == next_info_table:
-            break
-        table_id = next_table.get('id', '')
-        table_classes = next_table.get('class') or []
-        if table_id == 'JailViewHolds':
-            continue
-        if table_id == 'JailViewCharges' or 'JailViewCharges' in table_classes:
-            charges_table = next_table
-            break
-    if charges_table:
-        booking_data['charges'] = _extract_charges_from_table(charges_table)
+    # Charges - rows of the card's CHARGES table
+    if card['charge_rows'] is not None:
+        booking_data['charges'] = _extract_charges_from_rows(card['charge_rows'])
     
     return booking_data
 
 
-def _extract_charges_from_table(table) -> List[Dict[str, Any]]:
+def _extract_charges_from_rows(rows: List[List[str]]) -> List[Dict[str, Any]]:
     charges: List[Dict[str, Any]] = []
-    rows = table.find_all('tr')
-    for row in rows:
-        cells = [cell.get_text(' ', strip=True) for cell in row.find_all('td')]
+    for cells in rows:
         if not cells:
             continue
         if any(cell.upper() == 'STATUTE' for cell in cells):
@@ -391,34 +590,85 @@ def _extract_charges_from_table(table) -> List[Dict[str, Any]]:
         if not charge or charge.upper() == 'CHARGE':
             continue
         charges.append(
-            {
-                'statute': statute,
-                'case_number': case_number,
-                'charge': charge,
-                'degree': degree,
-                'level': level,
-                'bond': bond,
-            }
+            tag_charge_agency(
+                {
+                    'statute': statute,
+                    'case_number': case_number,
+                    'charge': charge,
+                    'degree': degree,
+                    'level': level,
+                    'bond': bond,
+                }
+            )
         )
     return charges
 
 
-def _parse_booking_from_html(soup: BeautifulSoup, booking_no: str) -> Optional[Dict[str, Any]]:
+_BOOKING_NO_RE = re.compile(r'PCSO\d{2}JBN\d{6}')
+# A booking block runs from "Booking No: <booking_no>" to the next "Booking No: PCSO"
+_BOOKING_BLOCK_MARKER_RE = re.compile(r'Booking No:\s*PCSO')
+_BOOKING_BLOCK_START_RE = re.compile(r'Booking No:\s*(PCSO\d{2}JBN\d{6})')
+
+
+def _build_page_index(soup: BeautifulSoup) -> Dict[str, Any]:
+    """
+    Index the page once for the booking-number fallback parser.
+    
+    Returns:
+        page_text: the page text (newline-separated), extracted once
+        strings: booking_no -> text nodes that mention it, in document order
+        first_offsets: booking_no -> first offset in page_text (dict order = page order)
+        blocks: booking_no -> its "Booking No:" block of page_text (first one wins)
+    """
+    page_text = soup.get_text(separator='\n')
+    
+    strings: Dict[str, List[Any]] = {}
+    for text in soup.find_all(string=_BOOKING_NO_RE):
+        for booking_no in dict.fromkeys(_BOOKING_NO_RE.findall(text)):
+            strings.setdefault(booking_no, []).append(text)
+    
+    first_offsets: Dict[str, int] = {}
+    for match in _BOOKING_NO_RE.finditer(page_text):
+        first_offsets.setdefault(match.group(0), match.start())
+    
+    blocks: Dict[str, str] = {}
+    markers = [match.start() for match in _BOOKING_BLOCK_MARKER_RE.finditer(page_text)]
+    for index, start in enumerate(markers):
+        start_match = _BOOKING_BLOCK_START_RE.match(page_text, start)
+        if not start_match or start_match.group(1) in blocks:
+            continue
+        end = markers[index + 1] if index + 1 < len(markers) else len(page_text)
+        blocks[start_match.group(1)] = page_text[start:end].strip()
+    
+    return {
+        'page_text': page_text,
+        'strings': strings,
+        'first_offsets': first_offsets,
+        'blocks': blocks,
+    }
+
+
+def _parse_booking_from_html(
+    soup: BeautifulSoup,
+    booking_no: str,
+    page_index: Optional[Dict[str, Any]] = None,
+) -> Optional[Dict[str, Any]]:
     """
     Parse a single booking from HTML soup using the booking number.
     
     Args:
         soup: BeautifulSoup object of the page
         booking_no: Booking number to find and parse
+        page_index: _build_page_index(soup), shared across bookings (built if omitted)
         
     Returns:
         Dictionary with booking data or None if not found
     """
-    from datetime import datetime
+    if page_index is None:
+        page_index = _build_page_index(soup)
     
-    # Find the element containing this booking number
-    # Look for text containing the booking number
-    booking_elements = soup.find_all(string=re.compile(re.escape(booking_no)))
+    # Text nodes containing the booking number
+    booking_elements = page_index['strings'].get(booking_no)
     
     if not booking_elements:
         return None
@@ -458,24 +708,19 @@ def _parse_booking_from_html(soup: BeautifulSoup, booking_no: str) -> Optional[D
     if booking_container:
         container_text = booking_container.get_text(separator='\n', strip=True)
     
-    page_text = soup.get_text(separator='\n')
+    page_text = page_index['page_text']
     if not container_text or container_text.strip() == booking_no or len(container_text) < 20:
         # Fallback: pull a window around the booking number from full page text
-        idx = page_text.find(booking_no)
+        idx = page_index['first_offsets'].get(booking_no, -1)
         if idx != -1:
             start = max(0, idx - 2000)
             end = min(len(page_text), idx + 2500)
             container_text = page_text[start:end].strip()
     
     if 'Booking Date' not in container_text and 'Booking Dt' not in container_text:
-        # Fallback: extract the full booking block between Booking No markers
-        block_pattern = (
-            r'Booking No:\s*' + re.escape(booking_no) + r'[\s\S]*?'
-            r'(?=Booking No:\s*PCSO|$)'
-        )
-        block_match = re.search(block_pattern, page_text)
-        if block_match:
-            block_text = block_match.group(0).strip()
+        # Fallback: use the full booking block between Booking No markers
+        block_text = page_index['blocks'].get(booking_no)
+        if block_text:
             if ('Booking Date' in block_text or 'Booking Dt' in block_text
                     or len(block_text) > len(container_text)):
                 container_text = block_text
@@ -483,6 +728,57 @@ def _parse_booking_from_html(soup: BeautifulSoup, booking_no: str) -> Optional[D
     return _parse_booking_from_text(container_text, booking_no, page_text)
 
 
+# Card text patterns for _parse_booking_from_text, compiled once at import
+_MNI_NO_RE = re.compile(r'PCSO\d{2}MNI\d{6}')
+_RACE_GENDER_RE = re.compile(r'\(([BW])/?\s*(MALE|FEMALE|M|F)', re.IGNORECASE)
+_RACE_GENDER_MARKER_RE = re.compile(r'\s\([BW]/?\s*(?:MALE|FEMALE|M|F)')
+_STATUS_RE = re.compile(r'Status:\s*(In Jail|Released)', re.IGNORECASE)
+_DATE_TIME_PATTERN = r'[^0-9]*(\d{1,2}/\d{1,2}/\d{4})\s+(\d{1,2}:\d{2}(?::\d{2})?\s*(?:AM|PM)?)'
+_DATE_PATTERN = r'[^0-9]*(\d{1,2}/\d{1,2}/\d{4})'
+# Tried in order: each label with a time, then without
+_BOOKING_DATE_RES = [
+    re.compile(label + pattern, re.IGNORECASE)
+    for label in ('Booking Date', 'Booking Dt', 'Booked')
+    for pattern in (_DATE_TIME_PATTERN, _DATE_PATTERN)
+]
+_AGE_RE = re.compile(r'Age On Booking Date:\s*(\d+)', re.IGNORECASE)
+_BOND_AMOUNT_RE = re.compile(r'Bond Amount:\s*([^\n]+)', re.IGNORECASE)
+_ADDRESS_RE = re.compile(r'Address Given:([^\n]+)', re.IGNORECASE)
+_HOLDS_RE = re.compile(r'HOLDS\s+([^\n]+)', re.IGNORECASE)
+_CHARGE_ROW_RE = re.compile(r'(\d+\.\d+(?:\.\d+)?[a-z]?)\s+([^\s]+)\s+\(([^)]+)\)\s+([A-Z][^0-9]+)')
+_CHARGE_DEGREE_LEVEL_RE = re.compile(r'\b([TFSN])\s+([FM])\b')
+_CHARGE_BOND_RE = re.compile(r'\$\d+(?:\.\d{2})?|NO BOND')
+
+
+def _is_name_char(char: str) -> bool:
+    return 'A' <= char <= 'Z' or char == ',' or char.isspace()
+
+
+def _find_name_before_race(text: str) -> Optional[str]:
+    """
+    Return the name in front of the first "(W/ MALE)"-style marker, or None.
+
+    Same result as group 1 of
+    re.search(r'([A-Z][A-Z\s,]+?)\s+\([BW]/?\s*(?:MALE|FEMALE|M|F)', text), but linear:
+    that regex retries from every capital letter and backtracks over the long
+    whitespace runs in page text. A match can only start at the first capital
+    letter of the run of capitals, whitespace and commas that ends at a marker.
+    """
+    for marker in _RACE_GENDER_MARKER_RE.finditer(text):
+        paren = marker.start() + 1
+        run_start = paren
+        while run_start > 0 and _is_name_char(text[run_start - 1]):
+            run_start -= 1
+        space_start = paren
+        while space_start > run_start and text[space_start - 1].isspace():
+            space_start -= 1
+        # The name needs two characters and at least one space before "("
+        for index in range(run_start, paren - 2):
+            if 'A' <= text[index] <= 'Z':
+                return text[index:max(index + 2, space_start)]
+    return None
+
+
 def _parse_booking_from_text(
     container_text: str,
     booking_no: str,
@@ -508,54 +804,38 @@ def _parse_booking_from_text(
     }
     
     # Extract MniNo (pattern: PCSO##MNI######)
-    mni_match = re.search(r'PCSO\d{2}MNI\d{6}', container_text)
+    mni_match = _MNI_NO_RE.search(container_text)
     if mni_match:
         booking_data['mni_no'] = mni_match.group(0)
     
     # Extract name (usually before booking number, format: LAST, FIRST MIDDLE)
-    name_match = re.search(
-        r'([A-Z][A-Z\s,]+?)\s+\([BW]/?\s*(?:MALE|FEMALE|M|F)',
-        container_text,
-    )
-    if name_match:
-        booking_data['name'] = name_match.group(1).strip()
+    name = _find_name_before_race(container_text)
+    if name:
+        booking_data['name'] = name.strip()
     
     # Extract race and gender (format: (B/ MALE) or (W/ FEMALE))
-    race_gender_match = re.search(r'\(([BW])/?\s*(MALE|FEMALE|M|F)', container_text, re.IGNORECASE)
+    race_gender_match = _RACE_GENDER_RE.search(container_text)
     if race_gender_match:
         booking_data['race'] = race_gender_match.group(1)
         gender_code = race_gender_match.group(2).upper()
         booking_data['gender'] = 'Male' if gender_code.startswith('M') else 'Female'
     
     # Extract status (Status: In Jail or Status: Released)
-    status_match = re.search(r'Status:\s*(In Jail|Released)', container_text, re.IGNORECASE)
+    status_match = _STATUS_RE.search(container_text)
     if status_match:
         booking_data['status'] = status_match.group(1)
     
     # Extract booking date (handle varied label formats and time formats)
-    date_patterns = [
-        r'Booking Date[^0-9]*(\d{1,2}/\d{1,2}/\d{4})\s+(\d{1,2}:\d{2}(?::\d{2})?\s*(?:AM|PM)?)',
-        r'Booking Date[^0-9]*(\d{1,2}/\d{1,2}/\d{4})',
-        r'Booking Dt[^0-9]*(\d{1,2}/\d{1,2}/\d{4})\s+(\d{1,2}:\d{2}(?::\d{2})?\s*(?:AM|PM)?)',
-        r'Booking Dt[^0-9]*(\d{1,2}/\d{1,2}/\d{4})',
-        r'Booked[^0-9]*(\d{1,2}/\d{1,2}/\d{4})\s+(\d{1,2}:\d{2}(?::\d{2})?\s*(?:AM|PM)?)',
-        r'Booked[^0-9]*(\d{1,2}/\d{1,2}/\d{4})',
-    ]
-    for pattern in date_patterns:
-        date_match = re.search(pattern, container_text, re.IGNORECASE)
+    for date_re in _BOOKING_DATE_RES:
+        date_match = date_re.search(container_text)
         if not date_match:
             continue
         if date_match.lastindex and date_match.lastindex >= 2:
             date_str = f"{date_match.group(1)} {date_match.group(2)}"
             try:
-                if re.search(r'(AM|PM)', date_str, re.IGNORECASE):
-                    booking_data['booking_date'] = _to_utc_iso_safe(
-                        date_str,
-                    )
-                else:
-                    booking_data['booking_date'] = _to_utc_iso_safe(
-                        date_str,
-                    )
+                booking_data['booking_date'] = _to_utc_iso_safe(
+                    date_str,
+                )
             except Exception:
                 pass
         else:
@@ -591,7 +871,7 @@ def _parse_booking_from_text(
                 break
     
     # Extract age
-    age_match = re.search(r'Age On Booking Date:\s*(\d+)', container_text, re.IGNORECASE)
+    age_match = _AGE_RE.search(container_text)
     if age_match:
         try:
             booking_data['age_on_booking_date'] = int(age_match.group(1))
@@ -599,31 +879,32 @@ def _parse_booking_from_text(
             pass
     
     # Extract bond amount
-    bond_match = re.search(r'Bond Amount:\s*([^\n]+)', container_text, re.IGNORECASE)
+    bond_match = _BOND_AMOUNT_RE.search(container_text)
     if bond_match:
         booking_data['bond_amount'] = bond_match.group(1).strip()
     
     # Extract address
-    address_match = re.search(r'Address Given:([^\n]+)', container_text, re.IGNORECASE)
+    address_match = _ADDRESS_RE.search(container_text)
     if address_match:
         booking_data['address_given'] = address_match.group(1).strip()
     
     # Extract holds
-    holds_match = re.search(r'HOLDS\s+([^\n]+)', container_text, re.IGNORECASE)
+    holds_match = _HOLDS_RE.search(container_text)
     if holds_match:
         booking_data['holds_text'] = holds_match.group(1).strip()
     
     # Extract charges - look for charge rows
     # Charges appear in a table format with STATUTE, COURT CASE NUMBER, CHARGE, etc.
     charges = []
-    charge_rows = re.split(r'\n', container_text)
+    charge_rows = container_text.split('\n')
     
     for row in charge_rows:
         row_text = row.strip()
-        if not row_text:
+        # Charge rows always have "(AGENCY)"; skip the rest without running the regex
+        if not row_text or '(' not in row_text:
             continue
         # Look for charge patterns - usually has statute number
-        charge_match = re.search(r'(\d+\.\d+(?:\.\d+)?[a-z]?)\s+([^\s]+)\s+\(([^)]+)\)\s+([A-Z][^0-9]+)', row_text)
+        charge_match = _CHARGE_ROW_RE.search(row_text)
         if charge_match:
             charge_data = {
                 'statute': charge_match.group(1),
@@ -634,15 +915,16 @@ def _parse_booking_from_text(
                 'level': None,
                 'bond': None,
             }
+            tag_charge_agency(charge_data)
             
             # Try to extract degree and level
-            degree_match = re.search(r'\b([TFSN])\s+([FM])\b', row_text)
+            degree_match = _CHARGE_DEGREE_LEVEL_RE.search(row_text)
             if degree_match:
                 charge_data['degree'] = degree_match.group(1)
                 charge_data['level'] = degree_match.group(2)
             
             # Extract bond amount for this charge
-            bond_match = re.search(r'\$\d+(?:\.\d{2})?|NO BOND', row_text)
+            bond_match = _CHARGE_BOND_RE.search(row_text)
             if bond_match:
                 charge_data['bond'] = bond_match.group(0)
             
@@ -738,19 +1020,235 @@ def normalize_booking(booking_data: Dict[str, Any]) -> Dict[str, Any]:
     
     return normalized
 
+# =====================================================
+# BOOKING FINGERPRINTS (SKIP UNCHANGED BOOKINGS)
+# =====================================================
+
+def _open_fingerprint_db(path: str) -> sqlite3.Connection:
+    """Open (and create if needed) the import state store (fingerprints, photos, roster, work queue)."""
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+    row = conn.execute("SELECT value FROM meta WHERE key = 'fingerprint_version'").fetchone()
+    if not row or row[0] != FINGERPRINT_VERSION:
+        # Payload changed (or new store): every booking is rewritten once
+        with conn:
+            conn.execute('DROP TABLE IF EXISTS booking_fingerprints')
+            conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('fingerprint_version', ?)",
+                (FINGERPRINT_VERSION,),
+            )
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS booking_fingerprints (
+            booking_no TEXT PRIMARY KEY,
+            fingerprint TEXT NOT NULL,
+            photo_synced INTEGER NOT NULL DEFAULT 0,
+            last_seen TEXT NOT NULL
+        )
+    ''')
+    conn.executescript('''
+        -- Last photo seen at the source for each booking; storage_path is NULL
+        -- when that photo was the placeholder (nothing stored)
+        CREATE TABLE IF NOT EXISTS photo_manifest (
+            booking_no TEXT PRIMARY KEY,
+            sha256 TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            storage_path TEXT,
+            etag TEXT,
+            last_modified TEXT,
+            checked_at TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS photo_placeholders (
+            sha256 TEXT PRIMARY KEY
+        );
+        -- Bookings on the jail log as of the last successful import
+        CREATE TABLE IF NOT EXISTS roster (
+            booking_no TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            released_date TEXT
+        );
+        -- Follow-up tasks ('charges', 'photo', 'transition'); priority is the
+        -- booking date (newest first), times are UTC ISO strings
+        CREATE TABLE IF NOT EXISTS work_queue (
+            kind TEXT NOT NULL,
+            task_key TEXT NOT NULL,
+            booking_no TEXT NOT NULL,
+            priority TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at TEXT NOT NULL,
+            last_error TEXT,
+            enqueued_at TEXT NOT NULL,
+            PRIMARY KEY (kind, task_key)
+        );
+        CREATE INDEX IF NOT EXISTS work_queue_due ON work_queue (next_attempt_at);
+    ''')
+    return conn
+
+
+def _load_fingerprints(conn: sqlite3.Connection) -> Dict[str, tuple]:
+    """Return booking_no -> (fingerprint, photo_synced)."""
+    return {
+        row[0]: (row[1], bool(row[2]))
+        for row in conn.execute('SELECT booking_no, fingerprint, photo_synced FROM booking_fingerprints')
+    }
+
+
+def _booking_fingerprint(normalized: Dict[str, Any], charge_rows: List[Dict[str, Any]]) -> str:
+    """Stable hash of everything the importer writes for one booking."""
+    payload = json.dumps(
+        {'booking': normalized, 'charges': charge_rows},
+        sort_keys=True,
+        default=str,
+        separators=(',', ':'),
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+# =====================================================
+# ROSTER DIFF (RELEASES AND STATUS TRANSITIONS)
+# =====================================================
+
+def _is_released(status: Optional[str]) -> bool:
+    return (status or '').strip().lower() == 'released'
+
+
+def diff_roster(bookings: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Diff this page's bookings against the previous run's roster.
+    
+    Stamps released_date (observation time) on bookings whose status turned
+    Released, and carries earlier stamps forward so upserts don't clear them.
+    Call before upsert_bookings and pass the result to record_transitions.
+    
+    Returns:
+        {'transitions': [...], 'roster': [(booking_no, status, released_date)], 'baseline': bool}
+    """
+    conn = _open_fingerprint_db(PCSO_FINGERPRINT_DB)
+    try:
+        previous = {
+            row[0]: (row[1], row[2])
+            for row in conn.execute('SELECT booking_no, status, released_date FROM roster')
+        }
+    finally:
+        conn.close()
+    baseline = not previous
+    observed_at = datetime.now(ZoneInfo('UTC')).isoformat(timespec='seconds')
+    
+    # The page can list a booking more than once; keep its first non-empty status
+    current: Dict[str, str] = {}
+    for booking in bookings:
+        booking_no = booking.get('booking_no')
+        if booking_no and not current.get(booking_no):
+            current[booking_no] = (booking.get('status') or '').strip()
+    
+    transitions: List[Dict[str, Any]] = []
+    released_dates: Dict[str, Optional[str]] = {}
+    
+    def _transition(booking_no: str, kind: str, old_status: Optional[str], new_status: Optional[str]):
+        transitions.append({
+            'booking_no': booking_no,
+            'transition': kind,
+            'old_status': old_status,
+            'new_status': new_status,
+            'observed_at': observed_at,
+        })
+    
+    for booking_no, status in current.items():
+        old_status, released_date = previous.get(booking_no, (None, None))
+        if not baseline:
+            if booking_no not in previous:
+                _transition(booking_no, 'booked', None, status)
+            elif old_status != status and not _is_released(status):
+                _transition(booking_no, 'status_changed', old_status, status)
+            if _is_released(status) and not _is_released(old_status):
+                _transition(booking_no, 'released', old_status, status)
+                released_date = released_date or observed_at
+        released_dates[booking_no] = released_date if _is_released(status) else None
+    if not baseline:
+        for booking_no, (old_status, _) in previous.items():
+            if booking_no not in current:
+                _transition(booking_no, 'dropped', old_status, None)
+    
+    for booking in bookings:
+        stamped = released_dates.get(booking.get('booking_no'))
+        if stamped and not booking.get('released_date'):
+            booking['released_date'] = stamped
+    
+    counts: Dict[str, int] = {}
+    for transition in transitions:
+        counts[transition['transition']] = counts.get(transition['transition'], 0) + 1
+    if baseline:
+        logger.info(f'📋 Roster baseline: {len(current)} bookings (no previous roster to diff)')
+    else:
+        logger.info(
+            f'📋 Roster diff: {counts.get("booked", 0)} booked, {counts.get("released", 0)} released, '
+            f'{counts.get("status_changed", 0)} status changed, {counts.get("dropped", 0)} dropped'
+        )
+    return {
+        'transitions': transitions,
+        'roster': [
+            (booking_no, status, released_dates[booking_no]) for booking_no, status in current.items()
+        ],
+        'baseline': baseline,
+    }
+
+
+def record_transitions(roster_diff: Dict[str, Any]):
+    """
+    Queue the run's transitions and save the roster, in one local transaction.
+    
+    drain_work_queue inserts the queued transitions into Supabase (retrying
+    failures), so the roster can move on right away.
+    """
+    conn = _open_fingerprint_db(PCSO_FINGERPRINT_DB)
+    try:
+        with conn:
+            _enqueue_tasks(conn, [
+                (
+                    'transition',
+                    f'{transition["booking_no"]}:{transition["transition"]}:{transition["observed_at"]}',
+                    transition['booking_no'],
+                    transition['observed_at'],
+                    json.dumps(transition),
+                )
+                for transition in roster_diff['transitions']
+            ])
+            conn.execute('DELETE FROM roster')
+            conn.executemany('INSERT INTO roster VALUES (?, ?, ?)', roster_diff['roster'])
+    finally:
+        conn.close()
+
+
 # =====================================================
 # DATABASE OPERATIONS
 # =====================================================
 
-def upsert_bookings(bookings: List[Dict[str, Any]], supabase: Client) -> Dict[str, int]:
+def upsert_bookings(
+    bookings: List[Dict[str, Any]],
+    supabase: Client,
+    skip_unchanged: bool = True,
+    sync_photos: bool = True,
+    replay: bool = False,
+) -> Dict[str, int]:
     """
     Upsert bookings into Supabase.
     
     Uses booking_no as unique identifier.
     Updates existing records, inserts new ones.
     
+    Each booking is fingerprinted (normalized row plus charge rows) against the
+    local store at PCSO_FINGERPRINT_DB. Only new or changed bookings are upserted
+    and have their charges and photos queued for sync; unchanged bookings only
+    get a photo task if their photo has not been synced yet. The work queue is
+    drained alongside the booking writes (see drain_work_queue). skip_unchanged=False
+    writes every booking (fingerprints are still recorded); sync_photos=False
+    leaves photos alone. replay=True writes through _write_replayed_bookings, so
+    bookings replayed from old pages keep their stored photo_url and released_date.
+    
     Returns:
-        Dict with counts: {'inserted': X, 'updated': Y, 'skipped': Z}
+        Dict with counts: {'inserted': X, 'updated': Y, 'skipped': Z,
+        'new': N, 'changed': C, 'unchanged': U, 'queued': Q, ...}
     """
     if not bookings:
         logger.warning('⚠️  No bookings to import')
@@ -779,57 +1277,124 @@ def upsert_bookings(bookings: List[Dict[str, Any]], supabase: Client) -> Dict[st
     updated = 0
     skipped = 0
     
+    conn = _open_fingerprint_db(PCSO_FINGERPRINT_DB)
     try:
-        charges_by_booking: Dict[str, List[Dict[str, Any]]] = {}
+        known = _load_fingerprints(conn)
+        counts = {'new': 0, 'changed': 0, 'unchanged': 0}
+        # (booking, normalized row, charge rows, fingerprint) for bookings to write
+        to_write: List[tuple] = []
+        pending_photos: List[tuple] = []
+        photo_tasks = PCSO_SYNC_PHOTOS and sync_photos
+        seen: List[str] = []
         for booking in bookings:
-            booking_no = booking.get('booking_no') or booking.get('bookingNo')
-            charges = booking.get('charges') or []
-            if booking_no and isinstance(charges, list) and charges:
-                charges_by_booking[booking_no] = charges
-
-        # Process in batches
-        for i in range(0, len(bookings), BATCH_SIZE):
-            batch = bookings[i:i + BATCH_SIZE]
-            normalized_batch = []
-            
-            # Normalize each booking, skipping invalid ones
-            for b in batch:
-                normalized = normalize_booking(b)
-                if normalized:
-                    normalized_batch.append(normalized)
-                else:
-                    skipped += 1
-            
-            if not normalized_batch:
-                logger.warning(f'   Batch {i // BATCH_SIZE + 1}: No valid bookings to process')
+            normalized = normalize_booking(booking)
+            if not normalized:
+                skipped += 1
                 continue
-            
-            # Upsert batch
-            response = supabase.table(PCSO_BOOKINGS_TABLE)\
-                .upsert(normalized_batch, on_conflict='booking_no')\
-                .execute()
-            
-            # Count results (Supabase doesn't return detailed counts, so estimate)
-            inserted += len(normalized_batch)
-            
-            logger.info(f'   Processed batch {i // BATCH_SIZE + 1}: {len(normalized_batch)} bookings (skipped: {skipped})')
+            booking_no = normalized['booking_no']
+            charges = booking.get('charges') or []
+            charge_rows = _charge_rows(booking_no, charges) if isinstance(charges, list) else []
+            fingerprint = _booking_fingerprint(normalized, charge_rows)
+            seen.append(booking_no)
+            previous = known.get(booking_no)
+            if previous is None:
+                counts['new'] += 1
+            elif previous[0] != fingerprint:
+                counts['changed'] += 1
+            else:
+                counts['unchanged'] += 1
+                if skip_unchanged:
+                    if photo_tasks and not previous[1]:
+                        pending_photos.append(_photo_task(booking, normalized))
+                    continue
+            to_write.append((booking, normalized, charge_rows, fingerprint))
+        logger.info(
+            f'🧮 Bookings: {counts["new"]} new, {counts["changed"]} changed, '
+            f'{counts["unchanged"]} unchanged (skipped as invalid: {skipped})'
+        )
         
-        logger.info(f'✅ Import complete: {inserted} bookings processed')
-
-        charges_synced = 0
-        if PCSO_SYNC_CHARGES and charges_by_booking:
-            charges_synced = _sync_charges(charges_by_booking, supabase)
-        photos_synced = 0
-        photo_failures = 0
-        if PCSO_SYNC_PHOTOS:
-            photos_synced, photo_failures = _sync_photos(bookings, supabase)
+        # Queue this run's follow-up work; a photo task that is already waiting
+        # for an unchanged booking keeps its backoff
+        tasks: List[tuple] = []
+        if PCSO_SYNC_CHARGES:
+            tasks += [
+                (
+                    'charges',
+                    normalized['booking_no'],
+                    normalized['booking_no'],
+                    normalized.get('booking_date') or '',
+                    json.dumps(charge_rows),
+                )
+                for _, normalized, charge_rows, _ in to_write if charge_rows
+            ]
+        if photo_tasks:
+            tasks += [_photo_task(booking, normalized) for booking, normalized, _, _ in to_write]
+        with conn:
+            _enqueue_tasks(conn, tasks)
+            _enqueue_tasks(conn, pending_photos, replace=False)
+        
+        # The queue drains alongside the booking writes; charges and photo_url
+        # wait for the booking rows, photo transfers don't
+        with ThreadPoolExecutor(max_workers=2) as pipeline:
+            rows = [entry[1] for entry in to_write]
+            if replay:
+                writes = pipeline.submit(_write_replayed_bookings, rows, supabase, set(known))
+            else:
+                writes = pipeline.submit(_write_bookings, rows, supabase)
+            drain = pipeline.submit(
+                drain_work_queue,
+                supabase,
+                writes,
+                None if sync_photos else ('charges', 'transition'),
+            )
+            inserted = writes.result()
+            drained = drain.result()
+        
+        # Bookings are written and their follow-up work queued; remember them
+        now = datetime.now()
+        photo_done = set(drained['photos_done'])
+        with conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO booking_fingerprints VALUES (?, ?, ?, ?)',
+                [
+                    (normalized['booking_no'], fingerprint, int(normalized['booking_no'] in photo_done), now.isoformat())
+                    for _, normalized, _, fingerprint in to_write
+                ],
+            )
+            conn.executemany(
+                'UPDATE booking_fingerprints SET photo_synced = 1 WHERE booking_no = ?',
+                [(booking_no,) for booking_no in photo_done],
+            )
+            conn.executemany(
+                'UPDATE booking_fingerprints SET last_seen = ? WHERE booking_no = ?',
+                [(now.isoformat(), booking_no) for booking_no in seen],
+            )
+            conn.execute(
+                'DELETE FROM booking_fingerprints WHERE last_seen < ?',
+                ((now - FINGERPRINT_RETENTION).isoformat(),),
+            )
+            conn.execute(
+                'DELETE FROM photo_manifest WHERE booking_no NOT IN '
+                '(SELECT booking_no FROM booking_fingerprints)'
+            )
+            conn.execute(
+                "DELETE FROM work_queue WHERE kind != 'transition' AND booking_no NOT IN "
+                '(SELECT booking_no FROM booking_fingerprints)'
+            )
+            conn.execute(
+                'DELETE FROM work_queue WHERE enqueued_at < ?',
+                ((datetime.now(ZoneInfo('UTC')) - FINGERPRINT_RETENTION).isoformat(timespec='seconds'),),
+            )
         return {
             'inserted': inserted,
             'updated': 0,
             'skipped': skipped,
-            'charges_synced': charges_synced,
-            'photos_synced': photos_synced,
-            'photo_failures': photo_failures,
+            'new': counts['new'],
+            'changed': counts['changed'],
+            'unchanged': counts['unchanged'],
+            'charges_synced': drained['charges_synced'],
+            'photos_synced': drained['photos_synced'],
+            'queued': drained['tasks_left'],
         }
         
     except Exception as e:
@@ -837,79 +1402,913 @@ def upsert_bookings(bookings: List[Dict[str, Any]], supabase: Client) -> Dict[st
         import traceback
         traceback.print_exc()
         raise
+    finally:
+        conn.close()
+
+
+def _write_bookings(
+    normalized_rows: List[Dict[str, Any]],
+    supabase: Client,
+    insert_only: bool = False,
+) -> int:
+    """
+    Upsert booking rows in BATCH_SIZE batches, PCSO_DB_CONCURRENCY at a time.
+    insert_only=True skips bookings that already exist (ON CONFLICT DO NOTHING).
+    Returns the number of bookings written.
+    """
+    def _upsert_batch(batch: List[Dict[str, Any]]) -> int:
+        supabase.table(PCSO_BOOKINGS_TABLE)\
+            .upsert(batch, on_conflict='booking_no', ignore_duplicates=insert_only)\
+            .execute()
+        return len(batch)
+    
+    inserted = 0
+    batches = [normalized_rows[i:i + BATCH_SIZE] for i in range(0, len(normalized_rows), BATCH_SIZE)]
+    if batches:
+        with ThreadPoolExecutor(max_workers=min(PCSO_DB_CONCURRENCY, len(batches))) as executor:
+            for index, count in enumerate(executor.map(_upsert_batch, batches), 1):
+                # Count results (Supabase doesn't return detailed counts, so estimate)
+                inserted += count
+                logger.info(f'   Processed batch {index}: {count} bookings')
+    logger.info(f'✅ Import complete: {inserted} bookings processed')
+    return inserted
+
+
+def _write_replayed_bookings(
+    normalized_rows: List[Dict[str, Any]],
+    supabase: Client,
+    known: set,
+) -> int:
+    """
+    Write booking rows replayed from archived pages (see reparse_archive).
+    
+    Bookings missing from the fingerprint store (known) may be missing from Supabase
+    too, so they are first inserted whole, source photo_url included, skipping any
+    that already exist. Every row is then upserted without REPLAY_PRESERVED_COLUMNS,
+    so existing bookings keep their stored photo_url and released_date.
+    Returns the number of bookings written.
+    """
+    unknown = [row for row in normalized_rows if row['booking_no'] not in known]
+    if unknown:
+        logger.info(f'🗄️  Inserting {len(unknown)} bookings not seen before (existing ones are left as is)...')
+        _write_bookings(unknown, supabase, insert_only=True)
+    return _write_bookings(
+        [
+            {key: value for key, value in row.items() if key not in REPLAY_PRESERVED_COLUMNS}
+            for row in normalized_rows
+        ],
+        supabase,
+    )
+
+
+def _charge_rows(booking_no: str, charges: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Build the charges table rows for one booking."""
+    charge_rows = []
+    for idx, charge in enumerate(charges):
+        charge_rows.append({
+            'booking_no': booking_no,
+            'charge': charge.get('charge', ''),
+            'statute': charge.get('statute', ''),
+            'case_number': charge.get('case_number', ''),
+            'agency': charge.get('agency', ''),
+            'agency_id': charge.get('agency_id'),
+            'degree': charge.get('degree', ''),
+            'level': charge.get('level', ''),
+            'bond': charge.get('bond', ''),
+            'charge_order': idx + 1,
+        })
+    return charge_rows
 
 
 def _sync_charges(
-    charges_by_booking: Dict[str, List[Dict[str, Any]]],
+    charge_rows_by_booking: Dict[str, List[Dict[str, Any]]],
     supabase: Client,
 ) -> int:
-    logger.info(f'🧾 Syncing charges for {len(charges_by_booking)} bookings...')
-    total_charges = 0
-    for booking_no, charges in charges_by_booking.items():
-        if not charges:
-            continue
-        # Replace existing charges for this booking
-        supabase.table(PCSO_CHARGES_TABLE).delete().eq('booking_no', booking_no).execute()
-        charge_rows = []
-        for idx, charge in enumerate(charges):
-            charge_rows.append({
-                'booking_no': booking_no,
-                'charge': charge.get('charge', ''),
-                'statute': charge.get('statute', ''),
-                'case_number': charge.get('case_number', ''),
-                'agency': charge.get('agency', ''),
-                'degree': charge.get('degree', ''),
-                'level': charge.get('level', ''),
-                'bond': charge.get('bond', ''),
-                'charge_order': idx + 1,
-            })
-        supabase.table(PCSO_CHARGES_TABLE).insert(charge_rows).execute()
-        total_charges += len(charge_rows)
-    logger.info(f'🧾 Charges synced: {total_charges}')
-    return total_charges
-
-
-def _sync_photos(bookings: List[Dict[str, Any]], supabase: Client) -> tuple[int, int]:
+    """
+    Make each booking's charges match charge_rows_by_booking.
+    
+    Upserts all rows on (booking_no, charge_order) in CHARGES_BATCH_SIZE requests,
+    then deletes rows numbered past each booking's last charge with one filtered
+    request per BATCH_SIZE bookings (PCSO_DB_CONCURRENCY requests at a time).
+    Existing charges stay visible throughout. Requires supabase_charges_unique_order.sql.
+    """
+    charge_counts = {
+        booking_no: len(charge_rows)
+        for booking_no, charge_rows in charge_rows_by_booking.items()
+        if charge_rows
+    }
+    logger.info(f'🧾 Syncing charges for {len(charge_counts)} bookings...')
+    rows = [row for booking_no in charge_counts for row in charge_rows_by_booking[booking_no]]
+    
+    def _upsert_chunk(chunk: List[Dict[str, Any]]):
+        supabase.table(PCSO_CHARGES_TABLE)\
+            .upsert(chunk, on_conflict='booking_no,charge_order')\
+            .execute()
+    
+    def _delete_orphans(filters: List[str]):
+        supabase.table(PCSO_CHARGES_TABLE)\
+            .delete()\
+            .or_(','.join(filters))\
+            .execute()
+    
+    # Charges that dropped off a booking leave rows past its new last charge_order
+    orphan_filters = [
+        f'and(booking_no.eq.{quote_filter_value(booking_no)},charge_order.gt.{count})'
+        for booking_no, count in charge_counts.items()
+    ]
+    with ThreadPoolExecutor(max_workers=PCSO_DB_CONCURRENCY) as executor:
+        list(executor.map(_upsert_chunk, [
+            rows[i:i + CHARGES_BATCH_SIZE] for i in range(0, len(rows), CHARGES_BATCH_SIZE)
+        ]))
+        list(executor.map(_delete_orphans, [
+            orphan_filters[i:i + BATCH_SIZE] for i in range(0, len(orphan_filters), BATCH_SIZE)
+        ]))
+    logger.info(f'🧾 Charges synced: {len(rows)}')
+    return len(rows)
+
+
+class _RateLimiter:
+    """Spaces calls at least 1/rate seconds apart across threads (rate <= 0: no limit)."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def _load_photo_manifest(conn: sqlite3.Connection) -> Dict[str, Dict[str, Any]]:
+    """Return booking_no -> photo manifest entry."""
+    columns = ('booking_no', 'sha256', 'size', 'storage_path', 'etag', 'last_modified')
+    return {
+        row[0]: dict(zip(columns, row))
+        for row in conn.execute(f'SELECT {", ".join(columns)} FROM photo_manifest')
+    }
+
+
+def _fetch_photo(
+    session: requests.Session,
+    limiter: _RateLimiter,
+    photo_url: str,
+    entry: Optional[Dict[str, Any]],
+) -> Dict[str, Any]:
+    """
+    Check one source photo against its manifest entry, downloading it only if needed.
+    
+    Returns {'status': 'unchanged'} (304, or HEAD reports the recorded size),
+    {'status': 'missing'} (no image), or {'status': 'fetched', 'content', ...}.
+    """
+    headers = {}
+    if entry:
+        if entry['etag'] or entry['last_modified']:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+        else:
+            # No validators from the source: compare sizes before downloading
+            limiter.wait()
+            head = session.head(photo_url, timeout=20, allow_redirects=True)
+            length = head.headers.get('content-length')
+            if head.status_code == 200 and length and length.isdigit() and int(length) == entry['size']:
+                return {'status': 'unchanged'}
+    limiter.wait()
+    resp = session.get(photo_url, timeout=20, headers=headers)
+    if resp.status_code == 304:
+        return {'status': 'unchanged'}
+    content_type = resp.headers.get('content-type', 'image/jpeg')
+    if resp.status_code != 200 or 'image' not in content_type:
+        return {'status': 'missing'}
+    return {
+        'status': 'fetched',
+        'content': resp.content,
+        'content_type': content_type,
+        'sha256': hashlib.sha256(resp.content).hexdigest(),
+        'etag': resp.headers.get('ETag'),
+        'last_modified': resp.headers.get('Last-Modified'),
+    }
+
+
+def _sync_photos(
+    bookings: List[Dict[str, Any]],
+    supabase: Client,
+    bookings_written: Optional[Future] = None,
+) -> tuple[List[str], int]:
+    """
+    Upload booking photos; returns (booking numbers synced, failure count).
+    
+    Each source photo is checked against the photo manifest in PCSO_FINGERPRINT_DB
+    (conditional GET, or a HEAD size check) and only uploaded when its content hash
+    changed. Placeholder images (PCSO_PHOTO_PLACEHOLDER_HASHES, or identical bytes
+    served for PLACEHOLDER_MIN_BOOKINGS bookings) are never stored.
+    
+    PCSO_PHOTO_WORKERS threads download over one keep-alive session, at most
+    PCSO_PHOTO_RATE requests per second to the PCSO image host. Each new photo is
+    handed to PCSO_PHOTO_UPLOAD_WORKERS storage uploaders as soon as it arrives
+    (bytes already seen for another booking wait until placeholders are known).
+    photo_url is then set for every stored photo in one set_booking_photo_urls call
+    (supabase_set_booking_photo_urls.sql), after bookings_written (the booking
+    upsert, when run alongside) has finished.
+    """
     if not SUPABASE_URL:
-        return (0, 0)
+        return ([], 0)
     public_base = f'{SUPABASE_URL}/storage/v1/object/public/{PCSO_PHOTOS_BUCKET}/'
     storage = supabase.storage.from_(PCSO_PHOTOS_BUCKET)
-    synced = 0
-    failed = 0
+    
+    photo_bookings: Dict[str, Dict[str, Any]] = {}
     for booking in bookings:
         booking_no = booking.get('booking_no') or booking.get('bookingNo')
-        if not booking_no:
-            continue
-        photo_url = booking.get('photo_url') or f'{PCSO_PHOTO_BASE_URL}{booking_no}'
-        try:
-            resp = requests.get(photo_url, timeout=20)
-            content_type = resp.headers.get('content-type', 'image/jpeg')
-            if resp.status_code != 200 or 'image' not in content_type:
-                continue
+        if booking_no:
+            photo_bookings[booking_no] = booking
+    if not photo_bookings:
+        return ([], 0)
+    
+    conn = _open_fingerprint_db(PCSO_FINGERPRINT_DB)
+    try:
+        manifest = _load_photo_manifest(conn)
+        placeholders = PCSO_PHOTO_PLACEHOLDER_HASHES | {
+            row[0] for row in conn.execute('SELECT sha256 FROM photo_placeholders')
+        }
+    
+        workers = min(PCSO_PHOTO_WORKERS, len(photo_bookings))
+        session = _get_http_session()
+        limiter = _RateLimiter(PCSO_PHOTO_RATE)
+    
+        def _upload(booking_no: str, fetched: Dict[str, Any]):
             storage.upload(
                 f'{booking_no}.jpg',
-                resp.content,
+                fetched['content'],
                 file_options={
-                    'content-type': content_type,
+                    'content-type': fetched['content_type'],
                     'upsert': 'true',
                 },
             )
-            supabase.table(PCSO_BOOKINGS_TABLE).update(
-                {'photo_url': f'{public_base}{booking_no}.jpg'},
-            ).eq('booking_no', booking_no).execute()
-            synced += 1
-        except Exception as e:
-            logger.warning('⚠️  Photo sync failed for %s: %s', booking_no, e)
-            failed += 1
-    logger.info(f'🖼️  Photos synced: {synced} (failed: {failed})')
+    
+        def _needs_upload(booking_no: str, result: Dict[str, Any]) -> bool:
+            entry = manifest.get(booking_no)
+            return not (entry and entry['storage_path'] and entry['sha256'] == result['sha256'])
+    
+        # Bookings each stored photo's bytes belong to; repeats may be the placeholder
+        owners: Dict[str, set] = {}
+        for booking_no, entry in manifest.items():
+            if entry['storage_path']:
+                owners.setdefault(entry['sha256'], set()).add(booking_no)
+    
+        results: Dict[str, Dict[str, Any]] = {}
+        uploads: Dict[Future, str] = {}
+        deferred: Dict[str, Dict[str, Any]] = {}
+        uploaded: List[str] = []
+        failed = 0
+        logger.info(f'🖼️  Syncing {len(photo_bookings)} photos ({workers} workers, {PCSO_PHOTO_RATE:g}/s)...')
+        uploader = ThreadPoolExecutor(max_workers=PCSO_PHOTO_UPLOAD_WORKERS)
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as fetcher:
+                # 1) Check / download every source photo, uploading new bytes as they arrive
+                futures = {
+                    fetcher.submit(
+                        _fetch_photo,
+                        session,
+                        limiter,
+                        booking.get('photo_url') or f'{PCSO_PHOTO_BASE_URL}{booking_no}',
+                        manifest.get(booking_no),
+                    ): booking_no
+                    for booking_no, booking in photo_bookings.items()
+                }
+                for future in as_completed(futures):
+                    booking_no = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        logger.warning('⚠️  Photo sync failed for %s: %s', booking_no, e)
+                        failed += 1
+                        continue
+                    results[booking_no] = result
+                    if result['status'] != 'fetched' or result['sha256'] in placeholders:
+                        continue
+                    sha_owners = owners.setdefault(result['sha256'], set())
+                    sha_owners.add(booking_no)
+                    if not _needs_upload(booking_no, result):
+                        continue
+                    if len(sha_owners) == 1:
+                        uploads[uploader.submit(_upload, booking_no, result)] = booking_no
+                    else:
+                        deferred[booking_no] = result
+        
+            # 2) Learn placeholders: real mugshots are unique, the "no image" response isn't
+            learned = {
+                sha256 for sha256, booking_nos in owners.items()
+                if len(booking_nos) >= PLACEHOLDER_MIN_BOOKINGS and sha256 not in placeholders
+            }
+            for sha256 in learned:
+                logger.info(f'🚫 Learned placeholder photo {sha256[:12]} (served for {len(owners[sha256])} bookings)')
+            placeholders |= learned
+            for booking_no, result in deferred.items():
+                if result['sha256'] not in placeholders:
+                    uploads[uploader.submit(_upload, booking_no, result)] = booking_no
+        
+            for future in as_completed(uploads):
+                booking_no = uploads[future]
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.warning('⚠️  Photo upload failed for %s: %s', booking_no, e)
+                    failed += 1
+                    continue
+                if results[booking_no]['sha256'] in placeholders:
+                    # Uploaded before these bytes were recognized as the placeholder
+                    try:
+                        storage.remove([f'{booking_no}.jpg'])
+                    except Exception as e:
+                        logger.warning('⚠️  Could not remove placeholder photo for %s: %s', booking_no, e)
+                    continue
+                uploaded.append(booking_no)
+        finally:
+            uploader.shutdown(wait=True)
+    
+        # 3) Photos already in storage that needed no upload
+        stored: List[str] = []
+        for booking_no, result in results.items():
+            entry = manifest.get(booking_no)
+            if result['status'] == 'unchanged':
+                if entry['storage_path'] and entry['sha256'] not in placeholders:
+                    stored.append(booking_no)
+            elif (result['status'] == 'fetched' and result['sha256'] not in placeholders
+                    and not _needs_upload(booking_no, result)):
+                stored.append(booking_no)
+    
+        # Point photo_url at storage in one batched call. Only that column is
+        # updated, so a queued retry can't roll back newer booking data; it must
+        # land after the booking upsert, which writes the source photo_url.
+        if bookings_written is not None:
+            bookings_written.result()
+        synced: List[str] = []
+        to_point = stored + uploaded
+        if to_point:
+            try:
+                supabase.rpc(
+                    PCSO_PHOTO_URL_RPC,
+                    {'booking_nos': to_point, 'base': public_base},
+                ).execute()
+                synced = to_point
+            except Exception as e:
+                logger.warning(f'⚠️  photo_url update failed for {len(to_point)} bookings: {e}')
+                failed += len(to_point)
+    
+        # Record what the source served (placeholders with no storage path)
+        now = datetime.now().isoformat()
+        uploaded_set = set(uploaded)
+        manifest_rows = []
+        for booking_no, result in results.items():
+            if result['status'] != 'fetched':
+                continue
+            if result['sha256'] in placeholders:
+                storage_path = None
+            elif booking_no in uploaded_set or booking_no in stored:
+                storage_path = f'{booking_no}.jpg'
+            else:
+                continue  # upload failed; retry next run
+            manifest_rows.append((
+                booking_no, result['sha256'], len(result['content']), storage_path,
+                result['etag'], result['last_modified'], now,
+            ))
+        with conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO photo_manifest VALUES (?, ?, ?, ?, ?, ?, ?)',
+                manifest_rows,
+            )
+            conn.executemany(
+                'INSERT OR IGNORE INTO photo_placeholders VALUES (?)',
+                [(sha256,) for sha256 in learned],
+            )
+            conn.executemany(
+                'UPDATE photo_manifest SET storage_path = NULL WHERE sha256 = ?',
+                [(sha256,) for sha256 in learned],
+            )
+    finally:
+        conn.close()
+    
+    unchanged = sum(1 for result in results.values() if result['status'] == 'unchanged')
+    logger.info(
+        f'🖼️  Photos synced: {len(synced)} (uploaded: {len(uploaded)}, '
+        f'unchanged at source: {unchanged}, failed: {failed})'
+    )
     return (synced, failed)
 
+# =====================================================
+# WORK QUEUE (FOLLOW-UP TASKS)
+# =====================================================
+
+def _photo_task(booking: Dict[str, Any], normalized: Dict[str, Any]) -> tuple:
+    """Work queue entry syncing one booking's photo (payload: the parsed booking)."""
+    return (
+        'photo',
+        normalized['booking_no'],
+        normalized['booking_no'],
+        normalized.get('booking_date') or '',
+        json.dumps(booking, default=str),
+    )
+
+
+def _enqueue_tasks(conn: sqlite3.Connection, tasks: List[tuple], replace: bool = True):
+    """
+    Add (kind, task_key, booking_no, priority, payload) tasks to the work queue.
+    
+    replace=True resets an existing task to the new payload, due now;
+    replace=False leaves an existing task (and its backoff) alone.
+    """
+    now = datetime.now(ZoneInfo('UTC')).isoformat(timespec='seconds')
+    verb = 'INSERT OR REPLACE' if replace else 'INSERT OR IGNORE'
+    conn.executemany(
+        f'{verb} INTO work_queue '
+        '(kind, task_key, booking_no, priority, payload, attempts, next_attempt_at, enqueued_at) '
+        'VALUES (?, ?, ?, ?, ?, 0, ?, ?)',
+        [(*task, now, now) for task in tasks],
+    )
+
+
+def _run_queued_tasks(
+    kind: str,
+    tasks: List[Dict[str, Any]],
+    supabase: Client,
+    bookings_written: Optional[Future],
+) -> tuple[List[str], int]:
+    """Run one kind's tasks as a batch; returns (task keys done, rows / photos synced)."""
+    if kind == 'charges':
+        # Charges reference their booking, so they go after the booking rows
+        if bookings_written is not None:
+            bookings_written.result()
+        rows = _sync_charges({task['booking_no']: task['payload'] for task in tasks}, supabase)
+        return ([task['task_key'] for task in tasks], rows)
+    if kind == 'photo':
+        synced, _ = _sync_photos([task['payload'] for task in tasks], supabase, bookings_written)
+        synced = set(synced)
+        # Anything not stored (failed, or no photo yet) is retried later
+        return ([task['task_key'] for task in tasks if task['booking_no'] in synced], len(synced))
+    if kind == 'transition':
+        supabase.table(PCSO_TRANSITIONS_TABLE).insert([task['payload'] for task in tasks]).execute()
+        return ([task['task_key'] for task in tasks], len(tasks))
+    raise ValueError(f'Unknown work queue task kind: {kind}')
+
+
+def drain_work_queue(
+    supabase: Client,
+    bookings_written: Optional[Future] = None,
+    kinds: Optional[tuple] = None,
+    time_budget: Optional[float] = None,
+) -> Dict[str, Any]:
+    """
+    Run due follow-up tasks from the work queue until it is empty or time runs out.
+    
+    Tasks are taken BATCH_SIZE at a time, newest bookings first, and each kind in a
+    batch runs as one bulk sync (kinds in parallel). The budget
+    (PCSO_QUEUE_TIME_BUDGET seconds) is checked between batches; tasks left over
+    wait for the next run. A failed task is retried after QUEUE_RETRY_BASE_SECONDS,
+    doubling per attempt up to QUEUE_RETRY_MAX_SECONDS. bookings_written (the
+    booking upsert, when run alongside) must finish before charges and photo_url
+    are written; if it fails, draining stops with the remaining tasks untouched.
+    
+    Returns:
+        {'tasks_done', 'tasks_retrying', 'tasks_left', 'charges_synced',
+         'photos_synced', 'transitions_recorded', 'photos_done': [booking_no, ...]}
+    """
+    budget = PCSO_QUEUE_TIME_BUDGET if time_budget is None else time_budget
+    deadline = time.monotonic() + budget
+    kind_filter = ''
+    kind_params: tuple = ()
+    if kinds:
+        kind_filter = f' AND kind IN ({", ".join("?" for _ in kinds)})'
+        kind_params = tuple(kinds)
+    result: Dict[str, Any] = {
+        'tasks_done': 0,
+        'tasks_retrying': 0,
+        'tasks_left': 0,
+        'charges_synced': 0,
+        'photos_synced': 0,
+        'transitions_recorded': 0,
+        'photos_done': [],
+    }
+    synced_keys = {'charges': 'charges_synced', 'photo': 'photos_synced', 'transition': 'transitions_recorded'}
+    
+    conn = _open_fingerprint_db(PCSO_FINGERPRINT_DB)
+    try:
+        stopped = False
+        while not stopped and time.monotonic() < deadline:
+            now = datetime.now(ZoneInfo('UTC'))
+            rows = conn.execute(
+                'SELECT kind, task_key, booking_no, payload, attempts FROM work_queue '
+                f'WHERE next_attempt_at <= ?{kind_filter} '
+                'ORDER BY priority DESC, enqueued_at LIMIT ?',
+                (now.isoformat(timespec='seconds'), *kind_params, BATCH_SIZE),
+            ).fetchall()
+            if not rows:
+                break
+            by_kind: Dict[str, List[Dict[str, Any]]] = {}
+            for kind, task_key, booking_no, payload, attempts in rows:
+                by_kind.setdefault(kind, []).append({
+                    'task_key': task_key,
+                    'booking_no': booking_no,
+                    'payload': json.loads(payload),
+                    'attempts': attempts,
+                })
+            
+            done: List[tuple] = []
+            retries: List[tuple] = []
+            photos_done: List[str] = []
+            with ThreadPoolExecutor(max_workers=len(by_kind)) as executor:
+                futures = {
+                    executor.submit(_run_queued_tasks, kind, tasks, supabase, bookings_written): kind
+                    for kind, tasks in by_kind.items()
+                }
+                for future in as_completed(futures):
+                    kind = futures[future]
+                    tasks = by_kind[kind]
+                    try:
+                        done_keys, synced = future.result()
+                        error = f'{kind} not synced'
+                    except Exception as e:
+                        if bookings_written is not None and bookings_written.done() and bookings_written.exception():
+                            stopped = True
+                            continue
+                        logger.warning(f'⚠️  {len(tasks)} queued {kind} tasks failed: {e}')
+                        done_keys, synced, error = [], 0, str(e)[:500]
+                    result[synced_keys[kind]] += synced
+                    done_set = set(done_keys)
+                    for task in tasks:
+                        if task['task_key'] in done_set:
+                            done.append((kind, task['task_key']))
+                            if kind == 'photo':
+                                photos_done.append(task['booking_no'])
+                        else:
+                            delay = min(QUEUE_RETRY_MAX_SECONDS, QUEUE_RETRY_BASE_SECONDS * 2 ** task['attempts'])
+                            retries.append((
+                                (now + timedelta(seconds=delay)).isoformat(timespec='seconds'),
+                                error,
+                                kind,
+                                task['task_key'],
+                            ))
+            
+            with conn:
+                conn.executemany('DELETE FROM work_queue WHERE kind = ? AND task_key = ?', done)
+                conn.executemany(
+                    'UPDATE work_queue SET attempts = attempts + 1, next_attempt_at = ?, last_error = ? '
+                    'WHERE kind = ? AND task_key = ?',
+                    retries,
+                )
+                conn.executemany(
+                    'UPDATE booking_fingerprints SET photo_synced = 1 WHERE booking_no = ?',
+                    [(booking_no,) for booking_no in photos_done],
+                )
+            result['photos_done'].extend(photos_done)
+            result['tasks_done'] += len(done)
+            result['tasks_retrying'] += len(retries)
+        
+        now_iso = datetime.now(ZoneInfo('UTC')).isoformat(timespec='seconds')
+        result['tasks_left'], deferred = conn.execute(
+            'SELECT COUNT(*), COALESCE(SUM(next_attempt_at <= ?), 0) FROM work_queue'
+            f' WHERE 1 = 1{kind_filter}',
+            (now_iso, *kind_params),
+        ).fetchone()
+    finally:
+        conn.close()
+    
+    if result['tasks_done'] or result['tasks_left']:
+        logger.info(
+            f'📬 Work queue: {result["tasks_done"]} done, {result["tasks_retrying"]} to retry, '
+            f'{result["tasks_left"]} left for later runs ({deferred} already due)'
+        )
+    return result
+
+# =====================================================
+# ARCHIVE REPLAY
+# =====================================================
+
+def _reparse_archived_page(entry: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Worker process: parse one archived page."""
+    return parse_jail_log_html(read_page(PCSO_ARCHIVE_DIR, entry))
+
+
+def reparse_archive(archive_range: str, supabase: Client, workers: Optional[int] = None) -> Dict[str, int]:
+    """
+    Replay archived pages fetched in archive_range through the parser and upsert them.
+    
+    Pages are parsed in parallel worker processes (each distinct page once). When a
+    booking appears on several pages the most recently fetched one wins, so end the
+    range at the present to avoid rolling bookings back. Nothing is fetched from
+    smartweb.pcso.us: photo sync and the roster diff are skipped, and bookings
+    already in Supabase keep their photo_url and released_date.
+    """
+    start, end = parse_archive_range(archive_range)
+    entries = list(iter_archive(PCSO_ARCHIVE_DIR, start, end))
+    if not entries:
+        logger.warning(f'⚠️  No archived pages in {archive_range} ({PCSO_ARCHIVE_DIR})')
+        return {'pages': 0, 'bookings': 0}
+    
+    # Parse each distinct page once; it counts as fetched at its latest fetch
+    latest: Dict[str, Dict[str, Any]] = {}
+    for entry in entries:
+        latest[entry['sha256']] = entry
+    pages = sorted(latest.values(), key=lambda entry: entry['fetched_at'])
+    logger.info(
+        f'🗄️  Reparsing {len(pages)} distinct pages ({len(entries)} fetches) '
+        f'with {workers or os.cpu_count()} worker processes...'
+    )
+    
+    merged: Dict[str, List[Dict[str, Any]]] = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # map() returns in submission order (oldest first), so newer pages overwrite
+        for entry, bookings in zip(pages, executor.map(_reparse_archived_page, pages)):
+            by_booking: Dict[str, List[Dict[str, Any]]] = {}
+            for booking in bookings:
+                by_booking.setdefault(booking.get('booking_no'), []).append(booking)
+            merged.update(by_booking)
+    bookings = [booking for group in merged.values() for booking in group]
+    logger.info(f'📊 {len(merged)} distinct bookings across {len(pages)} pages')
+    
+    result = upsert_bookings(bookings, supabase, sync_photos=False, replay=True)
+    result['pages'] = len(pages)
+    result['bookings'] = len(merged)
+    return result
+
+
+# =====================================================
+# IMPORT RUN AND SERVICE MODE (ADAPTIVE POLLING)
+# =====================================================
+
+def run_import(supabase: Client, force: bool = False) -> Dict[str, Any]:
+    """
+    Fetch the jail log once and import whatever changed.
+    
+    Returns upsert_bookings' counts plus 'status': 'not_modified' (HTTP 304),
+    'unchanged' (same bookings hash), 'empty' (nothing parsed) or 'imported'.
+    """
+    # Fetch bookings from PCSO (conditional on the last successful import)
+    fetch_state = {} if force else load_fetch_state()
+    previous_hash = fetch_state.get('content_hash')
+    bookings = fetch_pcso_bookings(fetch_state)
+    
+    if bookings is None:
+        logger.info('⏭️  Nothing to import')
+        drained = drain_work_queue(supabase)
+        return {'status': 'not_modified', 'new': 0, 'queued': drained['tasks_left']}
+    
+    if not bookings:
+        logger.warning('⚠️  No bookings fetched. Check fetch_pcso_bookings() implementation.')
+        logger.warning('   This script needs to be customized for PCSO website structure.')
+        return {'status': 'empty', 'new': 0}
+    
+    content_hash = booking_section_hash(bookings)
+    if content_hash == previous_hash:
+        logger.info('⏭️  Booking section unchanged since the last import; skipping database writes')
+        fetch_state['checked_at'] = datetime.now().isoformat()
+        save_fetch_state(fetch_state)
+        drained = drain_work_queue(supabase)
+        return {'status': 'unchanged', 'new': 0, 'queued': drained['tasks_left']}
+    
+    # Releases / status transitions since the last run (stamps released_date)
+    if PCSO_TRACK_TRANSITIONS:
+        record_transitions(diff_roster(bookings))
+    
+    # Upsert to database
+    result = upsert_bookings(bookings, supabase, skip_unchanged=not force)
+    
+    # Follow-up work that failed or ran out of time stays in the work queue,
+    # so the page itself is done
+    fetch_state['content_hash'] = content_hash
+    fetch_state['imported_at'] = datetime.now().isoformat()
+    save_fetch_state(fetch_state)
+    
+    result['status'] = 'imported'
+    return result
+
+
+# Time constant of the recent arrival rate (seconds)
+RECENT_RATE_WINDOW = 3600
+# How far an hour of observations moves that hour-of-day's expected rate
+HOURLY_RATE_WEIGHT = 0.25
+# Poll about once per this many expected new bookings
+BOOKINGS_PER_POLL = 1.0
+
+
+def _load_poll_state() -> Dict[str, Any]:
+    if not POLL_STATE_PATH.exists():
+        return {}
+    try:
+        return json.loads(POLL_STATE_PATH.read_text())
+    except (OSError, ValueError) as e:
+        logger.warning(f'⚠️  Ignoring unreadable poll state {POLL_STATE_PATH}: {e}')
+        return {}
+
+
+def _save_poll_state(poll_state: Dict[str, Any]):
+    POLL_STATE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = POLL_STATE_PATH.with_suffix('.tmp')
+    tmp_path.write_text(json.dumps(poll_state, indent=2))
+    tmp_path.replace(POLL_STATE_PATH)
+
+
+def _record_poll(poll_state: Dict[str, Any], new_bookings: int, polled_at: datetime):
+    """
+    Fold one poll's new-booking count into the arrival rate estimates (per hour).
+    
+    recent_rate is an exponentially weighted rate over about the last
+    RECENT_RATE_WINDOW; hourly_rates keeps one slowly moving rate per local hour of
+    day, so the service already knows the evening rush before it starts.
+    """
+    last_poll_at = poll_state.get('last_poll_at')
+    poll_state['last_poll_at'] = polled_at.isoformat(timespec='seconds')
+    if not last_poll_at:
+        return
+    elapsed = (polled_at - datetime.fromisoformat(last_poll_at)).total_seconds()
+    if elapsed <= 0:
+        return
+    # The page only covers 24 hours; arrivals before that were never visible
+    elapsed = min(elapsed, 86400)
+    observed_rate = new_bookings * 3600 / elapsed
+    
+    recent_rate = poll_state.get('recent_rate')
+    if recent_rate is None:
+        poll_state['recent_rate'] = observed_rate
+    else:
+        weight = 1 - math.exp(-elapsed / RECENT_RATE_WINDOW)
+        poll_state['recent_rate'] = recent_rate + weight * (observed_rate - recent_rate)
+    
+    hour = str(polled_at.astimezone(ZoneInfo('America/New_York')).hour)
+    hourly_rates = poll_state.setdefault('hourly_rates', {})
+    if hour not in hourly_rates:
+        hourly_rates[hour] = observed_rate
+    else:
+        weight = HOURLY_RATE_WEIGHT * min(1.0, elapsed / 3600)
+        hourly_rates[hour] += weight * (observed_rate - hourly_rates[hour])
+
+
+def next_poll_interval(poll_state: Dict[str, Any], now: datetime) -> float:
+    """
+    Seconds until the next poll: about one expected new booking away.
+    
+    Uses the higher of the recent arrival rate and the usual rate for this hour
+    of day, bounded by PCSO_POLL_MIN_SECONDS / PCSO_POLL_MAX_SECONDS and never
+    faster than PCSO_POLL_MAX_PER_HOUR allows.
+    """
+    rate = poll_state.get('recent_rate') or 0.0
+    hour = str(now.astimezone(ZoneInfo('America/New_York')).hour)
+    rate = max(rate, poll_state.get('hourly_rates', {}).get(hour) or 0.0)
+    
+    interval = BOOKINGS_PER_POLL * 3600 / rate if rate > 0 else PCSO_POLL_MAX_SECONDS
+    floor = max(PCSO_POLL_MIN_SECONDS, 3600 / PCSO_POLL_MAX_PER_HOUR)
+    return min(PCSO_POLL_MAX_SECONDS, max(floor, interval))
+
+
+def serve(supabase: Client):
+    """
+    Poll the jail log until SIGTERM / SIGINT, importing whatever changed.
+    
+    The Supabase client and the HTTP session stay open between polls, and each
+    poll is a conditional request, so a quiet poll costs one 304 (or one parse).
+    The interval follows the booking arrival rate (next_poll_interval). At most
+    PCSO_POLL_MAX_PER_HOUR page requests are made in any hour, including retries;
+    failed polls back off exponentially up to PCSO_POLL_MAX_SECONDS.
+    """
+    stop = threading.Event()
+    
+    def _request_stop(signum, frame):
+        logger.info(f'🛑 Received signal {signum}; stopping')
+        stop.set()
+    
+    signal.signal(signal.SIGTERM, _request_stop)
+    signal.signal(signal.SIGINT, _request_stop)
+    
+    poll_state = _load_poll_state()
+    recent_polls: deque = deque()
+    failures = 0
+    logger.info(
+        f'🔁 Serving: polls every {PCSO_POLL_MIN_SECONDS}-{PCSO_POLL_MAX_SECONDS}s, '
+        f'at most {PCSO_POLL_MAX_PER_HOUR} per hour'
+    )
+    
+    while not stop.is_set():
+        # Politeness budget: sliding one-hour window of page requests
+        now = time.monotonic()
+        while recent_polls and now - recent_polls[0] >= 3600:
+            recent_polls.popleft()
+        if len(recent_polls) >= PCSO_POLL_MAX_PER_HOUR:
+            wait = 3600 - (now - recent_polls[0])
+            logger.info(f'⏳ Poll budget spent ({PCSO_POLL_MAX_PER_HOUR}/hour); waiting {wait / 60:.1f} min')
+            stop.wait(wait)
+            continue
+        recent_polls.append(now)
+        
+        polled_at = datetime.now(ZoneInfo('UTC'))
+        try:
+            result = run_import(supabase)
+        except Exception as e:
+            logger.error(f'❌ Poll failed: {e}')
+            result = None
+        
+        if result is None or result['status'] == 'empty':
+            failures += 1
+            interval = min(PCSO_POLL_MAX_SECONDS, PCSO_POLL_MIN_SECONDS * 2 ** failures)
+            logger.warning(f'⚠️  {failures} failed poll(s) in a row; retrying in {interval / 60:.1f} min')
+        else:
+            failures = 0
+            _record_poll(poll_state, result.get('new', 0), polled_at)
+            try:
+                _save_poll_state(poll_state)
+            except OSError as e:
+                logger.warning(f'⚠️  Could not save poll state: {e}')
+            interval = next_poll_interval(poll_state, polled_at)
+            logger.info(
+                f'💤 {result["status"]}: {result.get("new", 0)} new, '
+                f'~{poll_state.get("recent_rate") or 0:.1f} bookings/hour; '
+                f'next poll in {interval / 60:.1f} min'
+            )
+        stop.wait(interval)
+    
+    logger.info('👋 Service stopped')
+
 # =====================================================
 # MAIN FUNCTION
 # =====================================================
 
 def main():
     """Main import function"""
+    parser = argparse.ArgumentParser(description='Import PCSO jail log bookings into Supabase')
+    parser.add_argument(
+        '--check-parsers',
+        nargs='+',
+        metavar='HTML_FILE',
+        help='Parse recorded jail log pages with every installed HTML backend, compare, and exit',
+    )
+    parser.add_argument(
+        '--force',
+        action='store_true',
+        help='Ignore saved state: fetch unconditionally and rewrite every booking even if unchanged',
+    )
+    parser.add_argument(
+        '--reparse',
+        metavar='ARCHIVE_RANGE',
+        help=(
+            'Replay archived pages instead of fetching: all, a date (2026-01-15), '
+            'or START..END (2026-01-01..); newest page wins per booking'
+        ),
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=None,
+        help='Worker processes for --reparse (default: CPU count)',
+    )
+    parser.add_argument(
+        '--serve',
+        action='store_true',
+        help='Run as a service: poll the jail log on an adaptive interval until stopped',
+    )
+    args = parser.parse_args()
+    
+    if args.check_parsers:
+        sys.exit(0 if check_parser_parity(args.check_parsers) else 1)
+    
+    if args.reparse:
+        logger.info('=' * 60)
+        logger.info(f'🗄️  PCSO JAIL LOG REPARSE: {args.reparse}')
+        logger.info('=' * 60)
+        try:
+            supabase = get_supabase_client()
+            result = reparse_archive(args.reparse, supabase, args.workers)
+            logger.info(
+                f'✅ Reparse complete: {result.get("pages", 0)} pages, '
+                f'{result.get("bookings", 0)} bookings, {result.get("inserted", 0)} written'
+            )
+            sys.exit(0)
+        except Exception as e:
+            logger.error(f'❌ Reparse error: {e}')
+            import traceback
+            traceback.print_exc()
+            sys.exit(1)
+    
+    if args.serve:
+        logger.info('=' * 60)
+        logger.info('🔁 PCSO JAIL LOG SERVICE')
+        logger.info('=' * 60)
+        try:
+            supabase = get_supabase_client()
+            logger.info('✅ Connected to Supabase')
+            serve(supabase)
+            sys.exit(0)
+        except Exception as e:
+            logger.error(f'❌ Service error: {e}')
+            import traceback
+            traceback.print_exc()
+            sys.exit(1)
+    
     logger.info('=' * 60)
     logger.info('🚀 PCSO JAIL LOG IMPORT')
     logger.info('=' * 60)
@@ -921,29 +2320,28 @@ def main():
         supabase = get_supabase_client()
         logger.info('✅ Connected to Supabase')
         
-        # Fetch bookings from PCSO
-        bookings = fetch_pcso_bookings()
-        
-        if not bookings:
-            logger.warning('⚠️  No bookings fetched. Check fetch_pcso_bookings() implementation.')
-            logger.warning('   This script needs to be customized for PCSO website structure.')
+        result = run_import(supabase, force=args.force)
+        if result['status'] == 'empty':
             sys.exit(1)
-        
-        # Upsert to database
-        result = upsert_bookings(bookings, supabase)
+        if result['status'] != 'imported':
+            sys.exit(0)
         
         logger.info('')
         logger.info('=' * 60)
         logger.info('✅ IMPORT COMPLETE')
         logger.info('=' * 60)
         logger.info(f'📊 Records processed: {result["inserted"]}')
+        if result.get('unchanged') is not None:
+            logger.info(
+                f'🧮 New: {result["new"]}, changed: {result["changed"]}, '
+                f'unchanged: {result["unchanged"]}'
+            )
         if result.get('charges_synced') is not None:
             logger.info(f'🧾 Charges synced: {result["charges_synced"]}')
         if result.get('photos_synced') is not None:
-            logger.info(
-                f'🖼️  Photos synced: {result["photos_synced"]} '
-                f'(failed: {result.get("photo_failures", 0)})',
-            )
+            logger.info(f'🖼️  Photos synced: {result["photos_synced"]}')
+        if result.get('queued'):
+            logger.info(f'📬 Follow-up tasks left for later runs: {result["queued"]}')
         logger.info(f'📅 Completed: {datetime.now()}')
         
         sys.exit(0)
@@ -12,6 +12,7 @@ class AppConfig {
   static const String criminalBackHistoryTable = 'criminal_back_history';
   static const String newsArticlesTable = 'news_articles';
   static const String agencyStatsTable = 'agency_stats';
+  static const String agencyStatsLatestTable = 'agency_stats_latest';
 
   // Supabase Storage Buckets
   static const String bookingPhotosBucket = 'pcso-booking-photos';
@@ -10,11 +10,17 @@ import '../models/agency_stats.dart';
 /// Abstract repository for agency statistics operations
 abstract class AgencyStatsRepository {
   /// Get comprehensive statistics for a specific agency
-  Future<AgencyStats> getAgencyStats(String agencyId, String agencyName);
+  ///
+  /// [timeRange] is one of THISYEAR, 5YEARS or ALL.
+  Future<AgencyStats> getAgencyStats(
+    String agencyId,
+    String agencyName, {
+    String timeRange = '5YEARS',
+  });
 }
 
 /// Supabase implementation of AgencyStatsRepository
-/// Now reads from pre-calculated agency_stats table instead of calculating on-the-fly
+/// Now reads from pre-calculated agency_stats_latest table instead of calculating on-the-fly
 class SupabaseAgencyStatsRepository implements AgencyStatsRepository {
   SupabaseAgencyStatsRepository(this._client);
 
@@ -23,19 +29,19 @@ class SupabaseAgencyStatsRepository implements AgencyStatsRepository {
   @override
   Future<AgencyStats> getAgencyStats(
     String agencyId,
-    String agencyName,
-  ) async {
+    String agencyName, {
+    String timeRange = '5YEARS',
+  }) async {
     try {
-      debugPrint('[AgencyStats] Fetching pre-calculated stats for $agencyId from ${AppConfig.agencyStatsTable}');
+      debugPrint('[AgencyStats] Fetching pre-calculated stats for $agencyId from ${AppConfig.agencyStatsLatestTable}');
 
       // Get the latest calculated stats for this agency
       try {
         final response = await _client
-            .from(AppConfig.agencyStatsTable)
+            .from(AppConfig.agencyStatsLatestTable)
             .select()
             .eq('agency_id', agencyId)
-            .order('calculated_at', ascending: false)
-            .limit(1)
+            .eq('time_range', timeRange)
             .single()
             .timeout(AppConfig.defaultTimeout);
 
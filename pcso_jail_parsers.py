@@ -0,0 +1,430 @@
+#!/usr/bin/env python3
+"""
+HTML parser backends for the PCSO jail log.
+
+Every backend splits the jail log into booking cards and returns the same plain
+data for each card, so import_pcso_bookings.py can build bookings without caring
+which HTML library parsed the page:
+
+    {
+        'header_text': 'ALBARRAN, EMETERIO (W/ MALE )',   # None if the card has no header
+        'info_grid': {'Status:': 'In Jail', 'Booking No:': 'PCSO26JBN000160', ...},
+        'raw_card_text': 'ALBARRAN, EMETERIO\\n...',
+        'holds_cells': ['HOLDS', 'TABLET'],               # None if there is no holds table
+        'charge_rows': [['[+]', '893.13.6a', ...], ...],  # None if there is no charges table
+    }
+
+Backends:
+- bs4: BeautifulSoup with Python's html.parser (pure Python, always works)
+- lxml: lxml.html (libxml2)
+- selectolax: selectolax's Lexbor parser (fastest; default when installed)
+
+Text is extracted the way BeautifulSoup's get_text(separator, strip=True) does it
+(every text node stripped, empty ones dropped, comments and script/style skipped).
+The one structural difference: html.parser nests each charge's hidden description
+row inside the charge row, so bs4 charge rows carry a trailing extra cell that lxml
+and selectolax don't; charge extraction only reads the first seven cells, so every
+backend yields the same bookings. Check that against recorded pages with:
+
+    python3 import_pcso_bookings.py --check-parsers pcso_jail.html
+
+Usage:
+    from pcso_jail_parsers import parse_booking_cards
+
+    cards = parse_booking_cards(html, 'selectolax')
+"""
+
+import logging
+import re
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+try:
+    from bs4 import BeautifulSoup
+    HAS_BEAUTIFULSOUP = True
+except ImportError:
+    HAS_BEAUTIFULSOUP = False
+
+try:
+    import lxml.html
+    from lxml import etree
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+    HAS_SELECTOLAX = True
+except ImportError:
+    HAS_SELECTOLAX = False
+
+logger = logging.getLogger(__name__)
+
+BOOKING_NO_LABEL_RE = re.compile(r'Booking No:', re.IGNORECASE)
+_SKIPPED_TEXT_TAGS = ('script', 'style')
+
+# =====================================================
+# CARD SEGMENTATION (SHARED)
+# =====================================================
+
+
+def pair_booking_tables(
+    tables: List[Tuple[str, List[str], bool]],
+) -> List[Tuple[int, Optional[int], Optional[int]]]:
+    """
+    Pair booking info tables with their holds and charges tables in one pass.
+
+    tables lists every <table> in document order as (id, classes, mentions
+    "Booking No:"). Returns (info, holds, charges) indexes for every table that
+    mentions "Booking No:" (JailViewCharges tables excluded). A card's holds and
+    charges tables are the first JailViewHolds / JailViewCharges tables after it and
+    before the next table that mentions "Booking No:"; either may be None.
+    """
+    cards: List[Tuple[int, Optional[int], Optional[int]]] = []
+    next_info = None
+    next_holds = None
+    next_charges = None
+    # Walk backwards so each table sees the nearest following info/holds/charges table
+    for index in range(len(tables) - 1, -1, -1):
+        table_id, table_classes, mentions_booking_no = tables[index]
+        if mentions_booking_no:
+            if 'JailViewCharges' not in table_classes:
+                holds = next_holds if next_holds is not None and (
+                    next_info is None or next_holds < next_info
+                ) else None
+                charges = next_charges if next_charges is not None and (
+                    next_info is None or next_charges < next_info
+                ) else None
+                cards.append((index, holds, charges))
+            next_info = index
+        if table_id == 'JailViewHolds':
+            next_holds = index
+        elif table_id == 'JailViewCharges' or 'JailViewCharges' in table_classes:
+            next_charges = index
+    cards.reverse()
+    return cards
+
+
+def _join_strings(strings, separator: str) -> str:
+    """Join text nodes like BeautifulSoup's get_text(separator, strip=True)."""
+    return separator.join(text for text in (s.strip() for s in strings) if text)
+
+
+def _build_cards(
+    tables: List[Any],
+    mentions_booking_no: List[bool],
+    table_id: Callable[[Any], str],
+    table_classes: Callable[[Any], List[str]],
+    extract_card: Callable[[Any, Any, Any], Dict[str, Any]],
+) -> List[Dict[str, Any]]:
+    entries = [
+        (table_id(table), table_classes(table), mentions)
+        for table, mentions in zip(tables, mentions_booking_no)
+    ]
+    cards: List[Dict[str, Any]] = []
+    for info, holds, charges in pair_booking_tables(entries):
+        try:
+            cards.append(extract_card(
+                tables[info],
+                tables[holds] if holds is not None else None,
+                tables[charges] if charges is not None else None,
+            ))
+        except Exception as e:
+            logger.warning(f'⚠️  Error parsing booking table: {e}')
+    return cards
+
+
+# =====================================================
+# BEAUTIFULSOUP (html.parser) BACKEND
+# =====================================================
+
+
+def _bs4_info_grid(table) -> Dict[str, str]:
+    """
+    Map each InmateInfoGridTd cell's text to the text of the cell after it.
+
+    Labels keep their trailing colon ("Booking No:"). Value cells share the class,
+    so values end up as keys too; they are harmless because lookups use labels.
+    The first occurrence of a label wins, matching a top-down scan of the table.
+    """
+    info_grid: Dict[str, str] = {}
+    for td in table.find_all('td', class_='InmateInfoGridTd'):
+        label = td.get_text(' ', strip=True)
+        if not label or label in info_grid:
+            continue
+        value_td = td.find_next_sibling('td')
+        if value_td:
+            info_grid[label] = value_td.get_text(' ', strip=True)
+    return info_grid
+
+
+def _bs4_card(table, holds_table, charges_table) -> Dict[str, Any]:
+    header = table.find('td', class_='SearchHeader')
+    return {
+        'header_text': ' '.join(header.stripped_strings) if header else None,
+        'info_grid': _bs4_info_grid(table),
+        'raw_card_text': table.get_text('\n', strip=True),
+        'holds_cells': [
+            cell.get_text(' ', strip=True) for cell in holds_table.find_all('td')
+        ] if holds_table is not None else None,
+        'charge_rows': [
+            [cell.get_text(' ', strip=True) for cell in row.find_all('td')]
+            for row in charges_table.find_all('tr')
+        ] if charges_table is not None else None,
+    }
+
+
+def segment_soup(soup) -> List[Dict[str, Any]]:
+    """Split an already-parsed BeautifulSoup document into booking cards."""
+    # Mark every table containing a "Booking No:" string by walking up from each
+    # match once, stopping at a table that is already marked.
+    booking_tables: Set[int] = set()
+    for text in soup.find_all(string=BOOKING_NO_LABEL_RE):
+        for parent in text.parents:
+            if parent.name != 'table':
+                continue
+            if id(parent) in booking_tables:
+                break
+            booking_tables.add(id(parent))
+    tables = soup.find_all('table')
+    return _build_cards(
+        tables,
+        [id(table) in booking_tables for table in tables],
+        lambda table: table.get('id', ''),
+        lambda table: table.get('class') or [],
+        _bs4_card,
+    )
+
+
+def parse_cards_bs4(html: str) -> List[Dict[str, Any]]:
+    if not HAS_BEAUTIFULSOUP:
+        raise ImportError('BeautifulSoup4 is required for the bs4 parser backend')
+    return segment_soup(BeautifulSoup(html, 'html.parser'))
+
+
+# =====================================================
+# LXML BACKEND
+# =====================================================
+
+
+def _lxml_strings(element):
+    """Yield the text nodes under element in document order."""
+    for event, node in etree.iterwalk(element, events=('start', 'end')):
+        is_element = isinstance(node.tag, str)
+        if event == 'start':
+            if is_element and node.text and node.tag not in _SKIPPED_TEXT_TAGS:
+                yield node.text
+        elif node is not element and node.tail:
+            yield node.tail
+
+
+def _lxml_text(element, separator: str) -> str:
+    return _join_strings(_lxml_strings(element), separator)
+
+
+def _lxml_classes(element) -> List[str]:
+    return (element.get('class') or '').split()
+
+
+def _lxml_info_grid(table) -> Dict[str, str]:
+    info_grid: Dict[str, str] = {}
+    for td in table.iter('td'):
+        if 'InmateInfoGridTd' not in _lxml_classes(td):
+            continue
+        label = _lxml_text(td, ' ')
+        if not label or label in info_grid:
+            continue
+        value_td = next(td.itersiblings('td'), None)
+        if value_td is not None:
+            info_grid[label] = _lxml_text(value_td, ' ')
+    return info_grid
+
+
+def _lxml_card(table, holds_table, charges_table) -> Dict[str, Any]:
+    header = next(
+        (td for td in table.iter('td') if 'SearchHeader' in _lxml_classes(td)),
+        None,
+    )
+    return {
+        'header_text': _lxml_text(header, ' ') if header is not None else None,
+        'info_grid': _lxml_info_grid(table),
+        'raw_card_text': _lxml_text(table, '\n'),
+        'holds_cells': [
+            _lxml_text(cell, ' ') for cell in holds_table.iter('td')
+        ] if holds_table is not None else None,
+        'charge_rows': [
+            [_lxml_text(cell, ' ') for cell in row.iter('td')]
+            for row in charges_table.iter('tr')
+        ] if charges_table is not None else None,
+    }
+
+
+def parse_cards_lxml(html: str) -> List[Dict[str, Any]]:
+    if not HAS_LXML:
+        raise ImportError('lxml is required for the lxml parser backend')
+    root = lxml.html.document_fromstring(html)
+
+    # Holding every table keeps lxml's element proxies (and so their id()) stable
+    tables = list(root.iter('table'))
+    booking_tables: Set[int] = set()
+
+    def _mark(element):
+        ancestors = element.iterancestors('table')
+        for table in ([element, *ancestors] if element.tag == 'table' else ancestors):
+            if id(table) in booking_tables:
+                break
+            booking_tables.add(id(table))
+
+    for event, node in etree.iterwalk(root, events=('start',)):
+        if not isinstance(node.tag, str):
+            # Comment text is skipped, but its tail belongs to the parent
+            if node.tail and BOOKING_NO_LABEL_RE.search(node.tail):
+                _mark(node.getparent())
+            continue
+        if node.text and node.tag not in _SKIPPED_TEXT_TAGS and BOOKING_NO_LABEL_RE.search(node.text):
+            _mark(node)
+        if node.tail and BOOKING_NO_LABEL_RE.search(node.tail) and node.getparent() is not None:
+            _mark(node.getparent())
+
+    return _build_cards(
+        tables,
+        [id(table) in booking_tables for table in tables],
+        lambda table: table.get('id', ''),
+        _lxml_classes,
+        _lxml_card,
+    )
+
+
+# =====================================================
+# SELECTOLAX (LEXBOR) BACKEND
+# =====================================================
+
+
+def _selectolax_strings(node):
+    for child in node.traverse(include_text=True):
+        if child.tag == '-text':
+            parent = child.parent
+            if parent is None or parent.tag not in _SKIPPED_TEXT_TAGS:
+                yield child.text_content or ''
+
+
+def _selectolax_text(node, separator: str) -> str:
+    return _join_strings(_selectolax_strings(node), separator)
+
+
+def _selectolax_classes(node) -> List[str]:
+    return (node.attributes.get('class') or '').split()
+
+
+def _selectolax_next_td(node):
+    sibling = node.next
+    while sibling is not None and sibling.tag != 'td':
+        sibling = sibling.next
+    return sibling
+
+
+def _selectolax_info_grid(table) -> Dict[str, str]:
+    info_grid: Dict[str, str] = {}
+    for td in table.css('td.InmateInfoGridTd'):
+        label = _selectolax_text(td, ' ')
+        if not label or label in info_grid:
+            continue
+        value_td = _selectolax_next_td(td)
+        if value_td is not None:
+            info_grid[label] = _selectolax_text(value_td, ' ')
+    return info_grid
+
+
+def _selectolax_card(table, holds_table, charges_table) -> Dict[str, Any]:
+    header = table.css_first('td.SearchHeader')
+    return {
+        'header_text': _selectolax_text(header, ' ') if header is not None else None,
+        'info_grid': _selectolax_info_grid(table),
+        'raw_card_text': _selectolax_text(table, '\n'),
+        'holds_cells': [
+            _selectolax_text(cell, ' ') for cell in holds_table.css('td')
+        ] if holds_table is not None else None,
+        'charge_rows': [
+            [_selectolax_text(cell, ' ') for cell in row.css('td')]
+            for row in charges_table.css('tr')
+        ] if charges_table is not None else None,
+    }
+
+
+def parse_cards_selectolax(html: str) -> List[Dict[str, Any]]:
+    if not HAS_SELECTOLAX:
+        raise ImportError('selectolax is required for the selectolax parser backend')
+    tree = LexborHTMLParser(html)
+    tables = [node for node in tree.root.traverse() if node.tag == 'table']
+    # Node wrappers are recreated on access, so key tables by their memory address
+    positions = {node.mem_id: index for index, node in enumerate(tables)}
+
+    booking_tables: Set[int] = set()
+    for node in tree.root.traverse(include_text=True):
+        if node.tag != '-text' or not BOOKING_NO_LABEL_RE.search(node.text_content or ''):
+            continue
+        parent = node.parent
+        if parent is not None and parent.tag in _SKIPPED_TEXT_TAGS:
+            continue
+        while parent is not None:
+            if parent.tag == 'table':
+                position = positions[parent.mem_id]
+                if position in booking_tables:
+                    break
+                booking_tables.add(position)
+            parent = parent.parent
+
+    return _build_cards(
+        tables,
+        [index in booking_tables for index in range(len(tables))],
+        lambda table: table.attributes.get('id') or '',
+        _selectolax_classes,
+        _selectolax_card,
+    )
+
+
+# =====================================================
+# BACKEND SELECTION
+# =====================================================
+
+PARSER_BACKENDS: Dict[str, Callable[[str], List[Dict[str, Any]]]] = {
+    'bs4': parse_cards_bs4,
+    'lxml': parse_cards_lxml,
+    'selectolax': parse_cards_selectolax,
+}
+
+_BACKEND_AVAILABLE = {
+    'bs4': HAS_BEAUTIFULSOUP,
+    'lxml': HAS_LXML,
+    'selectolax': HAS_SELECTOLAX,
+}
+
+
+def available_backends() -> List[str]:
+    return [name for name in PARSER_BACKENDS if _BACKEND_AVAILABLE[name]]
+
+
+def default_backend() -> str:
+    """The fastest installed backend: selectolax, then lxml, then bs4."""
+    for name in ('selectolax', 'lxml', 'bs4'):
+        if _BACKEND_AVAILABLE[name]:
+            return name
+    return 'bs4'
+
+
+def resolve_backend(name: Optional[str]) -> str:
+    """Validate a requested backend, falling back to the default if it isn't installed."""
+    name = (name or '').strip().lower()
+    if not name:
+        return default_backend()
+    if name not in PARSER_BACKENDS:
+        raise ValueError(f'Unknown HTML parser backend {name!r}; expected one of {", ".join(PARSER_BACKENDS)}')
+    if not _BACKEND_AVAILABLE[name]:
+        fallback = default_backend()
+        logger.warning(f'⚠️  HTML parser backend {name!r} is not installed; using {fallback!r}')
+        return fallback
+    return name
+
+
+def parse_booking_cards(html: str, backend: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Split the jail log HTML into booking cards with the given (or default) backend."""
+    return PARSER_BACKENDS[resolve_backend(backend)](html)
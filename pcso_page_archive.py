@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Content-addressed archive of fetched PCSO jail log pages.
+
+import_pcso_bookings.py stores every page it downloads here, so a parser fix can be
+replayed over old pages (import_pcso_bookings.py --reparse) instead of waiting for
+new data. Layout under the archive directory:
+
+    pages/ab/abcdef....html.zst   page HTML (UTF-8), named by its SHA-256; identical
+                                  pages are stored once
+    index.jsonl                   one line per fetch, in fetch order:
+                                  {"fetched_at": "2026-01-16T01:05:00+00:00",
+                                   "sha256": "abcdef...", "bytes": 79132,
+                                   "path": "pages/ab/abcdef....html.zst"}
+
+Pages are zstd-compressed when the zstandard package is installed and gzip-compressed
+(.html.gz) otherwise; read_page handles both.
+
+Usage:
+    from pcso_page_archive import archive_page, iter_archive, parse_archive_range, read_page
+
+    archive_page(archive_dir, html)
+    start, end = parse_archive_range('2026-01-01..2026-01-31')
+    for entry in iter_archive(archive_dir, start, end):
+        html = read_page(archive_dir, entry)
+"""
+
+import gzip
+import json
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+try:
+    import zstandard
+    HAS_ZSTD = True
+except ImportError:
+    HAS_ZSTD = False
+
+logger = logging.getLogger(__name__)
+
+INDEX_NAME = 'index.jsonl'
+ZSTD_LEVEL = 10
+# Range bounds without a timezone are jail-local time, like the booking dates
+LOCAL_TZ = ZoneInfo('America/New_York')
+
+
+def archive_page(
+    archive_dir: Path,
+    html: str,
+    fetched_at: Optional[datetime] = None,
+) -> Dict[str, Any]:
+    """Store a fetched page (once per distinct content) and index this fetch."""
+    archive_dir = Path(archive_dir)
+    data = html.encode('utf-8')
+    sha256 = hashlib.sha256(data).hexdigest()
+    fetched_at = fetched_at or datetime.now(ZoneInfo('UTC'))
+
+    existing = list((archive_dir / 'pages' / sha256[:2]).glob(f'{sha256}.html.*'))
+    if existing:
+        path = existing[0]
+    else:
+        suffix = '.html.zst' if HAS_ZSTD else '.html.gz'
+        path = archive_dir / 'pages' / sha256[:2] / f'{sha256}{suffix}'
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if HAS_ZSTD:
+            compressed = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+        else:
+            compressed = gzip.compress(data, compresslevel=9)
+        tmp_path = path.with_name(path.name + '.tmp')
+        tmp_path.write_bytes(compressed)
+        tmp_path.replace(path)
+
+    entry = {
+        'fetched_at': fetched_at.isoformat(timespec='seconds'),
+        'sha256': sha256,
+        'bytes': len(data),
+        'path': path.relative_to(archive_dir).as_posix(),
+    }
+    with open(archive_dir / INDEX_NAME, 'a', encoding='utf-8') as index:
+        index.write(json.dumps(entry) + '\n')
+    return entry
+
+
+def read_page(archive_dir: Path, entry: Dict[str, Any]) -> str:
+    """Return the HTML of an archived page."""
+    path = Path(archive_dir) / entry['path']
+    compressed = path.read_bytes()
+    if path.name.endswith('.zst'):
+        if not HAS_ZSTD:
+            raise RuntimeError(f'{path} is zstd-compressed; pip install zstandard to read it')
+        data = zstandard.ZstdDecompressor().decompress(compressed)
+    else:
+        data = gzip.decompress(compressed)
+    return data.decode('utf-8')
+
+
+def iter_archive(
+    archive_dir: Path,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Yield index entries fetched in [start, end), oldest first."""
+    index_path = Path(archive_dir) / INDEX_NAME
+    if not index_path.exists():
+        return
+    with open(index_path, encoding='utf-8') as index:
+        for line in index:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                logger.warning(f'⚠️  Skipping malformed archive index line: {line[:80]}')
+                continue
+            fetched_at = datetime.fromisoformat(entry['fetched_at'])
+            if start and fetched_at < start:
+                continue
+            if end and fetched_at >= end:
+                continue
+            yield entry
+
+
+def _parse_bound(value: str, is_end: bool) -> Optional[datetime]:
+    value = value.strip()
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=LOCAL_TZ)
+    # A bare date as the end bound includes that whole day
+    if is_end and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+
+def parse_archive_range(spec: str) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """
+    Parse an archive range into (start, end), either bound None for open-ended.
+
+    Accepted: 'all', a date ('2026-01-15', that whole day), or 'START..END' where
+    either side may be empty and is a date or ISO datetime ('2026-01-01..',
+    '2026-01-01T06:00..2026-01-02'). Bounds without a timezone are America/New_York.
+    """
+    spec = spec.strip()
+    if spec.lower() == 'all':
+        return (None, None)
+    if '..' in spec:
+        start, end = spec.split('..', 1)
+        return (_parse_bound(start, is_end=False), _parse_bound(end, is_end=True))
+    return (_parse_bound(spec, is_end=False), _parse_bound(spec, is_end=True))
@@ -47,4 +47,7 @@ echo "⚠️  IMPORTANT: Before this will work, you need to:"
 echo "   1. Ensure assets/.env has SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY"
 echo "   2. (Optional) Set PCSO_JAIL_LOG_URL if the default changes"
 echo "   3. Test the script manually: python3 import_pcso_bookings.py"
+echo ""
+echo "💡 For faster updates, run the importer as a service instead of this cron job:"
+echo "   python3 import_pcso_bookings.py --serve   (see PCSO_JAIL_LOG_README.md)"
 
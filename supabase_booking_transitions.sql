@@ -0,0 +1,62 @@
+-- =====================================================
+-- BOOKING TRANSITIONS (ROSTER DIFF LOG)
+-- =====================================================
+-- import_pcso_bookings.py keeps the previous run's jail log roster
+-- (booking_no -> status) and diffs each new page against it:
+--   booked          booking appeared on the page
+--   released        status changed to Released (bookings.released_date is stamped)
+--   status_changed  any other status change
+--   dropped         booking left the page (the page only lists the last 24 hours,
+--                   so this is NOT a release)
+-- Each run writes its transitions in one batched insert.
+-- 1) Create booking_transitions
+-- 2) Index it for "recent releases" style queries
+-- 3) Index bookings.released_date so the app can list releases without
+--    scanning raw_card_text
+-- 4) RLS: public read, service role writes
+-- =====================================================
+
+-- 1) Transitions log
+CREATE TABLE IF NOT EXISTS public.booking_transitions (
+    id BIGSERIAL PRIMARY KEY,
+    booking_no TEXT NOT NULL,
+    transition TEXT NOT NULL
+        CHECK (transition IN ('booked', 'released', 'status_changed', 'dropped')),
+    old_status TEXT,
+    new_status TEXT,
+    observed_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- 2) Indexes
+CREATE INDEX IF NOT EXISTS idx_booking_transitions_transition_observed
+    ON public.booking_transitions(transition, observed_at DESC);
+
+CREATE INDEX IF NOT EXISTS idx_booking_transitions_booking_no
+    ON public.booking_transitions(booking_no);
+
+-- 3) Releases by date
+CREATE INDEX IF NOT EXISTS idx_bookings_released_date
+    ON public.bookings(released_date DESC)
+    WHERE released_date IS NOT NULL;
+
+-- 4) Row Level Security (RLS) Policies
+ALTER TABLE public.booking_transitions ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Public can read booking transitions" ON public.booking_transitions;
+CREATE POLICY "Public can read booking transitions"
+    ON public.booking_transitions
+    FOR SELECT
+    USING (true);
+
+DROP POLICY IF EXISTS "Service role can manage booking transitions" ON public.booking_transitions;
+CREATE POLICY "Service role can manage booking transitions"
+    ON public.booking_transitions
+    FOR ALL
+    USING (auth.role() = 'service_role');
+
+-- Example: releases in the last 7 days
+-- SELECT t.booking_no, t.observed_at, b.name
+-- FROM public.booking_transitions t
+-- JOIN public.bookings b USING (booking_no)
+-- WHERE t.transition = 'released' AND t.observed_at >= NOW() - INTERVAL '7 days'
+-- ORDER BY t.observed_at DESC;
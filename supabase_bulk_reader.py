@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Keyset-paginated, concurrent bulk reader for Supabase tables and views.
+
+Offset pagination (.range(offset, offset + 999)) gets slower the deeper it goes on an
+ordered view, because Postgres has to walk and discard every skipped row. This module
+pages by a (date_column, key_column) keyset cursor instead, so every page is an index
+range scan no matter how far into the window it is.
+
+The date window is split into N slices that are fetched concurrently, each slice
+paging sequentially with its own cursor. Every request is retried with exponential
+backoff before the read is abandoned.
+
+Usage:
+    from supabase_bulk_reader import bulk_read, iter_bulk_pages
+
+    rows = bulk_read(
+        supabase,
+        'recent_bookings_with_charges',
+        columns='booking_date,booking_no,name,charges',
+        start=datetime(2021, 1, 1),
+    )
+
+    for page in iter_bulk_pages(supabase, 'recent_bookings_with_charges', columns='booking_date,booking_no'):
+        ...
+"""
+
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+DEFAULT_PAGE_SIZE = 1000
+DEFAULT_SLICES = 4
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF_SECONDS = 1.0
+
+
+def _log(label: str, message: str):
+    print(f"[{label}] {message}")
+
+
+def _execute_with_retry(
+    build_query: Callable[[], Any],
+    label: str,
+    max_retries: int = DEFAULT_MAX_RETRIES,
+    backoff_seconds: float = DEFAULT_BACKOFF_SECONDS,
+) -> List[Dict[str, Any]]:
+    """Execute a PostgREST query, retrying with exponential backoff and jitter."""
+    attempt = 0
+    while True:
+        try:
+            response = build_query().execute()
+            return response.data if hasattr(response, 'data') and response.data else []
+        except Exception as e:
+            attempt += 1
+            if attempt >= max_retries:
+                raise RuntimeError(f"{label}: query failed after {max_retries} attempts: {e}") from e
+            delay = backoff_seconds * (2 ** (attempt - 1)) * (1 + random.random() * 0.25)
+            _log(label, f"Error fetching page (attempt {attempt}/{max_retries}): {e}; retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+
+def _with_columns(columns: str, *required: str) -> str:
+    """Make sure the cursor columns are part of the projection."""
+    selected = [c.strip() for c in columns.split(',') if c.strip()]
+    for column in required:
+        if column not in selected and '*' not in selected:
+            selected.append(column)
+    return ','.join(selected)
+
+
+def quote_filter_value(value: Any) -> str:
+    """Quote a value for use inside a PostgREST or=(...) filter."""
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def _as_iso(value: Optional[Any]) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def _parse_bound(value: Any) -> datetime:
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+
+
+def _find_min_date(
+    supabase,
+    table: str,
+    date_column: str,
+    label: str,
+    max_retries: int,
+    backoff_seconds: float,
+    filters: Optional[Callable[[Any], Any]] = None,
+) -> Optional[datetime]:
+    """Look up the earliest non-null date so an open-ended window can be sliced."""
+    def build():
+        query = supabase.table(table).select(date_column).gte(date_column, '0001-01-01')
+        if filters:
+            query = filters(query)
+        return query.order(date_column, desc=False).limit(1)
+
+    rows = _execute_with_retry(build, label, max_retries, backoff_seconds)
+    if not rows or not rows[0].get(date_column):
+        return None
+    return _parse_bound(rows[0][date_column])
+
+
+def split_window(start: datetime, end: datetime, slices: int) -> List[Tuple[datetime, datetime]]:
+    """Split [start, end) into `slices` contiguous, equal-width sub-windows."""
+    slices = max(1, slices)
+    if end <= start:
+        return [(start, end)]
+    step = (end - start) / slices
+    bounds = [start + step * i for i in range(slices)] + [end]
+    return [(bounds[i], bounds[i + 1]) for i in range(slices)]
+
+
+def iter_keyset_pages(
+    supabase,
+    table: str,
+    columns: str,
+    start: Optional[Any] = None,
+    end: Optional[Any] = None,
+    date_column: str = 'booking_date',
+    key_column: str = 'booking_no',
+    page_size: int = DEFAULT_PAGE_SIZE,
+    max_retries: int = DEFAULT_MAX_RETRIES,
+    backoff_seconds: float = DEFAULT_BACKOFF_SECONDS,
+    filters: Optional[Callable[[Any], Any]] = None,
+    label: str = 'bulk',
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Yield pages of rows with start <= date_column < end, ordered by (date, key).
+
+    Each page after the first continues strictly after the last (date, key) seen,
+    so no row is skipped or repeated even when many rows share a date.
+    """
+    select_columns = _with_columns(columns, date_column, key_column)
+    start_iso = _as_iso(start)
+    end_iso = _as_iso(end)
+    cursor: Optional[Tuple[str, str]] = None
+    total = 0
+
+    while True:
+        def build(cursor=cursor):
+            query = supabase.table(table).select(select_columns)
+            if start_iso is not None:
+                query = query.gte(date_column, start_iso)
+            else:
+                # Rows without a date cannot be ordered by the cursor
+                query = query.gte(date_column, '0001-01-01')
+            if end_iso is not None:
+                query = query.lt(date_column, end_iso)
+            if filters:
+                query = filters(query)
+            if cursor is not None:
+                last_date, last_key = cursor
+                query = query.or_(
+                    f'{date_column}.gt.{quote_filter_value(last_date)},'
+                    f'and({date_column}.eq.{quote_filter_value(last_date)},{key_column}.gt.{quote_filter_value(last_key)})'
+                )
+            return query.order(date_column, desc=False).order(key_column, desc=False).limit(page_size)
+
+        page = _execute_with_retry(build, label, max_retries, backoff_seconds)
+        if not page:
+            break
+        total += len(page)
+        _log(label, f"Fetched page: got {len(page)} records, total so far: {total}")
+        yield page
+        if len(page) < page_size:
+            break
+        last = page[-1]
+        cursor = (last[date_column], last[key_column])
+
+
+def _resolve_slices(
+    supabase,
+    table: str,
+    start: Optional[Any],
+    end: Optional[Any],
+    slices: int,
+    date_column: str,
+    label: str,
+    max_retries: int,
+    backoff_seconds: float,
+    filters: Optional[Callable[[Any], Any]],
+) -> List[Tuple[Optional[datetime], Optional[datetime]]]:
+    """Turn the requested window into concrete slice bounds (None = unbounded)."""
+    if slices <= 1:
+        return [(start, end)]
+    lower = _parse_bound(start) if start is not None else _find_min_date(
+        supabase, table, date_column, label, max_retries, backoff_seconds, filters,
+    )
+    if lower is None:
+        return [(start, end)]
+    if end is not None:
+        upper = _parse_bound(end)
+    else:
+        upper = datetime.now(timezone.utc) if lower.tzinfo else datetime.now()
+    windows: List[Tuple[Optional[datetime], Optional[datetime]]] = list(split_window(lower, upper, slices))
+    if start is None:
+        windows[0] = (None, windows[0][1])
+    if end is None:
+        # Open-ended: the last slice also picks up anything newer than "now"
+        windows[-1] = (windows[-1][0], None)
+    return windows
+
+
+def iter_bulk_pages(
+    supabase,
+    table: str,
+    columns: str,
+    start: Optional[Any] = None,
+    end: Optional[Any] = None,
+    date_column: str = 'booking_date',
+    key_column: str = 'booking_no',
+    slices: int = DEFAULT_SLICES,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    max_retries: int = DEFAULT_MAX_RETRIES,
+    backoff_seconds: float = DEFAULT_BACKOFF_SECONDS,
+    filters: Optional[Callable[[Any], Any]] = None,
+    label: str = 'bulk',
+    max_buffered_pages: Optional[int] = None,
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Yield pages from all slices as soon as they arrive.
+
+    Pages from different slices interleave, so callers that need global order
+    should use bulk_read(). At most max_buffered_pages (default: 2 per slice) are
+    held in memory before the fetch threads wait for the consumer.
+    """
+    windows = _resolve_slices(
+        supabase, table, start, end, slices, date_column, label, max_retries, backoff_seconds, filters,
+    )
+    if len(windows) == 1:
+        yield from iter_keyset_pages(
+            supabase, table, columns, windows[0][0], windows[0][1], date_column, key_column,
+            page_size, max_retries, backoff_seconds, filters, label,
+        )
+        return
+
+    pages: 'queue.Queue' = queue.Queue(maxsize=max_buffered_pages or 2 * len(windows))
+    stop = threading.Event()
+    done_marker = object()
+
+    def _put(item) -> bool:
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _read_slice(index: int, window: Tuple[Optional[datetime], Optional[datetime]]):
+        slice_label = f'{label}:{index + 1}/{len(windows)}'
+        try:
+            for page in iter_keyset_pages(
+                supabase, table, columns, window[0], window[1], date_column, key_column,
+                page_size, max_retries, backoff_seconds, filters, slice_label,
+            ):
+                if not _put(page):
+                    return
+            _put(done_marker)
+        except BaseException as e:
+            _put(e)
+
+    with ThreadPoolExecutor(max_workers=len(windows)) as executor:
+        for index, window in enumerate(windows):
+            executor.submit(_read_slice, index, window)
+        remaining = len(windows)
+        try:
+            while remaining:
+                item = pages.get()
+                if item is done_marker:
+                    remaining -= 1
+                elif isinstance(item, BaseException):
+                    raise item
+                else:
+                    yield item
+        finally:
+            stop.set()
+
+
+def bulk_read(
+    supabase,
+    table: str,
+    columns: str,
+    start: Optional[Any] = None,
+    end: Optional[Any] = None,
+    date_column: str = 'booking_date',
+    key_column: str = 'booking_no',
+    slices: int = DEFAULT_SLICES,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    max_retries: int = DEFAULT_MAX_RETRIES,
+    backoff_seconds: float = DEFAULT_BACKOFF_SECONDS,
+    filters: Optional[Callable[[Any], Any]] = None,
+    label: str = 'bulk',
+) -> List[Dict[str, Any]]:
+    """
+    Read every row in the window, fetching slices concurrently.
+
+    Returns rows ordered by (date_column, key_column). Raises RuntimeError if any
+    slice still fails after retries, so callers never see a partial window.
+    """
+    windows = _resolve_slices(
+        supabase, table, start, end, slices, date_column, label, max_retries, backoff_seconds, filters,
+    )
+
+    def _read_slice(index: int) -> List[Dict[str, Any]]:
+        window = windows[index]
+        slice_label = f'{label}:{index + 1}/{len(windows)}' if len(windows) > 1 else label
+        rows: List[Dict[str, Any]] = []
+        for page in iter_keyset_pages(
+            supabase, table, columns, window[0], window[1], date_column, key_column,
+            page_size, max_retries, backoff_seconds, filters, slice_label,
+        ):
+            rows.extend(page)
+        return rows
+
+    with ThreadPoolExecutor(max_workers=len(windows)) as executor:
+        results = list(executor.map(_read_slice, range(len(windows))))
+
+    rows = [row for slice_rows in results for row in slice_rows]
+    _log(label, f"Total records fetched: {len(rows)} ({len(windows)} slice(s))")
+    return rows
@@ -0,0 +1,112 @@
+-- =====================================================
+-- CHARGES AGENCY_ID (TAGGED AT IMPORT TIME)
+-- =====================================================
+-- import_pcso_bookings.py resolves each charge to a canonical agency id
+-- (pcso, palatka_pd, interlachen_pd, welaka_pd, school_pd, fhp, fwc) with
+-- agency_matcher.py while parsing, and stores it in charges.agency_id.
+-- 1) Add agency_id column to charges (NULL = unknown/ambiguous)
+-- 2) Index it so stats/top-list queries can filter by agency on the server
+-- 3) Recreate recent_bookings_with_charges view to expose agency_id in the
+--    charges JSON and an agency_ids array per booking
+--    (same definition as agency_stats_incremental_schema.sql otherwise)
+-- 4) Backfill historical rows with backfill_charge_agency_ids.py (resumable)
+--
+-- Requires zAgencyStatsUpdate/agency_stats_incremental_schema.sql (bookings.updated_at).
+-- Run this BEFORE deploying the importer change: _sync_charges writes agency_id.
+-- =====================================================
+
+-- 1) Add agency_id column if missing
+ALTER TABLE public.charges
+ADD COLUMN IF NOT EXISTS agency_id text;
+
+-- 2) Indexes for agency filters and for the backfill's keyset scan
+CREATE INDEX IF NOT EXISTS idx_charges_agency_id_booking_no
+  ON public.charges(agency_id, booking_no);
+
+CREATE INDEX IF NOT EXISTS idx_charges_missing_agency_id
+  ON public.charges(booking_no, charge_order)
+  WHERE agency_id IS NULL;
+
+-- 3) Recreate view with agency_id
+DROP VIEW IF EXISTS public.recent_bookings_with_charges;
+CREATE VIEW public.recent_bookings_with_charges AS
+SELECT
+  b.booking_no,
+  b.mni_no,
+  b.name,
+  b.status,
+  b.booking_date,
+  b.age_on_booking_date,
+  b.bond_amount,
+  b.address_given,
+  b.holds_text,
+  b.photo_path,
+  b.photo_url,
+  b.raw_card_text,
+  b.released_date,
+  b.race,
+  b.gender,
+  b.inserted_at AS booked_at,
+  b.updated_at,
+  COALESCE(
+    jsonb_agg(
+      jsonb_build_object(
+        'charge', c.charge,
+        'statute', c.statute,
+        'case_number', c.case_number,
+        'agency', COALESCE(
+          NULLIF(c.agency, ''),
+          CASE
+            WHEN NULLIF(trim(both ' ' from regexp_replace(c.case_number, '^[^(]*\\(([^)]*)\\).*$', '\\1')), '') IN ('PCS', 'PCSO')
+              THEN 'PUTNAM COUNTY SHERIFF'
+            WHEN NULLIF(trim(both ' ' from regexp_replace(c.case_number, '^[^(]*\\(([^)]*)\\).*$', '\\1')), '') IN ('PPD')
+              THEN 'PALATKA POLICE DEPARTMENT'
+            WHEN NULLIF(trim(both ' ' from regexp_replace(c.case_number, '^[^(]*\\(([^)]*)\\).*$', '\\1')), '') IN ('IPD')
+              THEN 'INTERLACHEN POLICE DEPARTMENT'
+            WHEN NULLIF(trim(both ' ' from regexp_replace(c.case_number, '^[^(]*\\(([^)]*)\\).*$', '\\1')), '') IN ('WPD')
+              THEN 'WELAKA POLICE DEPARTMENT'
+            WHEN NULLIF(trim(both ' ' from regexp_replace(c.case_number, '^[^(]*\\(([^)]*)\\).*$', '\\1')), '') IN ('FHP')
+              THEN 'FLORIDA HIGHWAY PATROL'
+            WHEN NULLIF(trim(both ' ' from regexp_replace(c.case_number, '^[^(]*\\(([^)]*)\\).*$', '\\1')), '') IN ('FWC')
+              THEN 'FISH AND WILDLIFE'
+            WHEN NULLIF(trim(both ' ' from regexp_replace(c.case_number, '^[^(]*\\(([^)]*)\\).*$', '\\1')), '') ILIKE '%PUTNAM COUNTY SHERIFF%'
+              THEN 'PUTNAM COUNTY SHERIFF'
+            WHEN NULLIF(trim(both ' ' from regexp_replace(c.case_number, '^[^(]*\\(([^)]*)\\).*$', '\\1')), '') ILIKE '%PALATKA POLICE%'
+              THEN 'PALATKA POLICE DEPARTMENT'
+            WHEN NULLIF(trim(both ' ' from regexp_replace(c.case_number, '^[^(]*\\(([^)]*)\\).*$', '\\1')), '') ILIKE '%INTERLACHEN POLICE%'
+              THEN 'INTERLACHEN POLICE DEPARTMENT'
+            WHEN NULLIF(trim(both ' ' from regexp_replace(c.case_number, '^[^(]*\\(([^)]*)\\).*$', '\\1')), '') ILIKE '%WELAKA POLICE%'
+              THEN 'WELAKA POLICE DEPARTMENT'
+            WHEN NULLIF(trim(both ' ' from regexp_replace(c.case_number, '^[^(]*\\(([^)]*)\\).*$', '\\1')), '') ILIKE '%FLORIDA HIGHWAY PATROL%'
+              THEN 'FLORIDA HIGHWAY PATROL'
+            WHEN NULLIF(trim(both ' ' from regexp_replace(c.case_number, '^[^(]*\\(([^)]*)\\).*$', '\\1')), '') ILIKE '%FISH AND WILDLIFE%'
+              THEN 'FISH AND WILDLIFE'
+            ELSE NULLIF(trim(both ' ' from regexp_replace(c.case_number, '^[^(]*\\(([^)]*)\\).*$', '\\1')), '')
+          END
+        ),
+        'agency_id', c.agency_id,
+        'degree', c.degree,
+        'level', c.level,
+        'bond', c.bond
+      )
+      ORDER BY c.charge_order
+    ) FILTER (WHERE (c.case_number IS NOT NULL OR c.charge IS NOT NULL)),
+    '[]'::jsonb
+  ) AS charges,
+  COALESCE(
+    array_agg(DISTINCT c.agency_id) FILTER (WHERE c.agency_id IS NOT NULL),
+    '{}'::text[]
+  ) AS agency_ids
+FROM public.bookings b
+LEFT JOIN public.charges c ON (b.booking_no = c.booking_no)
+GROUP BY
+  b.booking_no, b.mni_no, b.name, b.status, b.booking_date, b.age_on_booking_date,
+  b.bond_amount, b.address_given, b.holds_text, b.photo_path, b.photo_url,
+  b.raw_card_text,
+  b.released_date, b.race, b.gender, b.inserted_at, b.updated_at;
+
+-- Example server-side filter (PostgREST): bookings with any PCSO charge
+--   /recent_bookings_with_charges?agency_ids=cs.{pcso}
+
+-- 4) Progress check for the backfill (optional)
+-- SELECT COUNT(*) FILTER (WHERE agency_id IS NULL) AS untagged, COUNT(*) AS total FROM public.charges;
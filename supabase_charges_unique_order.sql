@@ -0,0 +1,27 @@
+-- =====================================================
+-- CHARGES UNIQUE (booking_no, charge_order)
+-- =====================================================
+-- import_pcso_bookings.py syncs charges set-based: it upserts every charge row
+-- on (booking_no, charge_order) in a few large requests, then deletes rows past
+-- each booking's last charge in one filtered call. This replaces a DELETE and
+-- an INSERT per booking, so the app never sees a booking with its charges gone.
+-- 1) Remove duplicate (booking_no, charge_order) rows left by earlier imports
+-- 2) Add the unique index the upsert's ON CONFLICT target needs
+--
+-- Run this BEFORE deploying the importer change: the upsert fails without it.
+-- =====================================================
+
+-- 1) Keep one row per (booking_no, charge_order)
+DELETE FROM public.charges a
+USING public.charges b
+WHERE a.booking_no = b.booking_no
+  AND a.charge_order = b.charge_order
+  AND a.ctid < b.ctid;
+
+-- 2) Conflict target for upsert(on_conflict='booking_no,charge_order')
+CREATE UNIQUE INDEX IF NOT EXISTS charges_booking_no_charge_order_key
+  ON public.charges(booking_no, charge_order);
+
+-- Check (should return no rows)
+-- SELECT booking_no, charge_order, COUNT(*) FROM public.charges
+-- GROUP BY booking_no, charge_order HAVING COUNT(*) > 1;
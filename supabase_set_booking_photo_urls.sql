@@ -0,0 +1,40 @@
+-- =====================================================
+-- SET BOOKING PHOTO URLS (ONE BATCHED UPDATE)
+-- =====================================================
+-- import_pcso_bookings.py uploads booking photos to the pcso-booking-photos
+-- bucket, then points bookings.photo_url at them with ONE call to this function
+-- per photo sync. It updates only photo_url, so a photo task retried from the
+-- work queue never rolls back newer booking data (an upsert would rewrite the
+-- whole row, a per-booking PATCH costs one round trip each).
+-- 1) Create set_booking_photo_urls(booking_nos, base): photo_url = base || booking_no || '.jpg'
+-- 2) Only the service role may call it
+--
+-- Run this BEFORE deploying the importer change: photo_url is not updated without it.
+-- =====================================================
+
+-- 1) Batched photo_url update; returns the number of bookings updated
+CREATE OR REPLACE FUNCTION public.set_booking_photo_urls(booking_nos TEXT[], base TEXT)
+RETURNS INTEGER
+LANGUAGE sql
+SET search_path = ''
+AS $$
+    WITH updated AS (
+        UPDATE public.bookings
+        SET photo_url = base || booking_no || '.jpg'
+        WHERE booking_no = ANY(booking_nos)
+        RETURNING 1
+    )
+    SELECT COUNT(*)::INTEGER FROM updated;
+$$;
+
+-- 2) Permissions
+REVOKE EXECUTE ON FUNCTION public.set_booking_photo_urls(TEXT[], TEXT) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.set_booking_photo_urls(TEXT[], TEXT) TO service_role;
+
+COMMENT ON FUNCTION public.set_booking_photo_urls(TEXT[], TEXT) IS 'Points bookings.photo_url at the stored photo for each booking_no (photo_url only). Called once per photo sync by import_pcso_bookings.py.';
+
+-- Example
+-- SELECT public.set_booking_photo_urls(
+--     ARRAY['PCSO26JBN000158'],
+--     'https://<project>.supabase.co/storage/v1/object/public/pcso-booking-photos/'
+-- );
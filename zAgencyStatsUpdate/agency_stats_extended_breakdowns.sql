@@ -0,0 +1,21 @@
+-- =====================================================
+-- AGENCY STATS EXTENDED BREAKDOWNS
+-- =====================================================
+-- Adds the extra JSONB breakdowns written by calculate_agency_stats.py:
+-- 1) bookings_by_month     {"2025-01": 120, "2025-02": 98, ...}
+-- 2) bookings_by_age_band  {"UNDER 18": 4, "18-24": 210, ..., "65+": 12, "UNKNOWN": 3}
+-- 3) bookings_by_status    {"IN JAIL": 150, "RELEASED": 1100}
+-- 4) top_statutes          [{"statute": "893.13", "count": 320}, ...]
+-- Existing rows get empty defaults; the next run fills them in.
+-- =====================================================
+
+ALTER TABLE public.agency_stats
+ADD COLUMN IF NOT EXISTS bookings_by_month JSONB NOT NULL DEFAULT '{}'::jsonb,
+ADD COLUMN IF NOT EXISTS bookings_by_age_band JSONB NOT NULL DEFAULT '{}'::jsonb,
+ADD COLUMN IF NOT EXISTS bookings_by_status JSONB NOT NULL DEFAULT '{}'::jsonb,
+ADD COLUMN IF NOT EXISTS top_statutes JSONB NOT NULL DEFAULT '[]'::jsonb;
+
+COMMENT ON COLUMN public.agency_stats.bookings_by_month IS 'JSON object mapping YYYY-MM to booking count: {"2025-01": 120}';
+COMMENT ON COLUMN public.agency_stats.bookings_by_age_band IS 'JSON object mapping age-on-booking band to booking count: {"18-24": 210, "25-34": 340}';
+COMMENT ON COLUMN public.agency_stats.bookings_by_status IS 'JSON object mapping booking status to count: {"IN JAIL": 150, "RELEASED": 1100}';
+COMMENT ON COLUMN public.agency_stats.top_statutes IS 'JSON array of the most charged statutes: [{"statute": "893.13", "count": 320}, ...]';
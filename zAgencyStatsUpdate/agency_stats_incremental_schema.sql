@@ -0,0 +1,131 @@
+-- =====================================================
+-- AGENCY STATS INCREMENTAL ENGINE SUPPORT
+-- =====================================================
+-- calculate_agency_stats.py --engine incremental only fetches bookings whose
+-- booking_date or updated_at is newer than its last checkpoint.
+-- 1) Add updated_at to bookings (maintained by trigger)
+-- 2) Touch bookings.updated_at whenever its charges change
+-- 3) Recreate recent_bookings_with_charges view to expose updated_at
+-- 4) Index for the incremental keyset reads
+-- =====================================================
+
+-- 1) Add updated_at column if missing
+ALTER TABLE public.bookings
+ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW();
+
+CREATE OR REPLACE FUNCTION public.set_bookings_updated_at()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SET search_path = public
+AS $$
+BEGIN
+  NEW.updated_at = NOW();
+  RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS set_bookings_updated_at ON public.bookings;
+CREATE TRIGGER set_bookings_updated_at
+  BEFORE UPDATE ON public.bookings
+  FOR EACH ROW
+  EXECUTE FUNCTION public.set_bookings_updated_at();
+
+-- 2) Charges live in their own table; bump the parent booking when they change
+CREATE OR REPLACE FUNCTION public.touch_booking_on_charge_change()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SET search_path = public
+AS $$
+BEGIN
+  UPDATE public.bookings
+  SET updated_at = NOW()
+  WHERE booking_no = COALESCE(NEW.booking_no, OLD.booking_no);
+  RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS touch_booking_on_charge_change ON public.charges;
+CREATE TRIGGER touch_booking_on_charge_change
+  AFTER INSERT OR UPDATE OR DELETE ON public.charges
+  FOR EACH ROW
+  EXECUTE FUNCTION public.touch_booking_on_charge_change();
+
+-- 3) Recreate view with updated_at (same definition as agency_stats_fix_charges_agency.sql)
+DROP VIEW IF EXISTS public.recent_bookings_with_charges;
+CREATE VIEW public.recent_bookings_with_charges AS
+SELECT
+  b.booking_no,
+  b.mni_no,
+  b.name,
+  b.status,
+  b.booking_date,
+  b.age_on_booking_date,
+  b.bond_amount,
+  b.address_given,
+  b.holds_text,
+  b.photo_path,
+  b.photo_url,
+  b.raw_card_text,
+  b.released_date,
+  b.race,
+  b.gender,
+  b.inserted_at AS booked_at,
+  b.updated_at,
+  COALESCE(
+    jsonb_agg(
+      jsonb_build_object(
+        'charge', c.charge,
+        'statute', c.statute,
+        'case_number', c.case_number,
+        'agency', COALESCE(
+          NULLIF(c.agency, ''),
+          CASE
+            WHEN NULLIF(trim(both ' ' from regexp_replace(c.case_number, '^[^(]*\\(([^)]*)\\).*$', '\\1')), '') IN ('PCS', 'PCSO')
+              THEN 'PUTNAM COUNTY SHERIFF'
+            WHEN NULLIF(trim(both ' ' from regexp_replace(c.case_number, '^[^(]*\\(([^)]*)\\).*$', '\\1')), '') IN ('PPD')
+              THEN 'PALATKA POLICE DEPARTMENT'
+            WHEN NULLIF(trim(both ' ' from regexp_replace(c.case_number, '^[^(]*\\(([^)]*)\\).*$', '\\1')), '') IN ('IPD')
+              THEN 'INTERLACHEN POLICE DEPARTMENT'
+            WHEN NULLIF(trim(both ' ' from regexp_replace(c.case_number, '^[^(]*\\(([^)]*)\\).*$', '\\1')), '') IN ('WPD')
+              THEN 'WELAKA POLICE DEPARTMENT'
+            WHEN NULLIF(trim(both ' ' from regexp_replace(c.case_number, '^[^(]*\\(([^)]*)\\).*$', '\\1')), '') IN ('FHP')
+              THEN 'FLORIDA HIGHWAY PATROL'
+            WHEN NULLIF(trim(both ' ' from regexp_replace(c.case_number, '^[^(]*\\(([^)]*)\\).*$', '\\1')), '') IN ('FWC')
+              THEN 'FISH AND WILDLIFE'
+            WHEN NULLIF(trim(both ' ' from regexp_replace(c.case_number, '^[^(]*\\(([^)]*)\\).*$', '\\1')), '') ILIKE '%PUTNAM COUNTY SHERIFF%'
+              THEN 'PUTNAM COUNTY SHERIFF'
+            WHEN NULLIF(trim(both ' ' from regexp_replace(c.case_number, '^[^(]*\\(([^)]*)\\).*$', '\\1')), '') ILIKE '%PALATKA POLICE%'
+              THEN 'PALATKA POLICE DEPARTMENT'
+            WHEN NULLIF(trim(both ' ' from regexp_replace(c.case_number, '^[^(]*\\(([^)]*)\\).*$', '\\1')), '') ILIKE '%INTERLACHEN POLICE%'
+              THEN 'INTERLACHEN POLICE DEPARTMENT'
+            WHEN NULLIF(trim(both ' ' from regexp_replace(c.case_number, '^[^(]*\\(([^)]*)\\).*$', '\\1')), '') ILIKE '%WELAKA POLICE%'
+              THEN 'WELAKA POLICE DEPARTMENT'
+            WHEN NULLIF(trim(both ' ' from regexp_replace(c.case_number, '^[^(]*\\(([^)]*)\\).*$', '\\1')), '') ILIKE '%FLORIDA HIGHWAY PATROL%'
+              THEN 'FLORIDA HIGHWAY PATROL'
+            WHEN NULLIF(trim(both ' ' from regexp_replace(c.case_number, '^[^(]*\\(([^)]*)\\).*$', '\\1')), '') ILIKE '%FISH AND WILDLIFE%'
+              THEN 'FISH AND WILDLIFE'
+            ELSE NULLIF(trim(both ' ' from regexp_replace(c.case_number, '^[^(]*\\(([^)]*)\\).*$', '\\1')), '')
+          END
+        ),
+        'degree', c.degree,
+        'level', c.level,
+        'bond', c.bond
+      )
+      ORDER BY c.charge_order
+    ) FILTER (WHERE (c.case_number IS NOT NULL OR c.charge IS NOT NULL)),
+    '[]'::jsonb
+  ) AS charges
+FROM public.bookings b
+LEFT JOIN public.charges c ON (b.booking_no = c.booking_no)
+GROUP BY
+  b.booking_no, b.mni_no, b.name, b.status, b.booking_date, b.age_on_booking_date,
+  b.bond_amount, b.address_given, b.holds_text, b.photo_path, b.photo_url,
+  b.raw_card_text,
+  b.released_date, b.race, b.gender, b.inserted_at, b.updated_at;
+
+-- 4) Keyset index for (updated_at, booking_no) reads
+CREATE INDEX IF NOT EXISTS idx_bookings_updated_at_booking_no
+  ON public.bookings(updated_at, booking_no);
+
+CREATE INDEX IF NOT EXISTS idx_bookings_booking_date_booking_no
+  ON public.bookings(booking_date, booking_no);
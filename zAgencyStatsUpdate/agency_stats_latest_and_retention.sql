@@ -0,0 +1,73 @@
+-- =====================================================
+-- AGENCY STATS LATEST SNAPSHOT + HISTORY RETENTION
+-- =====================================================
+-- agency_stats keeps growing by 21 rows (7 agencies x 3 time ranges) per run,
+-- and the app had to find the newest calculated_at per agency in it.
+-- 1) agency_stats_latest: one row per (agency_id, time_range), upserted by
+--    calculate_agency_stats.py every run; the app reads it by primary key
+-- 2) Backfill it from the newest agency_stats rows
+-- 3) Index used by the history compaction scan (calculated_at, id)
+--
+-- calculate_agency_stats.py then downsamples agency_stats rows older than
+-- AGENCY_STATS_HISTORY_DAYS (default 30) to one row per agency, time range
+-- and day, deleting in batches of AGENCY_STATS_COMPACT_BATCH_SIZE.
+-- Requires agency_stats_extended_breakdowns.sql and agency_stats_time_ranges.sql.
+-- =====================================================
+
+-- 1) Latest snapshot table (same columns as agency_stats)
+CREATE TABLE IF NOT EXISTS public.agency_stats_latest (
+  agency_id TEXT NOT NULL,
+  time_range TEXT NOT NULL CHECK (time_range IN ('THISYEAR', '5YEARS', 'ALL')),
+  agency_name TEXT NOT NULL,
+
+  total_bookings INTEGER NOT NULL DEFAULT 0 CHECK (total_bookings >= 0),
+  total_charges INTEGER NOT NULL DEFAULT 0 CHECK (total_charges >= 0),
+  unique_persons INTEGER NOT NULL DEFAULT 0 CHECK (unique_persons >= 0),
+  average_charges_per_booking NUMERIC(10, 2) NOT NULL DEFAULT 0.0,
+
+  bookings_by_year JSONB NOT NULL DEFAULT '{}'::jsonb,
+  bookings_by_gender JSONB NOT NULL DEFAULT '{}'::jsonb,
+  bookings_by_race JSONB NOT NULL DEFAULT '{}'::jsonb,
+  charges_by_level_and_degree JSONB NOT NULL DEFAULT '[]'::jsonb,
+  bookings_by_month JSONB NOT NULL DEFAULT '{}'::jsonb,
+  bookings_by_age_band JSONB NOT NULL DEFAULT '{}'::jsonb,
+  bookings_by_status JSONB NOT NULL DEFAULT '{}'::jsonb,
+  top_statutes JSONB NOT NULL DEFAULT '[]'::jsonb,
+
+  calculated_at TIMESTAMPTZ DEFAULT NOW() NOT NULL,
+
+  PRIMARY KEY (agency_id, time_range)
+);
+
+ALTER TABLE public.agency_stats_latest ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Anyone can read latest agency stats" ON public.agency_stats_latest;
+CREATE POLICY "Anyone can read latest agency stats"
+  ON public.agency_stats_latest
+  FOR SELECT
+  TO public
+  USING (true);
+
+-- 2) Backfill from the newest history row per agency and time range
+INSERT INTO public.agency_stats_latest (
+  agency_id, time_range, agency_name,
+  total_bookings, total_charges, unique_persons, average_charges_per_booking,
+  bookings_by_year, bookings_by_gender, bookings_by_race, charges_by_level_and_degree,
+  bookings_by_month, bookings_by_age_band, bookings_by_status, top_statutes,
+  calculated_at
+)
+SELECT DISTINCT ON (agency_id, time_range)
+  agency_id, time_range, agency_name,
+  total_bookings, total_charges, unique_persons, average_charges_per_booking,
+  bookings_by_year, bookings_by_gender, bookings_by_race, charges_by_level_and_degree,
+  bookings_by_month, bookings_by_age_band, bookings_by_status, top_statutes,
+  calculated_at
+FROM public.agency_stats
+ORDER BY agency_id, time_range, calculated_at DESC
+ON CONFLICT (agency_id, time_range) DO NOTHING;
+
+-- 3) Compaction scans old history by (calculated_at, id)
+CREATE INDEX IF NOT EXISTS idx_agency_stats_calculated_at_id
+  ON public.agency_stats(calculated_at, id);
+
+COMMENT ON TABLE public.agency_stats_latest IS 'Latest agency statistics per agency and time range (upserted each run)';
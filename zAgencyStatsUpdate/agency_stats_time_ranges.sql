@@ -0,0 +1,33 @@
+-- =====================================================
+-- AGENCY STATS TIME RANGES
+-- =====================================================
+-- calculate_agency_stats.py now writes one row per agency per time range
+-- (same names as top_100_lists), all computed from a single booking scan:
+-- - THISYEAR (from Jan 1 of current year)
+-- - 5YEARS (from Jan 1 four years ago; what the app has always shown)
+-- - ALL (all bookings)
+-- 1) Add time_range column (existing rows are 5YEARS)
+-- 2) Make the uniqueness constraint include time_range
+-- 3) Index for the app's latest-row lookup per agency and range
+-- =====================================================
+
+-- 1) Add time_range column
+ALTER TABLE public.agency_stats
+ADD COLUMN IF NOT EXISTS time_range TEXT NOT NULL DEFAULT '5YEARS';
+
+ALTER TABLE public.agency_stats
+DROP CONSTRAINT IF EXISTS agency_stats_time_range_check;
+ALTER TABLE public.agency_stats
+ADD CONSTRAINT agency_stats_time_range_check CHECK (time_range IN ('THISYEAR', '5YEARS', 'ALL'));
+
+-- 2) One record per agency per time range per calculation
+ALTER TABLE public.agency_stats
+DROP CONSTRAINT IF EXISTS unique_agency_calculation;
+ALTER TABLE public.agency_stats
+ADD CONSTRAINT unique_agency_calculation UNIQUE (agency_id, time_range, calculated_at);
+
+-- 3) Latest calculation per agency and time range
+CREATE INDEX IF NOT EXISTS idx_agency_stats_agency_range_latest
+  ON public.agency_stats(agency_id, time_range, calculated_at DESC);
+
+COMMENT ON COLUMN public.agency_stats.time_range IS 'Time range covered by this row: THISYEAR, 5YEARS or ALL';
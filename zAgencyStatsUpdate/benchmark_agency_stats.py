@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+"""
+Synthetic-data benchmark for calculate_agency_stats.py.
+
+Generates realistic bookings (charges JSON with statutes, case numbers and agency
+strings including aliases and blanks, plus raw card text) and serves them through
+a local stand-in for the PostgREST query surface the engines use
+(.select/.gte/.gt/.lt/.lte/.or_/.order/.limit/.range). Nothing touches Supabase.
+
+Rows are generated on demand from their index, so a 1M-row dataset costs no memory
+until a page is requested, and every response is JSON-encoded and decoded like a
+real HTTP response so the byte counts are meaningful.
+
+Each (engine, size) run happens in its own subprocess so peak RSS is measured per
+run. Reported per run: wall time, rows/sec, bytes transferred, requests and peak
+memory. Every engine in calculate_agency_stats.ENGINES is benchmarked by default,
+so new engines show up automatically; incremental is reported twice, as a cold
+full rebuild and as a warm run with no changed bookings.
+
+Usage:
+    python3 benchmark_agency_stats.py
+    python3 benchmark_agency_stats.py --sizes 10000,100000 --engines single_pass,incremental
+    python3 benchmark_agency_stats.py --sizes 1000000 --engines single_pass --json results.json
+"""
+
+import os
+import re
+import sys
+import json
+import bisect
+import random
+import argparse
+import tempfile
+import subprocess
+import contextlib
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+DEFAULT_SEED = 42
+# Synthetic history spans this many years back from "now" (wider than 5YEARS)
+HISTORY_YEARS = 8
+# Booking times are rounded to this many seconds so large datasets share timestamps,
+# which exercises the keyset tiebreaker on booking_no
+TIMESTAMP_BUCKET_SECONDS = 600
+
+# =====================================================
+# SYNTHETIC BOOKINGS
+# =====================================================
+
+# (agency name as printed on charges, aliases seen in the agency field, weight)
+AGENCY_STRINGS = [
+    ('PUTNAM COUNTY SHERIFF', ['PUTNAM COUNTY SHERIFF', 'PCSO'], 60),
+    ('PALATKA POLICE DEPARTMENT', ['PALATKA POLICE DEPARTMENT', 'PALATKA PD', 'PPD'], 20),
+    ('FLORIDA HIGHWAY PATROL', ['FLORIDA HIGHWAY PATROL', 'FHP'], 8),
+    ('INTERLACHEN POLICE DEPARTMENT', ['INTERLACHEN POLICE DEPARTMENT', 'IPD'], 4),
+    ('FISH AND WILDLIFE', ['FLORIDA FISH AND WILDLIFE CONSERVATION COMMISSION (FWC)', 'FWC'], 4),
+    ('WELAKA POLICE DEPARTMENT', ['WELAKA POLICE DEPARTMENT', 'WPD'], 2),
+    ('SCHOOL DISTRICT POLICE', ['SCHOOL DISTRICT POLICE', 'SCHOOL DISTRICT PD'], 2),
+]
+AGENCY_WEIGHTS = [weight for _, _, weight in AGENCY_STRINGS]
+
+# (statute, description, level, degree)
+STATUTES = [
+    ('893.13(6)(A)', 'POSSESSION OF CONTROLLED SUBSTANCE', 'F', 'T'),
+    ('893.147(1)', 'POSSESSION OF DRUG PARAPHERNALIA', 'M', 'F'),
+    ('316.193(1)', 'DUI', 'M', 'S'),
+    ('322.34(2)', 'DRIVING WHILE LICENSE SUSPENDED', 'M', 'S'),
+    ('784.03(1)(A)', 'BATTERY', 'M', 'F'),
+    ('784.045(1)(A)', 'AGGRAVATED BATTERY', 'F', 'S'),
+    ('812.014(2)(C)', 'GRAND THEFT', 'F', 'T'),
+    ('812.014(3)(A)', 'PETIT THEFT', 'M', 'S'),
+    ('843.02', 'RESISTING OFFICER WITHOUT VIOLENCE', 'M', 'F'),
+    ('790.01(2)', 'CARRYING CONCEALED FIREARM', 'F', 'T'),
+    ('948.06', 'VIOLATION OF PROBATION', 'N', 'N'),
+    ('379.3671(2)(C)', 'FISHING WITHOUT LICENSE', 'M', 'S'),
+]
+
+FIRST_NAMES = [
+    'JAMES', 'MICHAEL', 'ROBERT', 'JOHN', 'DAVID', 'WILLIAM', 'CHRISTOPHER', 'JOSHUA',
+    'MARY', 'JENNIFER', 'JESSICA', 'ASHLEY', 'AMANDA', 'SARAH', 'BRITTANY', 'TIFFANY',
+]
+LAST_NAMES = [
+    'SMITH', 'JOHNSON', 'WILLIAMS', 'BROWN', 'JONES', 'GARCIA', 'MILLER', 'DAVIS',
+    'WILSON', 'ANDERSON', 'THOMAS', 'TAYLOR', 'MOORE', 'JACKSON', 'MARTIN', 'LEE',
+]
+RACES = ['W', 'W', 'W', 'B', 'B', 'H', 'A', '']
+
+
+class SyntheticBookings:
+    """
+    A deterministic, index-addressable dataset of n bookings ordered by
+    (booking_date, booking_no). Row i is regenerated from (seed, i) on demand.
+    """
+
+    def __init__(self, n: int, seed: int = DEFAULT_SEED, now: Optional[datetime] = None):
+        self.n = n
+        self.seed = seed
+        now = now or datetime.now(timezone.utc)
+        self.end_ts = int(now.timestamp()) - 3600
+        self.start_ts = int(datetime(now.year - HISTORY_YEARS, 1, 1, tzinfo=timezone.utc).timestamp())
+        # Each person appears about three times on average
+        self.people = max(1, n // 3)
+
+    def timestamp(self, i: int) -> int:
+        raw = self.start_ts + (self.end_ts - self.start_ts) * i // max(1, self.n)
+        return raw - raw % TIMESTAMP_BUCKET_SECONDS
+
+    def row(self, i: int) -> Dict[str, Any]:
+        r = random.Random(self.seed * 1_000_003 + i)
+        booked = datetime.fromtimestamp(self.timestamp(i), tz=timezone.utc)
+        booking_date = booked.isoformat()
+        booking_no = f'PCSO{booked.year % 100:02d}JBN{i:07d}'
+
+        person = r.randrange(self.people)
+        person_rng = random.Random(self.seed * 7_919 + person)
+        name = f'{person_rng.choice(LAST_NAMES)}, {person_rng.choice(FIRST_NAMES)} {chr(65 + person % 26)}{person}'
+        gender = person_rng.choice(['MALE', 'MALE', 'MALE', 'FEMALE'])
+        race = person_rng.choice(RACES)
+        age = 18 + person % 50 + (booked.year - 2018) // 2
+
+        agency_name, agency_fields, _ = r.choices(AGENCY_STRINGS, weights=AGENCY_WEIGHTS)[0]
+        charges = []
+        for order in range(r.choice([1, 1, 1, 2, 2, 3, 4])):
+            statute, description, level, degree = r.choice(STATUTES)
+            case_kind = 'CF' if level == 'F' else 'MM'
+            case_number = f'{booked.year % 100:02d}{r.randrange(100000):05d}{case_kind} ({agency_name})'
+            roll = r.random()
+            if roll < 0.1:
+                agency_field = ''  # older rows without the agency field
+            else:
+                agency_field = r.choice(agency_fields)
+            charges.append({
+                'statute': statute,
+                'charge': description,
+                'case_number': case_number if r.random() < 0.9 else '0',
+                'agency': agency_field,
+                'degree': degree,
+                'level': level,
+                'bond': r.choice(['NO BOND', '$1,000.00', '$5,000.00', '$25,000.00']),
+            })
+
+        in_jail = booked.timestamp() > self.end_ts - 30 * 86400 and r.random() < 0.6
+        status = 'In Jail' if in_jail else 'Released'
+        charge_lines = '\n'.join(
+            f"{c['statute']} {c['charge']} {c['degree']} {c['level']} {c['case_number']} {c['bond']}"
+            for c in charges
+        )
+        raw_card_text = (
+            f'Booking No: {booking_no}\n'
+            f'Name: {name}\n'
+            f'Status: {status}\n'
+            f'Booking Date: {booked.strftime("%m/%d/%Y %I:%M %p")}\n'
+            f'Age On Booking Date: {age}\n'
+            f'Gender: {gender} Race: {race or "U"}\n'
+            f'Arresting Agency: {agency_name}\n'
+            f'Statute Charge Degree Level Case # Bond\n'
+            f'{charge_lines}\n'
+        )
+
+        return {
+            'booking_no': booking_no,
+            'booking_date': booking_date,
+            'updated_at': booking_date,
+            'name': name,
+            'gender': gender,
+            'race': race,
+            'status': status,
+            'age_on_booking_date': age,
+            'charges': charges,
+            'raw_card_text': raw_card_text,
+        }
+
+
+# =====================================================
+# LOCAL POSTGREST STAND-IN
+# =====================================================
+
+# Columns rows are ordered by; all of them increase with the row index
+DATE_COLUMNS = ('booking_date', 'updated_at')
+ORDERED_COLUMNS = DATE_COLUMNS + ('booking_no',)
+KEYSET_PATTERN = re.compile(
+    r'(?P<date>\w+)\.gt\."(?P<value>[^"]*)",and\((?P=date)\.eq\."(?P=value)",(?P<key>\w+)\.gt\."(?P<last>[^"]*)"\)'
+)
+
+
+def _parse_ts(value: Any) -> float:
+    parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+class _Response:
+    def __init__(self, data: List[Dict[str, Any]]):
+        self.data = data
+
+
+class StandInQuery:
+    """Query builder covering the subset of the PostgREST surface the engines use."""
+
+    def __init__(self, client: 'StandInClient', table: str):
+        self.client = client
+        self.table = table
+        self.columns: List[str] = []
+        self.lo = 0
+        self.hi = client.dataset.n
+        self.offset = 0
+        self.count: Optional[int] = None
+
+    def _bound(self, column: str, value: Any, right: bool) -> int:
+        if column not in DATE_COLUMNS:
+            raise ValueError(f'stand-in cannot range-filter on {column}')
+        dataset = self.client.dataset
+        target = _parse_ts(value)
+        search = bisect.bisect_right if right else bisect.bisect_left
+        return search(range(dataset.n), target, key=dataset.timestamp)
+
+    def select(self, columns: str, **kwargs):
+        self.columns = [c.strip() for c in columns.split(',') if c.strip()]
+        return self
+
+    def gte(self, column: str, value: Any):
+        self.lo = max(self.lo, self._bound(column, value, right=False))
+        return self
+
+    def gt(self, column: str, value: Any):
+        self.lo = max(self.lo, self._bound(column, value, right=True))
+        return self
+
+    def lt(self, column: str, value: Any):
+        self.hi = min(self.hi, self._bound(column, value, right=False))
+        return self
+
+    def lte(self, column: str, value: Any):
+        self.hi = min(self.hi, self._bound(column, value, right=True))
+        return self
+
+    def or_(self, expression: str):
+        match = KEYSET_PATTERN.fullmatch(expression)
+        if not match:
+            raise ValueError(f'stand-in only supports keyset or_ filters: {expression}')
+        # booking_no encodes the row index, so "after (date, key)" is "after that row"
+        self.lo = max(self.lo, int(match.group('last')[-7:]) + 1)
+        return self
+
+    def order(self, column: str, desc: bool = False):
+        if column not in ORDERED_COLUMNS or desc:
+            raise ValueError(f'stand-in only orders ascending by {ORDERED_COLUMNS}')
+        return self
+
+    def limit(self, count: int):
+        self.count = count
+        return self
+
+    def range(self, start: int, end: int):
+        self.offset = start
+        self.count = end - start + 1
+        return self
+
+    def execute(self) -> _Response:
+        start = self.lo + self.offset
+        stop = self.hi if self.count is None else min(self.hi, start + self.count)
+        rows = []
+        for i in range(start, stop):
+            row = self.client.dataset.row(i)
+            rows.append({column: row.get(column) for column in self.columns} if '*' not in self.columns else row)
+        # Round-trip through JSON like a real HTTP response
+        body = json.dumps(rows)
+        self.client.record(len(rows), len(body))
+        return _Response(json.loads(body))
+
+
+class StandInClient:
+    """Drop-in for supabase.Client.table(...) backed by SyntheticBookings."""
+
+    def __init__(self, dataset: SyntheticBookings):
+        self.dataset = dataset
+        self.requests = 0
+        self.rows_transferred = 0
+        self.bytes_transferred = 0
+
+    def table(self, name: str) -> StandInQuery:
+        return StandInQuery(self, name)
+
+    def record(self, rows: int, size: int):
+        # int += under the GIL is good enough for counters read after the run
+        self.requests += 1
+        self.rows_transferred += rows
+        self.bytes_transferred += size
+
+
+# =====================================================
+# BENCHMARK RUNS
+# =====================================================
+
+def _run_engine(stats_module, client: StandInClient, engine: str) -> None:
+    agencies = stats_module.AGENCIES
+    if engine == 'single_pass':
+        stats_module.calculate_all_agency_stats(client, agencies)
+    elif engine == 'per_agency':
+        for agency in agencies:
+            stats_module.calculate_agency_stats(client, agency)
+    elif engine in ('incremental', 'incremental_warm'):
+        stats_module.calculate_incremental_agency_stats(client, agencies)
+    else:
+        raise ValueError(f'Unknown engine: {engine}')
+
+
+def run_worker(engine: str, size: int, seed: int) -> Dict[str, Any]:
+    """Run one engine on one dataset size in this process and return its metrics."""
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, script_dir)
+    # The stats script refuses to start without credentials; none are used here
+    os.environ.setdefault('SUPABASE_URL', 'http://localhost')
+    os.environ.setdefault('SUPABASE_SERVICE_ROLE_KEY', 'benchmark')
+    state_dir = tempfile.mkdtemp(prefix='agency_stats_bench_')
+    os.environ['AGENCY_STATS_STATE_DB'] = os.path.join(state_dir, 'state.sqlite3')
+
+    with contextlib.redirect_stdout(open(os.devnull, 'w')):
+        import calculate_agency_stats as stats_module
+
+        dataset = SyntheticBookings(size, seed)
+        if engine == 'incremental_warm':
+            # Build the state first; only the warm run below is measured
+            _run_engine(stats_module, StandInClient(dataset), 'incremental')
+        client = StandInClient(dataset)
+        started = time.perf_counter()
+        _run_engine(stats_module, client, engine)
+        elapsed = time.perf_counter() - started
+
+    return {
+        'engine': engine,
+        'rows': size,
+        'seconds': round(elapsed, 3),
+        'rows_per_sec': round(size / elapsed, 1) if elapsed else 0.0,
+        'requests': client.requests,
+        'rows_transferred': client.rows_transferred,
+        'bytes_transferred': client.bytes_transferred,
+        'peak_rss_mb': round(stats_module.peak_rss_mb(), 1),
+    }
+
+
+def benchmark(engines: List[str], sizes: List[int], seed: int) -> List[Dict[str, Any]]:
+    """Run every (engine, size) pair in a fresh subprocess and collect the metrics."""
+    results = []
+    for size in sizes:
+        for engine in engines:
+            print(f'⏱️  {engine} on {size:,} rows...', flush=True)
+            completed = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--worker', engine, str(size), '--seed', str(seed)],
+                capture_output=True,
+                text=True,
+            )
+            if completed.returncode != 0:
+                print(f'❌ {engine} on {size:,} rows failed:\n{completed.stderr.strip()}')
+                continue
+            result = json.loads(completed.stdout.strip().splitlines()[-1])
+            results.append(result)
+            print(
+                f'   {result["seconds"]:.2f}s, {result["rows_per_sec"]:,.0f} rows/s, '
+                f'{result["bytes_transferred"] / 1_048_576:,.1f} MB transferred, '
+                f'peak RSS {result["peak_rss_mb"]:,.1f} MB'
+            )
+    return results
+
+
+def print_report(results: List[Dict[str, Any]]):
+    print('\n' + '=' * 92)
+    print('AGENCY STATS BENCHMARK')
+    print('=' * 92)
+    print(f'{"engine":<18}{"rows":>10}{"wall (s)":>11}{"rows/sec":>13}{"requests":>10}{"MB sent":>11}{"peak RSS MB":>14}')
+    print('-' * 92)
+    for r in results:
+        print(
+            f'{r["engine"]:<18}{r["rows"]:>10,}{r["seconds"]:>11.2f}{r["rows_per_sec"]:>13,.0f}'
+            f'{r["requests"]:>10,}{r["bytes_transferred"] / 1_048_576:>11,.1f}{r["peak_rss_mb"]:>14,.1f}'
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark calculate_agency_stats engines on synthetic bookings')
+    parser.add_argument(
+        '--sizes',
+        default=','.join(str(size) for size in DEFAULT_SIZES),
+        help='Comma-separated dataset sizes (default: 10000,100000,1000000)'
+    )
+    parser.add_argument(
+        '--engines',
+        default=None,
+        help='Comma-separated engines (default: every engine, plus incremental_warm)'
+    )
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help='Dataset seed')
+    parser.add_argument('--json', dest='json_path', help='Also write the results to this JSON file')
+    parser.add_argument('--worker', nargs=2, metavar=('ENGINE', 'SIZE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        engine, size = args.worker
+        print(json.dumps(run_worker(engine, int(size), args.seed)))
+        return
+
+    if args.engines:
+        engines = [engine.strip() for engine in args.engines.split(',') if engine.strip()]
+    else:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        os.environ.setdefault('SUPABASE_URL', 'http://localhost')
+        os.environ.setdefault('SUPABASE_SERVICE_ROLE_KEY', 'benchmark')
+        with contextlib.redirect_stdout(open(os.devnull, 'w')):
+            from calculate_agency_stats import ENGINES
+        engines = list(ENGINES) + (['incremental_warm'] if 'incremental' in ENGINES else [])
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+
+    results = benchmark(engines, sizes, args.seed)
+    print_report(results)
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f'\n✅ Results written to {args.json_path}')
+
+    if len(results) < len(engines) * len(sizes):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,6 +4,8 @@ Calculate and store agency statistics in Supabase.
 
 This script calculates statistics for all law enforcement agencies in Putnam County
 and stores them in the agency_stats table. Should be run twice daily via cron.
+Each agency gets one row per time range (THISYEAR, 5YEARS, and ALL when enabled), all
+computed from a single scan of the booking history.
 
 Agencies:
 - pcso (Putnam County Sheriff's Office)
@@ -13,13 +15,29 @@ Agencies:
 - school_pd (Putnam County School District Police Department)
 - fhp (Florida Highway Patrol)
 - fwc (Florida Fish and Wildlife Conservation Commission)
+
+Environment Variables:
+- AGENCY_STATS_ENGINE: single_pass (default), per_agency or incremental
+- AGENCY_STATS_FETCH_SLICES: Date slices fetched concurrently (default: 4)
+- AGENCY_STATS_STATE_DB: Incremental and compaction state file (default: state/agency_stats_state.sqlite3)
+- AGENCY_STATS_FULL_REBUILD_HOURS: Hours between incremental full rebuilds (default: 24)
+- AGENCY_STATS_TOP_STATUTES: Number of statutes kept in top_statutes (default: 10)
+- AGENCY_STATS_INCLUDE_ALL: Also write the ALL time range; reads the whole history (default: false)
+- AGENCY_STATS_HISTORY_DAYS: Keep every agency_stats row this many days, then one per day (default: 30)
+- AGENCY_STATS_COMPACT_BATCH_SIZE: Rows deleted per request during compaction (default: 200)
+
+Usage:
+    python3 calculate_agency_stats.py [--engine single_pass|per_agency|incremental] [--full-rebuild]
+                                      [--include-all] [--history-days N] [--skip-compaction]
 """
 
 import os
 import sys
 import json
-from datetime import datetime, timedelta
-from typing import Dict, List, Any
+import argparse
+import sqlite3
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Any
 from collections import defaultdict
 
 from supabase import create_client, Client
@@ -32,6 +50,11 @@ script_dir = Path(__file__).parent
 project_root = script_dir if (script_dir / 'assets').exists() else script_dir.parent
 env_path = project_root / 'assets' / '.env'
 
+# Shared helpers (supabase_bulk_reader.py, agency_matcher.py) live in the project root
+sys.path.insert(0, str(project_root))
+from supabase_bulk_reader import bulk_read, iter_bulk_pages
+from agency_matcher import AGENCY_REGISTRY, get_agency_matcher
+
 if env_path.exists():
     load_dotenv(env_path)
     print(f'✅ Loaded environment variables from {env_path}')
@@ -48,19 +71,63 @@ if not SUPABASE_URL or not SUPABASE_SERVICE_ROLE_KEY:
     print(f"SUPABASE_SERVICE_ROLE_KEY: {'SET' if SUPABASE_SERVICE_ROLE_KEY else 'MISSING'}")
     sys.exit(1)
 
-# Agency configurations
-AGENCIES = [
-    {'id': 'pcso', 'name': 'PUTNAM COUNTY SHERIFF\'S OFFICE', 'search_term': 'PUTNAM COUNTY SHERIFF'},
-    {'id': 'palatka_pd', 'name': 'PALATKA POLICE DEPARTMENT', 'search_term': 'PALATKA POLICE DEPARTMENT'},
-    {'id': 'interlachen_pd', 'name': 'INTERLACHEN POLICE DEPARTMENT', 'search_term': 'INTERLACHEN POLICE DEPARTMENT'},
-    {'id': 'welaka_pd', 'name': 'WELAKA POLICE DEPARTMENT', 'search_term': 'WELAKA POLICE DEPARTMENT'},
-    {'id': 'school_pd', 'name': 'PUTNAM COUNTY SCHOOL DISTRICT POLICE DEPARTMENT', 'search_term': 'SCHOOL DISTRICT POLICE'},
-    {'id': 'fhp', 'name': 'FLORIDA HIGHWAY PATROL', 'search_term': 'FLORIDA HIGHWAY PATROL'},
-    {'id': 'fwc', 'name': 'FLORIDA FISH AND WILDLIFE CONSERVATION COMMISSION (FWC)', 'search_term': 'FISH AND WILDLIFE'},
-]
+# Agency configurations (ids, names, search terms and aliases live in agency_matcher.py)
+AGENCIES = AGENCY_REGISTRY
 
 BOOKINGS_TABLE = 'recent_bookings_with_charges'
 AGENCY_STATS_TABLE = 'agency_stats'
+# One row per (agency_id, time_range), upserted every run; what the app reads
+AGENCY_STATS_LATEST_TABLE = 'agency_stats_latest'
+
+# History retention: rows older than this are downsampled to one per agency per day
+AGENCY_STATS_HISTORY_DAYS = int(os.getenv('AGENCY_STATS_HISTORY_DAYS', '30'))
+# Maximum rows removed per delete request during compaction
+AGENCY_STATS_COMPACT_BATCH_SIZE = int(os.getenv('AGENCY_STATS_COMPACT_BATCH_SIZE', '200'))
+
+# single_pass: fetch the window once and classify against all agencies
+# per_agency: legacy mode, fetch the window once per agency
+# incremental: merge only changed bookings into durable per-year partials
+ENGINES = ('single_pass', 'per_agency', 'incremental')
+AGENCY_STATS_ENGINE = os.getenv('AGENCY_STATS_ENGINE', 'single_pass')
+
+# Columns projected from the bookings view (booking_no is the keyset tiebreaker)
+BOOKING_COLUMNS = 'booking_date,booking_no,name,gender,race,status,age_on_booking_date,charges,raw_card_text'
+# Number of date slices fetched concurrently
+AGENCY_STATS_FETCH_SLICES = int(os.getenv('AGENCY_STATS_FETCH_SLICES', '4'))
+
+# Time ranges written per agency (same names as top_100_lists); the app defaults to 5YEARS.
+# ALL has no lower bound, so it makes every run read the whole booking history: opt-in
+AGENCY_STATS_INCLUDE_ALL = os.getenv('AGENCY_STATS_INCLUDE_ALL', 'false').lower() in (
+    '1',
+    'true',
+    'yes',
+)
+WINDOWED_TIME_RANGES = ('THISYEAR', '5YEARS')
+TIME_RANGES = WINDOWED_TIME_RANGES + (('ALL',) if AGENCY_STATS_INCLUDE_ALL else ())
+DEFAULT_TIME_RANGE = '5YEARS'
+
+# Extended breakdowns: age-on-booking bands [low, high) and number of top statutes kept
+AGE_BANDS = [
+    ('UNDER 18', None, 18),
+    ('18-24', 18, 25),
+    ('25-34', 25, 35),
+    ('35-44', 35, 45),
+    ('45-54', 45, 55),
+    ('55-64', 55, 65),
+    ('65+', 65, None),
+]
+TOP_STATUTES_LIMIT = int(os.getenv('AGENCY_STATS_TOP_STATUTES', '10'))
+
+# Incremental engine state (SQLite) and reconciliation schedule
+AGENCY_STATS_STATE_DB = os.getenv(
+    'AGENCY_STATS_STATE_DB',
+    str(project_root / 'state' / 'agency_stats_state.sqlite3'),
+)
+AGENCY_STATS_FULL_REBUILD_HOURS = float(os.getenv('AGENCY_STATS_FULL_REBUILD_HOURS', '24'))
+# Re-read this much before the checkpoint to absorb clock skew (merging is idempotent)
+INCREMENTAL_OVERLAP = timedelta(minutes=15)
+# Bump when the stored contribution/partials layout changes; older state is rebuilt
+STATE_VERSION = '2'
 
 # Calculate date range: last 5 years
 def get_date_range():
@@ -71,6 +138,25 @@ def get_date_range():
     return start_date
 
 
+def get_time_range_start_years(time_ranges: Iterable[str] = TIME_RANGES) -> Dict[str, Optional[int]]:
+    """First booking year included in each time range (None = no lower bound)."""
+    now = datetime.now()
+    start_years = {
+        'THISYEAR': now.year,
+        '5YEARS': get_date_range().year,
+        'ALL': None,
+    }
+    return {time_range: start_years[time_range] for time_range in time_ranges}
+
+
+def get_fetch_start(time_ranges: Iterable[str] = TIME_RANGES) -> Optional[datetime]:
+    """Start of the single fetch window that covers every requested time range."""
+    start_years = list(get_time_range_start_years(time_ranges).values())
+    if None in start_years:
+        return None
+    return datetime(min(start_years), 1, 1)
+
+
 def expand_race_code(code: str) -> str:
     """Expand race codes to full names."""
     race_map = {
@@ -83,179 +169,213 @@ def expand_race_code(code: str) -> str:
     return race_map.get(code.upper(), code.upper())
 
 
-def calculate_agency_stats(supabase: Client, agency: Dict[str, str]) -> Dict[str, Any]:
+def iter_bookings_window(supabase: Client, start_date: Optional[datetime], label: str) -> Iterator[Dict[str, Any]]:
     """
-    Calculate statistics for a single agency.
-    
-    Returns a dictionary with all statistics ready to insert into Supabase.
+    Stream every booking on or after start_date (None = all history), one page at a time.
+
+    Uses keyset pagination over (booking_date, booking_no) with the window split into
+    AGENCY_STATS_FETCH_SLICES concurrent slices; only a few pages are buffered at once,
+    so memory stays flat however long the history is. Raises RuntimeError if a page
+    cannot be fetched after retries, so callers never compute stats from a partial window.
     """
-    agency_id = agency['id']
-    agency_name = agency['name']
-    search_term = agency['search_term']
-    
-    print(f"\n[{agency_id}] Calculating stats for {agency_name}...")
-    print(f"[{agency_id}] Search term: '{search_term}'")
-    
-    # Get date range
-    start_date = get_date_range()
-    print(f"[{agency_id}] Fetching bookings from {start_date.year} to {datetime.now().year} (last 5 years)")
-    
-    # Fetch all bookings from last 5 years (paginated)
-    # Use date filter in query for efficiency
-    all_bookings = []
-    offset = 0
-    batch_size = 1000
-    
-    max_retries = 3
-    fetch_failed = False
-    while True:
-        attempt = 0
-        while attempt < max_retries:
-            try:
-                response = supabase.table(BOOKINGS_TABLE)\
-                    .select('booking_date,name,gender,race,charges,raw_card_text')\
-                    .gte('booking_date', start_date.isoformat())\
-                    .order('booking_date', desc=False)\
-                    .range(offset, offset + batch_size - 1)\
-                    .execute()
-                
-                batch = response.data if hasattr(response, 'data') else []
-                if not batch:
-                    break
-                    
-                all_bookings.extend(batch)
-                print(f"[{agency_id}] Fetched batch: offset={offset}, got {len(batch)} records, total so far: {len(all_bookings)}")
-                
-                if len(batch) < batch_size:
-                    break
-                    
-                offset += batch_size
-                break
-            except Exception as e:
-                attempt += 1
-                print(f"[{agency_id}] Error fetching bookings (attempt {attempt}/{max_retries}): {e}")
-                if attempt >= max_retries:
-                    fetch_failed = True
-                    import traceback
-                    traceback.print_exc()
-                else:
-                    import time
-                    time.sleep(2 * attempt)
-        if fetch_failed or (batch is not None and len(batch) < batch_size):
-            break
+    fetched = 0
+    try:
+        for page in iter_bulk_pages(
+            supabase,
+            BOOKINGS_TABLE,
+            columns=BOOKING_COLUMNS,
+            start=start_date,
+            date_column='booking_date',
+            key_column='booking_no',
+            slices=AGENCY_STATS_FETCH_SLICES,
+            label=label,
+        ):
+            fetched += len(page)
+            yield from page
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        raise RuntimeError(f"Fetch failed for {label}; aborting stats calculation to avoid partial totals.") from e
+    print(f"[{label}] Total bookings fetched: {fetched} (peak RSS: {peak_rss_mb():.1f} MB)")
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB (0.0 where unsupported)."""
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes on Linux
+    if sys.platform == 'darwin':
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+def _parse_charges(booking: Dict[str, Any]) -> Any:
+    """Return the booking's charges as a list (None if the view returned NULL)."""
+    # Use 'charges' column (not 'charge_details')
+    charges = booking.get('charges', [])
+    if isinstance(charges, str):
+        try:
+            charges = json.loads(charges)
+        except:
+            charges = []
+    return charges
+
+
+def _new_agency_totals(agency: Dict[str, str], time_range: str = DEFAULT_TIME_RANGE) -> Dict[str, Any]:
+    """Create an empty running-totals record for one agency and time range."""
+    return {
+        'agency': agency,
+        'time_range': time_range,
+        'total_bookings': 0,
+        'total_charges': 0,
+        'unique_names': set(),
+        'bookings_by_year': defaultdict(int),
+        'bookings_by_gender': defaultdict(int),
+        'bookings_by_race': defaultdict(int),
+        'level_degree_map': defaultdict(lambda: defaultdict(int)),  # {level: {degree: count}}
+        'bookings_matched_by_raw_text': 0,
+        'extended': _extended_fields({}, {}, {}, {}),
+    }
+
+
+def _booking_facts(booking: Dict[str, Any]) -> Dict[str, Any]:
+    """Normalize the per-booking fields that feed the breakdowns."""
+    # Parse booking date
+    booking_date = datetime.fromisoformat(booking['booking_date'].replace('Z', '+00:00'))
+    race_code = booking.get('race', '').strip().upper() or 'UNKNOWN'
+    return {
+        'year': booking_date.year,
+        'month': f'{booking_date.year}-{booking_date.month:02d}',
+        'name': booking.get('name', '').strip(),
+        'gender': booking.get('gender', '').strip().upper() or 'UNKNOWN',
+        'race': expand_race_code(race_code),
+        'status': (booking.get('status') or '').strip().upper() or 'UNKNOWN',
+        'age': _parse_age(booking.get('age_on_booking_date')),
+    }
+
+
+def _parse_age(value: Any) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _age_band(age: Optional[int]) -> str:
+    """Map an age on booking date to its AGE_BANDS label."""
+    if age is None:
+        return 'UNKNOWN'
+    for label, low, high in AGE_BANDS:
+        if (low is None or age >= low) and (high is None or age < high):
+            return label
+    return 'UNKNOWN'
+
+
+def _charge_statute(charge: Dict[str, Any]) -> str:
+    return (charge.get('statute') or '').strip().upper() or 'UNKNOWN'
+
+
+def _charge_level_degree(charge: Dict[str, Any]) -> tuple:
+    """Return the (level, degree) bucket for a charge."""
+    # Get level - check 'level' field (maps: 'F' -> FELONY, 'M' -> MISDEMEANOR)
+    level_code = charge.get('level', '').upper()
+    if level_code == 'F':
+        level = 'FELONY'
+    elif level_code == 'M':
+        level = 'MISDEMEANOR'
+    else:
+        level = level_code if level_code else 'UNKNOWN'
     
-    print(f"[{agency_id}] Total bookings fetched: {len(all_bookings)}")
-    if fetch_failed:
-        raise RuntimeError(f"Fetch failed for {agency_id}; aborting stats calculation to avoid partial totals.")
-    
-    def _charge_matches_agency(charge: Any, term: str) -> bool:
-        """Return True if a charge record matches the agency search term."""
-        if not isinstance(charge, dict):
-            return False
-        term_upper = term.upper()
-        # Preferred: explicit agency field (if present)
-        agency_value = charge.get('agency', '') or ''
-        if agency_value and term_upper in str(agency_value).upper():
-            return True
-        # Fallback: case number may include agency text in older data
-        case_number = charge.get('case_number', '') or charge.get('caseNumber', '')
-        if case_number and term_upper in str(case_number).upper():
-            return True
-        return False
+    # Get degree - check 'degree' field
+    degree = charge.get('degree', '').upper() or 'UNKNOWN'
+    return (level, degree)
 
-    # Filter bookings for this agency
-    # Check if ANY charge matches agency (by agency field or case_number)
-    # Fallback to raw_card_text if charges are missing in the view.
-    agency_bookings = []
-    unique_names = set()
-    bookings_without_charges = 0
-    bookings_with_empty_charges = 0
-    sample_case_numbers = []
-    bookings_matched_by_raw_text = 0
-    charges_with_agency_field = 0
-    total_charge_records = 0
-    
-    for booking in all_bookings:
-        # Check charges for agency match
-        # Use 'charges' column (not 'charge_details')
-        charges = booking.get('charges', [])
-        if isinstance(charges, str):
-            try:
-                charges = json.loads(charges)
-            except:
-                charges = []
-        
-        # Debug: Track bookings without charges
-        if charges is None:
-            bookings_without_charges += 1
-            # Fall back to raw card text match if available
-            raw_text = booking.get('raw_card_text', '') or ''
-            if raw_text and search_term.upper() in raw_text.upper():
-                agency_bookings.append(booking)
-                bookings_matched_by_raw_text += 1
-                name = booking.get('name', '').strip()
-                if name:
-                    unique_names.add(name)
-            continue
-        
-        if not charges or len(charges) == 0:
-            bookings_with_empty_charges += 1
-            # Fall back to raw card text match if available
-            raw_text = booking.get('raw_card_text', '') or ''
-            if raw_text and search_term.upper() in raw_text.upper():
-                agency_bookings.append(booking)
-                bookings_matched_by_raw_text += 1
-                name = booking.get('name', '').strip()
-                if name:
-                    unique_names.add(name)
-            continue
-        
-        has_match = False
-        for charge in charges:
-            # Handle dict format (most common)
-            if isinstance(charge, dict):
-                total_charge_records += 1
-                agency_value = charge.get('agency', '') or ''
-                if agency_value:
-                    charges_with_agency_field += 1
-                case_number = charge.get('case_number', '') or charge.get('caseNumber', '')
-                if case_number and len(sample_case_numbers) < 5:
-                    sample_case_numbers.append(str(case_number))
-                if _charge_matches_agency(charge, search_term):
-                    has_match = True
-                    break
-
-        # Even if charges exist, include raw text match to catch mixed-agency cases
-        if not has_match:
-            raw_text = booking.get('raw_card_text', '') or ''
-            if raw_text and search_term.upper() in raw_text.upper():
-                has_match = True
-                bookings_matched_by_raw_text += 1
-        
-        if has_match:
-            agency_bookings.append(booking)
-            name = booking.get('name', '').strip()
-            if name:
-                unique_names.add(name)
+
+def _add_booking_to_totals(
+    totals: Dict[str, Any],
+    facts: Dict[str, Any],
+    matched_charges: List[Dict[str, Any]],
+):
+    """Fold one matched booking (and the charges that matched the agency) into the totals."""
+    totals['total_bookings'] += 1
+    if facts['name']:
+        totals['unique_names'].add(facts['name'])
+    totals['bookings_by_year'][facts['year']] += 1
+    totals['bookings_by_gender'][facts['gender']] += 1
+    totals['bookings_by_race'][facts['race']] += 1
     
-    if total_charge_records > 0 and charges_with_agency_field == 0:
-        raise RuntimeError(
-            f"[{agency_id}] Safety check failed: charges JSON has no 'agency' field. "
-            "Update charges table/view to include agency before calculating stats."
-        )
+    for charge in matched_charges:
+        totals['total_charges'] += 1
+        level, degree = _charge_level_degree(charge)
+        totals['level_degree_map'][level][degree] += 1
+
+
+def _new_extended_counts() -> Dict[str, Dict[str, int]]:
+    """Running counts behind the extended breakdowns (month, age band, status, statute)."""
+    return {
+        'month': defaultdict(int),
+        'age_band': defaultdict(int),
+        'status': defaultdict(int),
+        'statute': defaultdict(int),
+    }
 
-    print(f"[{agency_id}] Found {len(agency_bookings)} bookings for this agency")
-    print(f"[{agency_id}] Unique persons: {len(unique_names)}")
-    print(f"[{agency_id}] Bookings without charges: {bookings_without_charges}")
-    print(f"[{agency_id}] Bookings with empty charges: {bookings_with_empty_charges}")
-    print(f"[{agency_id}] Bookings matched by raw text: {bookings_matched_by_raw_text}")
-    if sample_case_numbers:
-        print(f"[{agency_id}] Sample case numbers: {sample_case_numbers[:3]}")
+
+def _add_extended_counts(
+    counts: Dict[str, Dict[str, int]],
+    facts: Dict[str, Any],
+    matched_charges: List[Dict[str, Any]],
+):
+    counts['month'][facts['month']] += 1
+    counts['age_band'][_age_band(facts['age'])] += 1
+    counts['status'][facts['status']] += 1
+    for charge in matched_charges:
+        counts['statute'][_charge_statute(charge)] += 1
+
+
+def _roll_up_extended(parts: Iterable[Dict[str, Dict[str, int]]]) -> Dict[str, Any]:
+    """Sum per-year extended counts (e.g. the years in one time range) into agency_stats fields."""
+    extended = _new_extended_counts()
+    for part in parts:
+        for field, counts in part.items():
+            for key, count in counts.items():
+                extended[field][key] += count
+    return _extended_fields(extended['month'], extended['age_band'], extended['status'], extended['statute'])
+
+
+def _extended_fields(
+    by_month: Dict[str, int],
+    by_age_band: Dict[str, int],
+    by_status: Dict[str, int],
+    by_statute: Dict[str, int],
+) -> Dict[str, Any]:
+    """Shape extended breakdown counts into their agency_stats JSONB fields."""
+    top_statutes = sorted(by_statute.items(), key=lambda item: (-item[1], item[0]))[:TOP_STATUTES_LIMIT]
+    return {
+        'bookings_by_month': {month: by_month[month] for month in sorted(by_month)},
+        'bookings_by_age_band': {
+            label: by_age_band[label]
+            for label in [band[0] for band in AGE_BANDS] + ['UNKNOWN']
+            if label in by_age_band
+        },
+        'bookings_by_status': dict(by_status),
+        'top_statutes': [{'statute': statute, 'count': count} for statute, count in top_statutes],
+    }
+
+
+def _finalize_agency_stats(totals: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert running totals into the agency_stats row format."""
+    agency = totals['agency']
+    agency_id = agency['id']
+    total_bookings = totals['total_bookings']
     
-    if not agency_bookings:
+    if total_bookings == 0:
         return {
             'agency_id': agency_id,
-            'agency_name': agency_name,
+            'agency_name': agency['name'],
+            'time_range': totals['time_range'],
             'total_bookings': 0,
             'total_charges': 0,
             'unique_persons': 0,
@@ -264,67 +384,15 @@ def calculate_agency_stats(supabase: Client, agency: Dict[str, str]) -> Dict[str
             'bookings_by_gender': {},
             'bookings_by_race': {},
             'charges_by_level_and_degree': [],
+            **_extended_fields({}, {}, {}, {}),
         }
     
-    # Calculate statistics
-    total_bookings = len(agency_bookings)
-    unique_persons = len(unique_names)
-    
-    # Count charges and build level/degree structure
-    total_charges = 0
-    level_degree_map = defaultdict(lambda: defaultdict(int))  # {level: {degree: count}}
-    
-    bookings_by_year = defaultdict(int)
-    bookings_by_gender = defaultdict(int)
-    bookings_by_race = defaultdict(int)
-    
-    for booking in agency_bookings:
-        # Parse booking date
-        booking_date = datetime.fromisoformat(booking['booking_date'].replace('Z', '+00:00'))
-        year = booking_date.year
-        bookings_by_year[year] += 1
-        
-        # Gender
-        gender = booking.get('gender', '').strip().upper() or 'UNKNOWN'
-        bookings_by_gender[gender] += 1
-        
-        # Race
-        race_code = booking.get('race', '').strip().upper() or 'UNKNOWN'
-        race = expand_race_code(race_code)
-        bookings_by_race[race] += 1
-        
-        # Process charges
-        # Use 'charges' column (not 'charge_details')
-        charges = booking.get('charges', [])
-        if isinstance(charges, str):
-            try:
-                charges = json.loads(charges)
-            except:
-                charges = []
-        
-        for charge in charges:
-            # Only process charges that match this agency
-            if isinstance(charge, dict):
-                if _charge_matches_agency(charge, search_term):
-                    total_charges += 1
-                    
-                    # Get level - check 'level' field (maps: 'F' -> FELONY, 'M' -> MISDEMEANOR)
-                    level_code = charge.get('level', '').upper()
-                    if level_code == 'F':
-                        level = 'FELONY'
-                    elif level_code == 'M':
-                        level = 'MISDEMEANOR'
-                    else:
-                        level = level_code if level_code else 'UNKNOWN'
-                    
-                    # Get degree - check 'degree' field
-                    degree = charge.get('degree', '').upper() or 'UNKNOWN'
-                    
-                    level_degree_map[level][degree] += 1
+    total_charges = totals['total_charges']
+    unique_persons = len(totals['unique_names'])
     
     # Convert level_degree_map to list format
     charges_by_level_and_degree = []
-    for level, degree_map in level_degree_map.items():
+    for level, degree_map in sorted(totals['level_degree_map'].items()):
         total_for_level = sum(degree_map.values())
         charges_by_level_and_degree.append({
             'level': level,
@@ -335,37 +403,547 @@ def calculate_agency_stats(supabase: Client, agency: Dict[str, str]) -> Dict[str
     # Calculate average
     average_charges = total_charges / total_bookings if total_bookings > 0 else 0.0
     
-    print(f"[{agency_id}] Statistics calculated:")
+    print(f"[{agency_id}] Statistics calculated ({totals['time_range']}):")
     print(f"  - Total bookings: {total_bookings}")
     print(f"  - Total charges: {total_charges}")
     print(f"  - Unique persons: {unique_persons}")
     print(f"  - Average charges per booking: {average_charges:.2f}")
-    print(f"  - Years: {sorted(bookings_by_year.keys())}")
+    print(f"  - Years: {sorted(totals['bookings_by_year'].keys())}")
     
     return {
         'agency_id': agency_id,
-        'agency_name': agency_name,
+        'agency_name': agency['name'],
+        'time_range': totals['time_range'],
         'total_bookings': total_bookings,
         'total_charges': total_charges,
         'unique_persons': unique_persons,
         'average_charges_per_booking': round(average_charges, 2),
-        'bookings_by_year': dict(bookings_by_year),
-        'bookings_by_gender': dict(bookings_by_gender),
-        'bookings_by_race': dict(bookings_by_race),
+        'bookings_by_year': dict(totals['bookings_by_year']),
+        'bookings_by_gender': dict(totals['bookings_by_gender']),
+        'bookings_by_race': dict(totals['bookings_by_race']),
         'charges_by_level_and_degree': charges_by_level_and_degree,
+        **totals['extended'],
+    }
+
+
+def _new_scan_counters() -> Dict[str, Any]:
+    """Diagnostic counters collected while scanning bookings."""
+    return {
+        'bookings_without_charges': 0,
+        'bookings_with_empty_charges': 0,
+        'sample_case_numbers': [],
+        'charges_with_agency_field': 0,
+        'total_charge_records': 0,
+    }
+
+
+def _report_scan_counters(counters: Dict[str, Any]):
+    """Print scan diagnostics and enforce the charges.agency safety check."""
+    if counters['total_charge_records'] > 0 and counters['charges_with_agency_field'] == 0:
+        raise RuntimeError(
+            "Safety check failed: charges JSON has no 'agency' or 'agency_id' field. "
+            "Update charges table/view to include agency before calculating stats."
+        )
+    
+    print(f"Bookings without charges: {counters['bookings_without_charges']}")
+    print(f"Bookings with empty charges: {counters['bookings_with_empty_charges']}")
+    if counters['sample_case_numbers']:
+        print(f"Sample case numbers: {counters['sample_case_numbers'][:3]}")
+
+
+def _scan_booking(
+    booking: Dict[str, Any],
+    agencies: List[Dict[str, str]],
+    counters: Dict[str, Any],
+) -> List[tuple]:
+    """
+    Match one booking against every agency.
+
+    A booking belongs to an agency if ANY charge matches it (by agency field or
+    case_number, including aliases), falling back to raw_card_text when charges are
+    missing or none match. Returns (agency_index, matched_charges, matched_by_raw_text) for each matching agency.
+    """
+    charges = _parse_charges(booking)
+    
+    # Debug: Track bookings without charges
+    if charges is None:
+        counters['bookings_without_charges'] += 1
+        charges = []
+    elif not charges:
+        counters['bookings_with_empty_charges'] += 1
+    
+    charge_dicts = [charge for charge in charges if isinstance(charge, dict)]
+    for charge in charge_dicts:
+        counters['total_charge_records'] += 1
+        if charge.get('agency_id') or charge.get('agency', '') or '':
+            counters['charges_with_agency_field'] += 1
+        case_number = charge.get('case_number', '') or charge.get('caseNumber', '')
+        if case_number and len(counters['sample_case_numbers']) < 5:
+            counters['sample_case_numbers'].append(str(case_number))
+    
+    # One automaton scan per charge tags it with every agency it mentions
+    matcher = get_agency_matcher(agencies)
+    matched_by_agency: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for charge in charge_dicts:
+        for agency_id in matcher.match_charge(charge):
+            matched_by_agency[agency_id].append(charge)
+    
+    matches = []
+    raw_text_ids = None
+    for index, agency in enumerate(agencies):
+        matched_charges = matched_by_agency.get(agency['id'])
+        if matched_charges:
+            matches.append((index, matched_charges, False))
+            continue
+        # Fall back to raw card text (also catches mixed-agency cases); search
+        # terms and aliases only, agency codes are too short for free text
+        if raw_text_ids is None:
+            raw_text_ids = matcher.match(booking.get('raw_card_text', '') or '')
+        if agency['id'] in raw_text_ids:
+            matches.append((index, [], True))
+    return matches
+
+
+def aggregate_agency_stats(
+    bookings: Iterable[Dict[str, Any]],
+    agencies: List[Dict[str, str]],
+    time_ranges: Iterable[str] = TIME_RANGES,
+) -> List[Dict[str, Any]]:
+    """
+    Classify each booking against every agency and time range in a single pass.
+
+    A streaming fold: bookings may be any iterable (e.g. straight off the network) and
+    are never held in memory together; only the unique-name sets grow with history.
+    Each booking is bucketed into every time range its year falls in, so one scan of
+    the widest window yields all ranges. The extended breakdowns are counted once per
+    agency and year and summed into each range at the end. Only the charges that match an agency are
+    counted toward that agency's totals. Returns one stats dict per time range and
+    agency, ordered by time range and then as in `agencies`.
+    """
+    start_years = list(get_time_range_start_years(time_ranges).items())
+    # slot = range_index * len(agencies) + agency_index
+    slot_totals = [
+        _new_agency_totals(agency, time_range)
+        for time_range, _ in start_years
+        for agency in agencies
+    ]
+    counters = _new_scan_counters()
+    # (agency_index, year) -> extended counts; ranges are rolled up from these
+    year_extended: Dict[tuple, Dict[str, Dict[str, int]]] = {}
+    
+    for booking in bookings:
+        matches = _scan_booking(booking, agencies, counters)
+        if not matches:
+            continue
+        facts = _booking_facts(booking)
+        range_offsets = [
+            range_index * len(agencies)
+            for range_index, (_, start_year) in enumerate(start_years)
+            if start_year is None or facts['year'] >= start_year
+        ]
+        for index, matched_charges, by_raw_text in matches:
+            for offset in range_offsets:
+                totals = slot_totals[offset + index]
+                if by_raw_text:
+                    totals['bookings_matched_by_raw_text'] += 1
+                _add_booking_to_totals(totals, facts, matched_charges)
+            if range_offsets:
+                key = (index, facts['year'])
+                if key not in year_extended:
+                    year_extended[key] = _new_extended_counts()
+                _add_extended_counts(year_extended[key], facts, matched_charges)
+    
+    _report_scan_counters(counters)
+    
+    for range_index, (_, start_year) in enumerate(start_years):
+        for index in range(len(agencies)):
+            slot_totals[range_index * len(agencies) + index]['extended'] = _roll_up_extended(
+                counts for (agency_index, year), counts in year_extended.items()
+                if agency_index == index and (start_year is None or year >= start_year)
+            )
+    
+    results = []
+    for totals in slot_totals:
+        agency_id = totals['agency']['id']
+        print(f"\n[{agency_id}] Found {totals['total_bookings']} bookings for this agency ({totals['time_range']})")
+        print(f"[{agency_id}] Unique persons: {len(totals['unique_names'])}")
+        print(f"[{agency_id}] Bookings matched by raw text: {totals['bookings_matched_by_raw_text']}")
+        results.append(_finalize_agency_stats(totals))
+    return results
+
+
+def calculate_agency_stats(
+    supabase: Client,
+    agency: Dict[str, str],
+    time_ranges: Iterable[str] = TIME_RANGES,
+) -> List[Dict[str, Any]]:
+    """
+    Calculate statistics for a single agency (per_agency engine).
+    
+    Fetches the whole window for this one agency; prefer calculate_all_agency_stats.
+    Returns one dictionary per time range, ready to insert into Supabase.
+    """
+    agency_id = agency['id']
+    
+    print(f"\n[{agency_id}] Calculating stats for {agency['name']}...")
+    print(f"[{agency_id}] Search term: '{agency['search_term']}'")
+    
+    # Get date range covering every time range
+    start_date = get_fetch_start(time_ranges)
+    print(f"[{agency_id}] Fetching bookings from {start_date.year if start_date else 'the beginning'} to {datetime.now().year} ({', '.join(time_ranges)})")
+    
+    bookings = iter_bookings_window(supabase, start_date, agency_id)
+    return aggregate_agency_stats(bookings, [agency], time_ranges)
+
+
+def calculate_all_agency_stats(
+    supabase: Client,
+    agencies: List[Dict[str, str]],
+    time_ranges: Iterable[str] = TIME_RANGES,
+) -> List[Dict[str, Any]]:
+    """
+    Calculate statistics for every agency from a single fetch (single_pass engine).
+    
+    Returns one stats dict per time range and agency.
+    """
+    start_date = get_fetch_start(time_ranges)
+    print(f"\n[all] Fetching bookings from {start_date.year if start_date else 'the beginning'} to {datetime.now().year} ({', '.join(time_ranges)})")
+    
+    bookings = iter_bookings_window(supabase, start_date, 'all')
+    return aggregate_agency_stats(bookings, agencies, time_ranges)
+
+
+# =====================================================
+# INCREMENTAL ENGINE (durable per-agency, per-year partials)
+# =====================================================
+
+def _open_state_db(path: str) -> sqlite3.Connection:
+    """Open (and create if needed) the incremental state store."""
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+    if _get_meta(conn, 'state_version') != STATE_VERSION:
+        # Layout changed (or new store): start over so the next run does a full rebuild
+        with conn:
+            conn.execute('DROP TABLE IF EXISTS booking_contributions')
+            conn.execute('DROP TABLE IF EXISTS agency_year_totals')
+            conn.execute('DROP TABLE IF EXISTS agency_year_names')
+            conn.execute('DELETE FROM meta')
+            _set_meta(conn, 'state_version', STATE_VERSION)
+    conn.executescript('''
+        -- What each booking currently contributes, so a changed booking can be
+        -- subtracted before its new version is added
+        CREATE TABLE IF NOT EXISTS booking_contributions (
+            booking_no TEXT PRIMARY KEY,
+            data TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS agency_year_totals (
+            agency_id TEXT NOT NULL,
+            year INTEGER NOT NULL,
+            total_bookings INTEGER NOT NULL,
+            total_charges INTEGER NOT NULL,
+            bookings_by_gender TEXT NOT NULL,
+            bookings_by_race TEXT NOT NULL,
+            charges_by_level_degree TEXT NOT NULL,
+            extended TEXT NOT NULL,
+            PRIMARY KEY (agency_id, year)
+        );
+        CREATE TABLE IF NOT EXISTS agency_year_names (
+            agency_id TEXT NOT NULL,
+            year INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            bookings INTEGER NOT NULL,
+            PRIMARY KEY (agency_id, year, name)
+        );
+    ''')
+    return conn
+
+
+def _get_meta(conn: sqlite3.Connection, key: str) -> Any:
+    row = conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+    return row[0] if row else None
+
+
+def _set_meta(conn: sqlite3.Connection, key: str, value: str):
+    conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, value))
+
+
+def _booking_contribution(
+    booking: Dict[str, Any],
+    agencies: List[Dict[str, str]],
+    counters: Dict[str, Any],
+) -> Dict[str, Any]:
+    """Describe what a booking adds to each matching agency's partials."""
+    if not booking.get('booking_date'):
+        return {}
+    matches = _scan_booking(booking, agencies, counters)
+    if not matches:
+        return {}
+    contribution = _booking_facts(booking)
+    contribution['agencies'] = {
+        agencies[index]['id']: [
+            [*_charge_level_degree(charge), _charge_statute(charge)] for charge in matched_charges
+        ]
+        for index, matched_charges, _ in matches
     }
+    return contribution
+
+
+def _load_partials(conn: sqlite3.Connection) -> Dict[tuple, Dict[str, Any]]:
+    partials = {}
+    for row in conn.execute('SELECT * FROM agency_year_totals'):
+        partials[(row[0], row[1])] = {
+            'total_bookings': row[2],
+            'total_charges': row[3],
+            'bookings_by_gender': json.loads(row[4]),
+            'bookings_by_race': json.loads(row[5]),
+            'charges_by_level_degree': json.loads(row[6]),
+            'extended': json.loads(row[7]),
+        }
+    return partials
+
+
+def _save_partials(conn: sqlite3.Connection, partials: Dict[tuple, Dict[str, Any]]):
+    conn.execute('DELETE FROM agency_year_totals')
+    conn.executemany(
+        'INSERT INTO agency_year_totals VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+        [
+            (
+                agency_id,
+                year,
+                part['total_bookings'],
+                part['total_charges'],
+                json.dumps(part['bookings_by_gender']),
+                json.dumps(part['bookings_by_race']),
+                json.dumps(part['charges_by_level_degree']),
+                json.dumps(part['extended']),
+            )
+            for (agency_id, year), part in partials.items()
+            if part['total_bookings'] > 0
+        ],
+    )
+
+
+def _bump(counts: Dict[str, int], key: str, delta: int):
+    counts[key] = counts.get(key, 0) + delta
+    if counts[key] <= 0:
+        del counts[key]
+
+
+def _apply_contribution(
+    conn: sqlite3.Connection,
+    partials: Dict[tuple, Dict[str, Any]],
+    contribution: Dict[str, Any],
+    sign: int,
+):
+    """Add (sign=1) or remove (sign=-1) a booking's contribution."""
+    year = contribution['year']
+    for agency_id, level_degrees in contribution['agencies'].items():
+        part = partials.setdefault((agency_id, year), {
+            'total_bookings': 0,
+            'total_charges': 0,
+            'bookings_by_gender': {},
+            'bookings_by_race': {},
+            'charges_by_level_degree': {},
+            'extended': {'month': {}, 'age_band': {}, 'status': {}, 'statute': {}},
+        })
+        extended = part['extended']
+        part['total_bookings'] += sign
+        part['total_charges'] += sign * len(level_degrees)
+        _bump(part['bookings_by_gender'], contribution['gender'], sign)
+        _bump(part['bookings_by_race'], contribution['race'], sign)
+        _bump(extended['month'], contribution['month'], sign)
+        _bump(extended['age_band'], _age_band(contribution['age']), sign)
+        _bump(extended['status'], contribution['status'], sign)
+        for level, degree, statute in level_degrees:
+            _bump(part['charges_by_level_degree'], f'{level}|{degree}', sign)
+            _bump(extended['statute'], statute, sign)
+        if contribution['name']:
+            conn.execute(
+                '''
+                INSERT INTO agency_year_names (agency_id, year, name, bookings) VALUES (?, ?, ?, ?)
+                ON CONFLICT (agency_id, year, name) DO UPDATE SET bookings = bookings + excluded.bookings
+                ''',
+                (agency_id, year, contribution['name'], sign),
+            )
+
+
+def merge_bookings_into_state(
+    conn: sqlite3.Connection,
+    bookings: Iterable[Dict[str, Any]],
+    agencies: List[Dict[str, str]],
+) -> Tuple[int, int]:
+    """
+    Merge new or changed bookings into the stored partials.
+
+    Re-merging a booking that is already stored is a no-op, so overlapping fetch
+    windows are safe. Returns (bookings seen, bookings whose contribution changed).
+    """
+    partials = _load_partials(conn)
+    counters = _new_scan_counters()
+    changed = 0
+    seen = 0
+    
+    for booking in bookings:
+        seen += 1
+        booking_no = booking.get('booking_no')
+        if not booking_no:
+            continue
+        new = _booking_contribution(booking, agencies, counters)
+        row = conn.execute(
+            'SELECT data FROM booking_contributions WHERE booking_no = ?', (booking_no,),
+        ).fetchone()
+        old = json.loads(row[0]) if row else {}
+        if old == new:
+            continue
+        changed += 1
+        if old:
+            _apply_contribution(conn, partials, old, -1)
+        if new:
+            _apply_contribution(conn, partials, new, 1)
+            conn.execute(
+                'INSERT OR REPLACE INTO booking_contributions (booking_no, data) VALUES (?, ?)',
+                (booking_no, json.dumps(new)),
+            )
+        else:
+            conn.execute('DELETE FROM booking_contributions WHERE booking_no = ?', (booking_no,))
+    
+    _report_scan_counters(counters)
+    conn.execute('DELETE FROM agency_year_names WHERE bookings <= 0')
+    _save_partials(conn, partials)
+    return seen, changed
+
+
+def stats_from_state(
+    conn: sqlite3.Connection,
+    agencies: List[Dict[str, str]],
+    time_range: str,
+    start_year: Optional[int],
+) -> List[Dict[str, Any]]:
+    """Roll the stored per-year partials up into agency_stats rows for one time range."""
+    partials = _load_partials(conn)
+    start_year = start_year or 0
+    results = []
+    for agency in agencies:
+        totals = _new_agency_totals(agency, time_range)
+        extended_parts = []
+        for (agency_id, year), part in partials.items():
+            if agency_id != agency['id'] or year < start_year:
+                continue
+            totals['total_bookings'] += part['total_bookings']
+            totals['total_charges'] += part['total_charges']
+            totals['bookings_by_year'][year] += part['total_bookings']
+            for gender, count in part['bookings_by_gender'].items():
+                totals['bookings_by_gender'][gender] += count
+            for race, count in part['bookings_by_race'].items():
+                totals['bookings_by_race'][race] += count
+            for key, count in part['charges_by_level_degree'].items():
+                level, degree = key.split('|', 1)
+                totals['level_degree_map'][level][degree] += count
+            extended_parts.append(part['extended'])
+        totals['extended'] = _roll_up_extended(extended_parts)
+        totals['unique_names'] = {
+            row[0]
+            for row in conn.execute(
+                'SELECT DISTINCT name FROM agency_year_names WHERE agency_id = ? AND year >= ? AND bookings > 0',
+                (agency['id'], start_year),
+            )
+        }
+        results.append(_finalize_agency_stats(totals))
+    return results
+
+
+def _fetch_changed_bookings(supabase: Client, since: str) -> List[Dict[str, Any]]:
+    """Fetch bookings whose booking_date or updated_at is newer than the checkpoint."""
+    changed: Dict[str, Dict[str, Any]] = {}
+    for date_column in ('updated_at', 'booking_date'):
+        try:
+            rows = bulk_read(
+                supabase,
+                BOOKINGS_TABLE,
+                columns=BOOKING_COLUMNS,
+                start=since,
+                date_column=date_column,
+                key_column='booking_no',
+                slices=1,
+                label=f'incremental:{date_column}',
+            )
+        except Exception as e:
+            raise RuntimeError(f"Incremental fetch by {date_column} failed; state left unchanged.") from e
+        for row in rows:
+            changed[row['booking_no']] = row
+    return list(changed.values())
+
+
+def calculate_incremental_agency_stats(
+    supabase: Client,
+    agencies: List[Dict[str, str]],
+    full_rebuild: bool = False,
+    time_ranges: Iterable[str] = TIME_RANGES,
+) -> List[Dict[str, Any]]:
+    """
+    Calculate statistics for every agency from durable partials (incremental engine).
+    
+    Only bookings changed since the last checkpoint are fetched and merged. A full
+    rebuild (forced, first run, a different window, or every
+    AGENCY_STATS_FULL_REBUILD_HOURS) discards the state and re-merges the whole
+    window; it yields the same rows as single_pass.
+    """
+    start_date = get_fetch_start(time_ranges)
+    window_start = start_date.isoformat() if start_date else 'all'
+    conn = _open_state_db(AGENCY_STATS_STATE_DB)
+    try:
+        run_started = datetime.now(timezone.utc)
+        checkpoint = _get_meta(conn, 'checkpoint')
+        last_rebuild = _get_meta(conn, 'last_full_rebuild')
+        rebuild_due = (
+            not checkpoint
+            or not last_rebuild
+            # Partials only cover the window they were rebuilt from (e.g. ALL turned on)
+            or _get_meta(conn, 'window_start') != window_start
+            or run_started - datetime.fromisoformat(last_rebuild)
+            >= timedelta(hours=AGENCY_STATS_FULL_REBUILD_HOURS)
+        )
+        
+        if full_rebuild or rebuild_due:
+            print(f"\n[incremental] Full rebuild from {start_date.year if start_date else 'the beginning'} (state: {AGENCY_STATS_STATE_DB})")
+            bookings = iter_bookings_window(supabase, start_date, 'rebuild')
+            with conn:
+                conn.execute('DELETE FROM booking_contributions')
+                conn.execute('DELETE FROM agency_year_totals')
+                conn.execute('DELETE FROM agency_year_names')
+                seen, merged = merge_bookings_into_state(conn, bookings, agencies)
+                _set_meta(conn, 'last_full_rebuild', run_started.isoformat())
+                _set_meta(conn, 'window_start', window_start)
+                _set_meta(conn, 'checkpoint', (run_started - INCREMENTAL_OVERLAP).isoformat())
+            print(f"[incremental] Rebuilt state from {seen} bookings ({merged} matched)")
+        else:
+            print(f"\n[incremental] Fetching bookings changed since {checkpoint}")
+            bookings = _fetch_changed_bookings(supabase, checkpoint)
+            with conn:
+                seen, merged = merge_bookings_into_state(conn, bookings, agencies)
+                _set_meta(conn, 'checkpoint', (run_started - INCREMENTAL_OVERLAP).isoformat())
+            print(f"[incremental] Merged {seen} changed bookings ({merged} contributions updated)")
+        
+        results = []
+        for time_range, start_year in get_time_range_start_years(time_ranges).items():
+            results.extend(stats_from_state(conn, agencies, time_range, start_year))
+        return results
+    finally:
+        conn.close()
 
 
 def upsert_agency_stats(supabase: Client, stats: Dict[str, Any]):
-    """Insert agency stats into Supabase."""
+    """Insert agency stats into the history table and upsert the latest snapshot."""
     agency_id = stats['agency_id']
-    calculated_at = datetime.now().isoformat()
+    calculated_at = datetime.now(timezone.utc).isoformat()
     
     # Prepare data for insert
     # Supabase handles JSONB automatically - pass Python dicts/lists directly
     data = {
         'agency_id': stats['agency_id'],
         'agency_name': stats['agency_name'],
+        'time_range': stats['time_range'],
         'total_bookings': stats['total_bookings'],
         'total_charges': stats['total_charges'],
         'unique_persons': stats['unique_persons'],
@@ -374,25 +952,141 @@ def upsert_agency_stats(supabase: Client, stats: Dict[str, Any]):
         'bookings_by_gender': stats['bookings_by_gender'],  # Python dict
         'bookings_by_race': stats['bookings_by_race'],  # Python dict
         'charges_by_level_and_degree': stats['charges_by_level_and_degree'],  # Python list
+        'bookings_by_month': stats['bookings_by_month'],  # Python dict
+        'bookings_by_age_band': stats['bookings_by_age_band'],  # Python dict
+        'bookings_by_status': stats['bookings_by_status'],  # Python dict
+        'top_statutes': stats['top_statutes'],  # Python list
         'calculated_at': calculated_at,
     }
     
     try:
-        # Insert new record (unique constraint on agency_id + calculated_at ensures no duplicates)
+        # Insert new record (unique constraint on agency_id + time_range + calculated_at ensures no duplicates)
         response = supabase.table(AGENCY_STATS_TABLE).insert(data).execute()
-        print(f"[{agency_id}] ✅ Successfully stored stats (calculated_at: {calculated_at})")
-        return True
+        print(f"[{agency_id}] ✅ Successfully stored {stats['time_range']} stats (calculated_at: {calculated_at})")
     except Exception as e:
         print(f"[{agency_id}] ❌ Error storing stats: {e}")
         return False
+    
+    try:
+        # Latest snapshot: one row per agency and time range, so app reads are a key lookup
+        supabase.table(AGENCY_STATS_LATEST_TABLE).upsert(data, on_conflict='agency_id,time_range').execute()
+        return True
+    except Exception as e:
+        print(f"[{agency_id}] ❌ Error updating {AGENCY_STATS_LATEST_TABLE}: {e}")
+        return False
+
+
+def compact_agency_stats_history(
+    supabase: Client,
+    history_days: int = AGENCY_STATS_HISTORY_DAYS,
+    batch_size: int = AGENCY_STATS_COMPACT_BATCH_SIZE,
+) -> int:
+    """
+    Downsample agency_stats rows older than history_days to one row per agency,
+    time range and day (the last one calculated that day).
+    
+    Old rows are read with a keyset scan over (calculated_at, id) and the extra rows
+    are deleted at most batch_size at a time, so a large backlog never turns into one
+    long-running delete. The scan starts at the UTC day of the previous run's cutoff
+    (kept in the AGENCY_STATS_STATE_DB meta table), so each run only reads newly aged
+    rows. Returns the number of rows deleted.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(days=history_days)
+    conn = _open_state_db(AGENCY_STATS_STATE_DB)
+    try:
+        compacted_before = _get_meta(conn, 'compacted_before')
+    finally:
+        conn.close()
+    # Days before it are already one row per day; its own day got rows after that cutoff
+    start = datetime.fromisoformat(compacted_before) if compacted_before else None
+    print(
+        f"\n[compact] Downsampling {AGENCY_STATS_TABLE} rows from "
+        f"{start.date() if start else 'the beginning'} to {cutoff.date()} to one per agency per day"
+    )
+    
+    rows = bulk_read(
+        supabase,
+        AGENCY_STATS_TABLE,
+        columns='id,agency_id,time_range,calculated_at',
+        start=start,
+        end=cutoff,
+        date_column='calculated_at',
+        key_column='id',
+        slices=1,
+        label='compact',
+    )
+    
+    # Rows arrive ordered by calculated_at, so the last one per day wins
+    keep: Dict[tuple, str] = {}
+    for row in rows:
+        keep[(row['agency_id'], row.get('time_range'), str(row['calculated_at'])[:10])] = row['id']
+    kept_ids = set(keep.values())
+    stale_ids = [row['id'] for row in rows if row['id'] not in kept_ids]
+    
+    deleted = 0
+    for offset in range(0, len(stale_ids), batch_size):
+        batch = stale_ids[offset:offset + batch_size]
+        try:
+            supabase.table(AGENCY_STATS_TABLE).delete().in_('id', batch).execute()
+        except Exception as e:
+            print(f"[compact] ❌ Error deleting batch at offset {offset}: {e} (will retry next run)")
+            break
+        deleted += len(batch)
+    
+    if deleted == len(stale_ids):
+        conn = _open_state_db(AGENCY_STATS_STATE_DB)
+        try:
+            with conn:
+                day_start = cutoff.replace(hour=0, minute=0, second=0, microsecond=0)
+                _set_meta(conn, 'compacted_before', day_start.isoformat())
+        finally:
+            conn.close()
+    
+    print(f"[compact] ✅ Deleted {deleted} of {len(stale_ids)} redundant rows ({len(kept_ids)} daily rows kept)")
+    return deleted
 
 
 def main():
     """Main function to calculate and store all agency stats."""
+    parser = argparse.ArgumentParser(description='Calculate and store agency statistics')
+    parser.add_argument(
+        '--engine',
+        choices=ENGINES,
+        default=AGENCY_STATS_ENGINE,
+        help='single_pass fetches bookings once for all agencies; per_agency fetches once per agency; '
+             'incremental merges only changed bookings into saved partials (default: single_pass)'
+    )
+    parser.add_argument(
+        '--full-rebuild',
+        action='store_true',
+        help='With --engine incremental, discard saved partials and rebuild from the full window'
+    )
+    parser.add_argument(
+        '--include-all',
+        action='store_true',
+        default=AGENCY_STATS_INCLUDE_ALL,
+        help='Also write the ALL time range (reads the whole booking history every run)'
+    )
+    parser.add_argument(
+        '--history-days',
+        type=int,
+        default=AGENCY_STATS_HISTORY_DAYS,
+        help=f'Keep every history row this many days, then one per agency per day (default: {AGENCY_STATS_HISTORY_DAYS})'
+    )
+    parser.add_argument(
+        '--skip-compaction',
+        action='store_true',
+        help='Do not downsample old agency_stats history this run'
+    )
+    args = parser.parse_args()
+    
     print("=" * 60)
     print("AGENCY STATS CALCULATION")
     print("=" * 60)
     print(f"Started at: {datetime.now().isoformat()}")
+    print(f"Engine: {args.engine}")
+    time_ranges = WINDOWED_TIME_RANGES + (('ALL',) if args.include_all else ())
+    print(f"Time ranges: {', '.join(time_ranges)}")
     
     # Create Supabase client with service role key
     supabase: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
@@ -400,23 +1094,51 @@ def main():
     success_count = 0
     error_count = 0
     
-    # Calculate stats for each agency
-    for agency in AGENCIES:
+    if args.engine in ('single_pass', 'incremental'):
         try:
-            stats = calculate_agency_stats(supabase, agency)
+            if args.engine == 'incremental':
+                all_stats = calculate_incremental_agency_stats(supabase, AGENCIES, args.full_rebuild, time_ranges)
+            else:
+                all_stats = calculate_all_agency_stats(supabase, AGENCIES, time_ranges)
+        except Exception as e:
+            print(f"[all] ❌ Fatal error: {e}")
+            all_stats = []
+            error_count = len(AGENCIES) * len(time_ranges)
+        for stats in all_stats:
             if upsert_agency_stats(supabase, stats):
                 success_count += 1
             else:
                 error_count += 1
+    else:
+        # Calculate stats for each agency
+        for agency in AGENCIES:
+            try:
+                for stats in calculate_agency_stats(supabase, agency, time_ranges):
+                    if upsert_agency_stats(supabase, stats):
+                        success_count += 1
+                    else:
+                        error_count += 1
+            except Exception as e:
+                print(f"[{agency['id']}] ❌ Fatal error: {e}")
+                error_count += len(time_ranges)
+    
+    compaction = 'skipped'
+    if not args.skip_compaction:
+        try:
+            compaction = f'{compact_agency_stats_history(supabase, args.history_days)} rows deleted'
         except Exception as e:
-            print(f"[{agency['id']}] ❌ Fatal error: {e}")
-            error_count += 1
+            # Retention is housekeeping; fresh stats are already stored
+            print(f"[compact] ⚠️  History compaction failed: {e}")
+            compaction = 'failed'
     
     print("\n" + "=" * 60)
     print("SUMMARY")
     print("=" * 60)
-    print(f"Successfully calculated: {success_count}/{len(AGENCIES)}")
-    print(f"Errors: {error_count}/{len(AGENCIES)}")
+    expected_rows = len(AGENCIES) * len(time_ranges)
+    print(f"Successfully calculated: {success_count}/{expected_rows}")
+    print(f"Errors: {error_count}/{expected_rows}")
+    print(f"History compaction: {compaction}")
+    print(f"Peak RSS: {peak_rss_mb():.1f} MB")
     print(f"Completed at: {datetime.now().isoformat()}")
     
     if error_count > 0: